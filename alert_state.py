@@ -0,0 +1,149 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# 提醒去重与冷却：同一 (股票, 间隔, K线时间, 信号组合) 只发送一次；
+# 同一信号组合在冷却时间内不再重复发送。状态保存在磁盘，重启后仍然有效
+#
+#   if store.should_send("email", ...):                       # 检查并登记为发送中
+#       dispatcher.add_email(..., on_result=store.on_result("email", ...))
+#
+# 只有发送成功才记入去重/冷却（mark_sent）；失败时释放登记（release），下个周期可再次发送。
+# 页面与 daemon.py 共用同一文件：保存前在文件锁内重新读取并合并对方的记录
+
+ALERT_STATE_PATH = os.getenv("ALERT_STATE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "alert_state.json"))
+RETENTION = 7 * 24 * 3600  # 秒，超过此时间的记录在保存时清理
+
+
+@contextmanager
+def _file_lock(path):
+    """跨进程互斥（旁边的 .lock 文件）；不支持 fcntl 的平台只做进程内互斥"""
+    if fcntl is None:
+        yield
+        return
+    with open(path + ".lock", "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def signal_key(signals):
+    """信号组合的稳定表示：{名称: bool} 取为 True 的名称，或直接传入名称列表"""
+    if isinstance(signals, dict):
+        names = [name for name, active in signals.items() if active]
+    else:
+        names = list(signals)
+    return "|".join(sorted(names)) or "price_volume"
+
+
+class AlertStateStore:
+    """按渠道（email / telegram）记录已发送的提醒；path=None 时只在内存中记录（如回放）"""
+
+    def __init__(self, path=ALERT_STATE_PATH, cooldowns=None):
+        self.path = path
+        self.cooldowns = dict(cooldowns or {})  # 渠道 -> 秒，未设置视为 0（只做同K线去重）
+        self.suppressed = 0
+        self._lock = threading.Lock()
+        self._sent = {}  # "渠道\t股票\t间隔\tK线时间\t信号组合" -> 发送时间
+        self._last = {}  # "渠道\t股票\t间隔\t信号组合" -> 最近发送时间
+        self._pending = set()  # 已交给发送队列、尚未确认结果的 K线键
+        self._mtime = None
+        self._load()
+
+    def _load(self):
+        """把磁盘上的记录合并进内存（同一键取较晚的时间）；文件未变化时跳过"""
+        if self.path is None:
+            return
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+            if mtime == self._mtime:
+                return
+            with open(self.path, encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return
+        self._mtime = mtime
+        for mine, theirs in ((self._sent, state.get("sent", {})), (self._last, state.get("last", {}))):
+            for k, t in theirs.items():
+                if t > mine.get(k, t - 1):
+                    mine[k] = t
+
+    def _save(self, now):
+        cutoff = now - RETENTION
+        if self.path is not None:
+            try:
+                directory = os.path.dirname(self.path) or "."
+                os.makedirs(directory, exist_ok=True)
+                with _file_lock(self.path):
+                    self._load()  # 合并另一进程（页面 / daemon）在此期间写入的记录
+                    self._prune(cutoff)
+                    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+                    with os.fdopen(fd, "w", encoding="utf-8") as f:
+                        json.dump({"sent": self._sent, "last": self._last}, f, ensure_ascii=False)
+                    os.replace(tmp, self.path)
+                    self._mtime = os.stat(self.path).st_mtime_ns
+                return
+            except OSError:
+                pass  # 无法写盘时仅在内存中去重
+        self._prune(cutoff)
+
+    def _prune(self, cutoff):
+        self._sent = {k: t for k, t in self._sent.items() if t >= cutoff}
+        self._last = {k: t for k, t in self._last.items() if t >= cutoff}
+
+    @staticmethod
+    def _keys(channel, ticker, interval, bar_time, signals):
+        key = signal_key(signals)
+        return "\t".join((channel, ticker, interval, str(bar_time), key)), "\t".join((channel, ticker, interval, key))
+
+    def should_send(self, channel, ticker, interval, bar_time, signals, now=None):
+        """未发送过、不在冷却期内且不在发送中时登记为发送中并返回 True，否则返回 False
+
+        只在内存中登记；发送成功后调用 mark_sent 才计入去重/冷却，失败时调用 release。
+        """
+        now = time.time() if now is None else now
+        bar_key, last_key = self._keys(channel, ticker, interval, bar_time, signals)
+        with self._lock:
+            self._load()
+            last = self._last.get(last_key)
+            if (bar_key in self._sent or bar_key in self._pending or
+                    (last is not None and now - last < self.cooldowns.get(channel, 0))):
+                self.suppressed += 1
+                return False
+            self._pending.add(bar_key)
+        return True
+
+    def mark_sent(self, channel, ticker, interval, bar_time, signals, now=None):
+        """提醒已成功发送：记录并保存，冷却从此刻开始"""
+        now = time.time() if now is None else now
+        bar_key, last_key = self._keys(channel, ticker, interval, bar_time, signals)
+        with self._lock:
+            self._pending.discard(bar_key)
+            self._sent[bar_key] = now
+            self._last[last_key] = now
+            self._save(now)
+
+    def release(self, channel, ticker, interval, bar_time, signals):
+        """发送失败或未发送：取消登记，之后可再次发送"""
+        bar_key, _ = self._keys(channel, ticker, interval, bar_time, signals)
+        with self._lock:
+            self._pending.discard(bar_key)
+
+    def on_result(self, channel, ticker, interval, bar_time, signals):
+        """供 AlertDispatcher 调用的回调：on_result(sent)"""
+        def callback(sent):
+            if sent:
+                self.mark_sent(channel, ticker, interval, bar_time, signals)
+            else:
+                self.release(channel, ticker, interval, bar_time, signals)
+        return callback
@@ -0,0 +1,365 @@
+import html
+import os
+import queue
+import smtplib
+import threading
+import time
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+from signal_engine import ALERT_SIGNALS
+from stage_timing import timed
+
+# 提醒发送：Telegram 与 Gmail，Streamlit 页面与 daemon.py 共用
+
+load_dotenv()
+
+# Gmail 发信者帐号设置
+SENDER_EMAIL = os.getenv("SENDER_EMAIL")
+SENDER_PASSWORD = os.getenv("SENDER_PASSWORD")
+RECIPIENT_EMAIL = os.getenv("RECIPIENT_EMAIL")
+
+# Telegram：页面从 secrets.toml 读取后调用 configure_telegram，daemon 默认读环境变量
+BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
+CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
+
+# 可指向本地 SMTP/HTTP 替身做测试
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "465"))
+SMTP_SSL = os.getenv("SMTP_SSL", "1") != "0"
+TELEGRAM_API = os.getenv("TELEGRAM_API", "https://api.telegram.org")
+TELEGRAM_MAX_LEN = 4096  # Telegram 单条消息长度上限
+
+
+class TelegramRejected(RuntimeError):
+    """Telegram 拒绝该消息（4xx，如 HTML 解析失败），重试无用"""
+
+
+def _telegram_text(msg):
+    """以 HTML 模式发送：标签、K线形态等文字中的 < > & 必须转义，否则整条消息被拒绝"""
+    return html.escape(msg, quote=False)
+
+
+def _new_session():
+    """连接池复用 TCP/TLS 连接；重试由调用方按退避策略处理"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+_http = _new_session()
+
+
+def configure_telegram(bot_token, chat_id):
+    global BOT_TOKEN, CHAT_ID
+    BOT_TOKEN, CHAT_ID = bot_token, chat_id
+
+
+def send_telegram_alert(msg: str) -> bool:
+    if not (BOT_TOKEN and CHAT_ID):
+        return False
+    # ... (Telegram 發送邏輯，保持不變)
+    try:
+        url = f"{TELEGRAM_API}/bot{BOT_TOKEN}/sendMessage"
+        payload = {
+            "chat_id": CHAT_ID,
+            "text": _telegram_text(msg),
+            "parse_mode": "HTML",
+            "disable_web_page_preview": True
+        }
+        response = _http.get(url, params=payload, timeout=10)
+        if response.status_code == 200 and response.json().get("ok"):
+            return True
+        else:
+            # st.warning(f"Telegram API 錯誤: {response.json()}")
+            return False
+    except Exception as e:
+        # st.warning(f"Telegram 發送失敗: {e}")
+        return False
+
+
+# 邮件内容（新增参数），返回 (subject, body)
+def build_email_alert(ticker, price_pct, volume_pct, signals, price_change_threshold=5.0, volume_change_threshold=10.0):
+    """由最新K线信号 {键: bool}（见 signal_engine.ALERT_KEYS）生成邮件标题与正文"""
+    subject = f"📣 股票異動通知：{ticker}"
+    body = f"""
+    股票代號：{ticker}
+    股價變動：{price_pct:.2f}%
+    成交量變動：{volume_pct:.2f}%
+    """
+    for signal in ALERT_SIGNALS:
+        if signals.get(signal.key):
+            body += "\n" + signal.email.format(price_change_threshold=price_change_threshold,
+                                               volume_change_threshold=volume_change_threshold)
+
+    body += "\n系統偵測到異常變動，請立即查看市場情況。"
+    return subject, body
+
+
+def _email_message(subject, body):
+    msg = MIMEMultipart()
+    msg["From"] = SENDER_EMAIL
+    msg["To"] = RECIPIENT_EMAIL
+    msg["Subject"] = subject
+    msg.attach(MIMEText(body, "plain"))
+    return msg
+
+
+# 邮件发送函数（同步，每次新建连接；循环中请使用 AlertDispatcher）
+def send_email_alert(ticker, price_pct, volume_pct, signals, **thresholds):
+    subject, body = build_email_alert(ticker, price_pct, volume_pct, signals, **thresholds)
+    msg = _email_message(subject, body)
+
+    # 发送失败时抛出异常，由调用方决定如何提示
+    server = smtplib.SMTP_SSL(SMTP_HOST, SMTP_PORT) if SMTP_SSL else smtplib.SMTP(SMTP_HOST, SMTP_PORT)
+    server.login(SENDER_EMAIL, SENDER_PASSWORD)
+    server.sendmail(SENDER_EMAIL, RECIPIENT_EMAIL, msg.as_string())
+    server.quit()
+
+
+class AlertDispatcher:
+    """后台提醒发送队列
+
+    刷新循环中只调用 add_email / add_telegram 登记提醒，周期结束时 flush() 把本周期全部股票的提醒
+    合并为一封邮件与尽量少的 Telegram 消息交给后台线程发送，慢速 SMTP 不再阻塞后续股票的分析。
+    后台线程复用同一个 SMTP 会话与 requests.Session 连接池，失败时按指数退避重试；
+    合并后的 Telegram 消息被拒绝（4xx）时改为逐条发送，一条坏消息不会连累同批其他股票。
+    登记时可传入 on_result(sent)，发送完成（或放弃）后在后台线程中调用，用于只把成功的提醒计入冷却。
+    """
+
+    def __init__(self, smtp_host=None, smtp_port=None, smtp_ssl=None, telegram_api=None,
+                 max_retries=3, backoff=1.0, session=None):
+        self.smtp_host = smtp_host or SMTP_HOST
+        self.smtp_port = smtp_port or SMTP_PORT
+        self.smtp_ssl = SMTP_SSL if smtp_ssl is None else smtp_ssl
+        self.telegram_api = telegram_api or TELEGRAM_API
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.session = session or _new_session()
+        self.stats = {"emails_sent": 0, "telegram_sent": 0, "retries": 0, "failed": 0, "skipped": 0,
+                      "last_error": None}
+        self._queue = queue.Queue()
+        self._pending_emails = []  # [(ticker, subject, body, on_result)]
+        self._pending_telegram = []  # [(msg, on_result)]
+        self._smtp = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="alert-dispatcher", daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        """发送完已排队的提醒后结束后台线程并关闭连接"""
+        self._queue.put(None)
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._close_smtp()
+        self.session.close()
+
+    def join(self):
+        """等待队列中的提醒全部发送（或放弃）完毕"""
+        self._queue.join()
+
+    def add_email(self, ticker, subject, body, on_result=None):
+        with self._lock:
+            self._pending_emails.append((ticker, subject, body, on_result))
+
+    def add_telegram(self, msg, on_result=None):
+        with self._lock:
+            self._pending_telegram.append((msg, on_result))
+
+    def flush(self):
+        """把本周期登记的提醒合并成一批放入发送队列"""
+        with self._lock:
+            emails, self._pending_emails = self._pending_emails, []
+            messages, self._pending_telegram = self._pending_telegram, []
+        if not emails and not messages:
+            return
+        self.start()
+        self._queue.put((emails, messages))
+
+    def _run(self):
+        while True:
+            batch = self._queue.get()
+            try:
+                if batch is None:
+                    return
+                self._send_batch(*batch)
+            except Exception as e:
+                self.stats["last_error"] = str(e)
+            finally:
+                self._queue.task_done()
+
+    def _send_batch(self, emails, messages):
+        email_sent, telegram_failed = False, set(range(len(messages)))
+        try:
+            if emails:
+                if SENDER_EMAIL and RECIPIENT_EMAIL:
+                    subject, body = self._merge_emails(emails)
+                    with timed("smtp") as rec:
+                        rec["rows"] = len(emails)
+                        email_sent = self._retry(self._send_email, subject, body)
+                    if email_sent:
+                        self.stats["emails_sent"] += 1
+                else:
+                    self.stats["skipped"] += len(emails)
+            if messages:
+                if BOT_TOKEN and CHAT_ID:
+                    failed = set()
+                    for parts in self._merge_telegram([msg for msg, _ in messages]):
+                        failed |= self._send_telegram_chunk(parts)
+                    telegram_failed = failed
+                else:
+                    self.stats["skipped"] += len(messages)
+        finally:
+            for _, _, _, on_result in emails:
+                self._notify(on_result, email_sent)
+            for i, (_, on_result) in enumerate(messages):
+                self._notify(on_result, i not in telegram_failed)
+
+    def _notify(self, on_result, sent):
+        if on_result is None:
+            return
+        try:
+            on_result(sent)
+        except Exception as e:
+            self.stats["last_error"] = f"{type(e).__name__}: {e}"
+
+    @staticmethod
+    def _merge_emails(emails):
+        if len(emails) == 1:
+            return emails[0][1], emails[0][2]
+        tickers = list(dict.fromkeys(email[0] for email in emails))
+        subject = f"📣 股票異動通知：{', '.join(tickers)}"
+        body = ("\n" + "-" * 30 + "\n").join(email[2] for email in emails)
+        return subject, body
+
+    @staticmethod
+    def _merge_telegram(messages):
+        """按 Telegram 长度上限把多条（已转义的）消息拼成尽量少的几条，返回每条所含的 [(消息序号, 片段)]"""
+        chunks, current, size = [], [], 0
+        for i, msg in enumerate(messages):
+            for part in _split_telegram(_telegram_text(msg)):
+                if current and size + 2 + len(part) > TELEGRAM_MAX_LEN:
+                    chunks.append(current)
+                    current, size = [], 0
+                size += len(part) + (2 if current else 0)
+                current.append((i, part))
+        if current:
+            chunks.append(current)
+        return chunks
+
+    def _send_telegram_chunk(self, parts):
+        """发送合并后的一条消息，返回未送达片段所属的消息序号；被拒绝时逐个片段单独发送"""
+        with timed("telegram") as rec:
+            rec["rows"] = len(parts)
+            try:
+                if self._retry(self._send_telegram, "\n\n".join(part for _, part in parts)):
+                    self.stats["telegram_sent"] += 1
+                    return set()
+                return {i for i, _ in parts}
+            except TelegramRejected as e:
+                self.stats["last_error"] = str(e)
+        if len(parts) == 1:
+            self.stats["failed"] += 1
+            return {parts[0][0]}
+        failed = set()
+        for part in parts:
+            failed |= self._send_telegram_chunk([part])
+        return failed
+
+    def _retry(self, func, *args):
+        for attempt in range(self.max_retries + 1):
+            try:
+                func(*args)
+                return True
+            except TelegramRejected:
+                raise  # 请求本身有误，由调用方处理
+            except Exception as e:
+                self.stats["last_error"] = f"{type(e).__name__}: {e}"
+                if attempt < self.max_retries:
+                    self.stats["retries"] += 1
+                    time.sleep(self.backoff * 2 ** attempt)
+        self.stats["failed"] += 1
+        return False
+
+    def _smtp_connection(self):
+        if self._smtp is not None:
+            try:
+                if self._smtp.noop()[0] == 250:
+                    return self._smtp
+            except Exception:
+                pass
+            self._close_smtp()
+        if self.smtp_ssl:
+            server = smtplib.SMTP_SSL(self.smtp_host, self.smtp_port, timeout=30)
+        else:
+            server = smtplib.SMTP(self.smtp_host, self.smtp_port, timeout=30)
+        if SENDER_PASSWORD:
+            server.login(SENDER_EMAIL, SENDER_PASSWORD)
+        self._smtp = server
+        return server
+
+    def _close_smtp(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except Exception:
+                pass
+            self._smtp = None
+
+    def _send_email(self, subject, body):
+        server = self._smtp_connection()
+        try:
+            server.sendmail(SENDER_EMAIL, RECIPIENT_EMAIL, _email_message(subject, body).as_string())
+        except smtplib.SMTPException:
+            self._close_smtp()  # 下次重试时重新连接
+            raise
+
+    def _send_telegram(self, msg):
+        response = self.session.get(
+            f"{self.telegram_api}/bot{BOT_TOKEN}/sendMessage",
+            params={"chat_id": CHAT_ID, "text": msg, "parse_mode": "HTML", "disable_web_page_preview": True},
+            timeout=10,
+        )
+        if 400 <= response.status_code < 500 and response.status_code != 429:
+            raise TelegramRejected(f"Telegram API 拒絕: {response.status_code} {response.text[:200]}")
+        if response.status_code != 200 or not response.json().get("ok"):
+            raise RuntimeError(f"Telegram API 錯誤: {response.status_code} {response.text[:200]}")
+
+
+def _split_telegram(text):
+    """按长度上限切分已转义的消息，不在 &lt; 等实体中间切断"""
+    parts = []
+    while len(text) > TELEGRAM_MAX_LEN:
+        cut = TELEGRAM_MAX_LEN
+        amp = text.rfind("&", cut - 4, cut)  # 实体最长 5 个字符（&amp;）
+        if amp != -1 and text.find(";", amp, cut) == -1:
+            cut = amp
+        parts.append(text[:cut])
+        text = text[cut:]
+    parts.append(text)
+    return parts
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher():
+    """进程内共享的发送队列（Streamlit 每次重跑脚本都拿到同一个）"""
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = AlertDispatcher().start()
+    return _dispatcher
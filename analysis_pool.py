@@ -0,0 +1,79 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pandas as pd
+
+from pipeline import analyze_ticker
+from stage_timing import timer
+
+# 多进程分析：每只股票的指标/異動標記/K线形态/成功率前置计算都是 CPU 密集型，
+# 以进程池并行执行；结果以紧凑的列数组传回主进程再组装成 DataFrame 渲染
+
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "0")) or os.cpu_count() or 1
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """进程内共享的进程池（Streamlit 重跑脚本时复用）"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=ANALYSIS_WORKERS)
+    return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        _pool = None
+
+
+def frame_to_arrays(data):
+    """DataFrame -> (列名, 各列数组, 各列 dtype)，跨进程传输时不携带索引/块管理器等开销"""
+    return list(data.columns), [data[c].array for c in data.columns], [data[c].dtype for c in data.columns]
+
+
+def arrays_to_frame(packed):
+    columns, arrays, dtypes = packed
+    return pd.DataFrame({c: pd.Series(a, dtype=dt, copy=False) for c, a, dt in zip(columns, arrays, dtypes)},
+                        columns=columns)
+
+
+def analyze_task(job):
+    """子进程执行的纯函数：job 为 analyze_ticker 的参数元组，返回 (紧凑结果, 更新后的 IndicatorState)"""
+    ticker, data, vix_data, previous_close, params, interval, state = job
+    result = analyze_ticker(ticker, data, vix_data, previous_close, params, interval, state)
+    result["data"] = frame_to_arrays(result["data"])
+    return result, state
+
+
+def analyze_many(jobs):
+    """并行分析 {键: job}（键通常为 ticker，多周期时为 (ticker, 间隔)），返回 {键: (结果或异常, IndicatorState 或 None)}"""
+    outputs = {}
+    if len(jobs) <= 1 or ANALYSIS_WORKERS <= 1:
+        for ticker, job in jobs.items():
+            try:
+                result = analyze_ticker(*job)
+                timer.record_many(job[0], result["timings"])
+                outputs[ticker] = (result, job[-1])
+            except Exception as e:
+                outputs[ticker] = (e, None)
+        return outputs
+
+    futures = {ticker: get_pool().submit(analyze_task, job) for ticker, job in jobs.items()}
+    for ticker, future in futures.items():
+        try:
+            result, state = future.result()
+            result["data"] = arrays_to_frame(result["data"])
+            timer.record_many(jobs[ticker][0], result["timings"])  # 子进程内的各阶段耗时
+            outputs[ticker] = (result, state)
+        except BrokenProcessPool as e:
+            _reset_pool()  # 子进程异常退出后进程池不可再用，下次重建
+            outputs[ticker] = (e, None)
+        except Exception as e:
+            outputs[ticker] = (e, None)
+    return outputs
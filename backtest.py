@@ -0,0 +1,140 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from signal_engine import signal_matrix, SIGNAL_MASK_COLUMN
+
+# 多周期信号回测：以異動標記的布尔矩阵与 OHLC 计算各信号在 1..N 根K线后的前瞻收益、命中率、
+# 平均最大有利/不利波动（MFE/MAE）与期望值；多只股票一次性向量化计算
+#
+#   python backtest.py --tickers TSLA,NIO,META --period 10y --interval 1d --horizons 20
+
+
+def is_sell_signal(label):
+    """📉 开头的信号按做空方向统计，其余（📈/✅/🔄/🔥）按做多方向统计"""
+    return label.startswith("📉")
+
+
+def forward_paths(high, low, close, max_horizon):
+    """返回 (收益, MFE, MAE) 三个 [行数, max_horizon] 数组，第 h 列为持有 h+1 根K线；不足 h 根K线处为 NaN
+
+    收益 = close[t+h]/close[t]-1；MFE/MAE 为 t+1..t+h 区间内最高价/最低价相对 close[t] 的涨跌幅
+    """
+    n = len(close)
+    returns = np.full((n, max_horizon), np.nan)
+    mfe = np.full((n, max_horizon), np.nan)
+    mae = np.full((n, max_horizon), np.nan)
+    run_high = np.full(n, -np.inf)
+    run_low = np.full(n, np.inf)
+    for h in range(1, max_horizon + 1):
+        if h >= n:
+            break
+        run_high[:n - h] = np.maximum(run_high[:n - h], high[h:])
+        run_low[:n - h] = np.minimum(run_low[:n - h], low[h:])
+        base = close[:n - h]
+        returns[:n - h, h - 1] = close[h:] / base - 1
+        mfe[:n - h, h - 1] = run_high[:n - h] / base - 1
+        mae[:n - h, h - 1] = run_low[:n - h] / base - 1
+    return returns, mfe, mae
+
+
+def _sums(m, values):
+    """每个信号在各周期的有效样本数与求和：[信号数, 周期数]；m 为转置后的浮点信号矩阵"""
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, 0.0)
+    return m @ valid, m @ filled
+
+
+def backtest_signals(frames, horizons=10):
+    """对多只股票的数据回测全部信号
+
+    frames 为 {ticker: DataFrame}（或单个 DataFrame），需含 High/Low/Close 与異動標記位掩码列；
+    horizons 为最大持有K线数 N（统计 1..N）或周期列表。返回每个 (信号, 周期) 一行的 DataFrame。
+    """
+    if isinstance(frames, pd.DataFrame):
+        frames = {"": frames}
+    horizons = list(range(1, horizons + 1)) if isinstance(horizons, int) else sorted(horizons)
+    max_horizon = max(horizons)
+    cols = np.array(horizons) - 1
+
+    marks, paths = [], []
+    for data in frames.values():
+        if data is None or data.empty:
+            continue
+        marks.append(data[SIGNAL_MASK_COLUMN].to_numpy(dtype=np.int64))
+        paths.append(forward_paths(*(data[k].to_numpy(dtype=float) for k in ("High", "Low", "Close")), max_horizon))
+    if not marks:
+        return pd.DataFrame()
+    # 各股票各自计算前瞻路径（不跨股票），再整体拼接成一个矩阵统一统计
+    matrix, labels = signal_matrix(np.concatenate(marks))
+    returns, mfe, mae = (np.concatenate([p[i] for p in paths])[:, cols] for i in range(3))
+
+    sell = np.array([is_sell_signal(label) for label in labels])[:, None]
+    m = matrix.T.astype(np.float64)
+    counts, ret_sum = _sums(m, returns)
+    _, long_wins = _sums(m, np.where(np.isnan(returns), np.nan, returns > 0))
+    _, short_wins = _sums(m, np.where(np.isnan(returns), np.nan, returns < 0))
+    _, win_sum_long = _sums(m, np.where(returns > 0, returns, 0.0))
+    _, win_sum_short = _sums(m, np.where(returns < 0, -returns, 0.0))
+    _, mfe_sum = _sums(m, mfe)
+    _, mae_sum = _sums(m, mae)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # 做空方向：收益取负，MFE/MAE 互换并取负
+        avg_return = np.where(sell, -ret_sum, ret_sum) / counts
+        wins = np.where(sell, short_wins, long_wins)
+        hit_rate = wins / counts
+        avg_win = np.where(sell, win_sum_short, win_sum_long) / wins
+        avg_loss = (avg_return * counts - np.nan_to_num(avg_win) * wins) / (counts - wins)
+        avg_mfe = np.where(sell, -mae_sum, mfe_sum) / counts
+        avg_mae = np.where(sell, -mfe_sum, mae_sum) / counts
+        expectancy = hit_rate * np.nan_to_num(avg_win) + (1 - hit_rate) * np.nan_to_num(avg_loss)
+
+    k, h = len(labels), len(horizons)
+    result = pd.DataFrame({
+        "信号": np.repeat(labels, h),
+        "方向": np.repeat(np.where(sell[:, 0], "空", "多"), h),
+        "周期": np.tile(horizons, k),
+        "次数": counts.astype(int).ravel(),
+        "命中率 (%)": (hit_rate * 100).ravel(),
+        "平均收益 (%)": (avg_return * 100).ravel(),
+        "平均盈利 (%)": (avg_win * 100).ravel(),
+        "平均亏损 (%)": (avg_loss * 100).ravel(),
+        "平均MFE (%)": (avg_mfe * 100).ravel(),
+        "平均MAE (%)": (avg_mae * 100).ravel(),
+        "期望值 (%)": (expectancy * 100).ravel(),
+    })
+    return result[result["次数"] > 0].reset_index(drop=True)
+
+
+def main():
+    from data_fetch import fetch_all, get_vix_data
+    from pipeline import DEFAULT_PARAMS, prepare_data
+
+    parser = argparse.ArgumentParser(description="異動標記信号多周期回测")
+    parser.add_argument("--tickers", default="TSLA,NIO,TSLL,XPEV,META", help="股票代號（逗號分隔）")
+    parser.add_argument("--period", default="10y")
+    parser.add_argument("--interval", default="1d")
+    parser.add_argument("--horizons", type=int, default=10, help="最大持有K线数 N")
+    parser.add_argument("--output", help="结果另存为 CSV")
+    args = parser.parse_args()
+
+    tickers = [t.strip().upper() for t in args.tickers.split(",") if t.strip()]
+    vix_data = get_vix_data(args.period, args.interval)
+    frames = {}
+    for ticker, fetched in fetch_all(tickers, args.period, args.interval).items():
+        if fetched["error"] is not None or fetched["data"].empty:
+            print(f"[{ticker}] 無法取得資料：{fetched['error']}")
+            continue
+        frames[ticker] = prepare_data(fetched["data"], vix_data, DEFAULT_PARAMS)
+
+    result = backtest_signals(frames, args.horizons)
+    if args.output:
+        result.to_csv(args.output, index=False)
+    with pd.option_context("display.max_rows", None, "display.width", 200):
+        print(result[result["周期"] == args.horizons].sort_values("期望值 (%)", ascending=False).round(2).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import os
+import threading
+from datetime import timedelta
+
+import pandas as pd
+import yfinance as yf
+
+# 增量K线缓存：每个 (股票, 间隔, 时间范围) 首次完整回补，之后只向 yfinance 请求最后一根K线之后的数据，
+# 同时保存在内存与磁盘（Parquet），重启后无需重新回补
+
+BAR_STORE_DIR = os.getenv("BAR_STORE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "bars"))
+# 距上次K线超过此间隔就重新完整回补（yfinance 1m 数据只保留约 7 天）
+MAX_INCREMENTAL_GAP = timedelta(days=5)
+
+_memory = {}
+_lock = threading.Lock()
+stats = {"backfills": 0, "incremental": 0, "disk_loads": 0}
+
+
+def _count(name):
+    with _lock:
+        stats[name] += 1
+
+
+def _normalize(data):
+    data = data.reset_index()
+    if "Date" in data.columns:
+        data = data.rename(columns={"Date": "Datetime"})
+    return data
+
+
+def _path(ticker, interval, period):
+    safe = ticker.replace("^", "_").replace("/", "_")
+    return os.path.join(BAR_STORE_DIR, f"{safe}_{interval}_{period}.parquet")
+
+
+def _load_disk(key):
+    path = _path(*key)
+    if not os.path.exists(path):
+        return None
+    try:
+        data = pd.read_parquet(path)
+    except Exception:
+        return None
+    _count("disk_loads")
+    return data
+
+
+def _save_disk(key, data):
+    try:
+        os.makedirs(BAR_STORE_DIR, exist_ok=True)
+        data.to_parquet(_path(*key), index=False)
+    except Exception:
+        pass  # 磁盘缓存失败（如未安装 pyarrow）时只保留内存缓存
+
+
+def trim_to_period(data, period):
+    """按 period 保留最近一段数据，与 yfinance period 语义一致（Nd 为最近 N 个交易日）"""
+    if data.empty or period == "max":
+        return data
+    ts = data["Datetime"]
+    last = ts.iloc[-1]
+    if period.endswith("d"):
+        sessions = ts.dt.normalize()
+        keep_sessions = sessions.drop_duplicates().iloc[-int(period[:-1]):]
+        mask = sessions.isin(keep_sessions)
+    else:
+        if period == "ytd":
+            cutoff = last.normalize().replace(month=1, day=1)
+        elif period.endswith("mo"):
+            cutoff = last - pd.DateOffset(months=int(period[:-2]))
+        else:
+            cutoff = last - pd.DateOffset(years=int(period[:-1]))
+        mask = ts >= cutoff
+    return data[mask].reset_index(drop=True)
+
+
+def merge_tail(stored, tail):
+    """以新抓取的尾段替换仍在形成中的最后一根K线并追加新K线"""
+    if tail is None or tail.empty:
+        return stored
+    first_new = tail["Datetime"].iloc[0]
+    kept = stored[stored["Datetime"] < first_new]
+    return pd.concat([kept, tail], ignore_index=True)
+
+
+def get_bars(ticker, period, interval, timeout=20, stock=None):
+    """取得 (ticker, interval, period) 的K线；有缓存时只增量抓取尾段"""
+    key = (ticker, interval, period)
+    stock = stock or yf.Ticker(ticker)
+    with _lock:
+        stored = _memory.get(key)
+    if stored is None:
+        stored = _load_disk(key)
+
+    now = pd.Timestamp.now(tz="UTC")
+    if stored is not None and not stored.empty:
+        last_ts = stored["Datetime"].iloc[-1]
+        last_utc = last_ts.tz_convert("UTC") if last_ts.tzinfo else last_ts.tz_localize("UTC")
+        if now - last_utc <= MAX_INCREMENTAL_GAP:
+            try:
+                tail = _normalize(stock.history(start=last_ts, interval=interval, timeout=timeout))
+                data = trim_to_period(merge_tail(stored, tail), period)
+                _count("incremental")
+            except Exception:
+                data = None
+        else:
+            data = None
+    else:
+        data = None
+
+    if data is None:
+        data = _normalize(stock.history(period=period, interval=interval, timeout=timeout))
+        _count("backfills")
+
+    if not data.empty:
+        with _lock:
+            _memory[key] = data
+        _save_disk(key, data)
+    return data.copy()
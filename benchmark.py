@@ -0,0 +1,191 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from pipeline import (DEFAULT_PARAMS, SIGNAL_PARAM_KEYS, new_indicator_state, prepare_data, compute_kline_patterns,
+                      calculate_signal_success_rate, detect_latest_signals, analyze_ticker)
+from signal_engine import mark_signals
+from percentiles import percentile_ranges
+from chart import build_chart
+from analysis_pool import analyze_many
+
+# 离线基准测试：以合成 OHLCV + VIX 数据逐段计时分析流水线，不访问 Yahoo、不启动 Streamlit，
+# 结果写入 JSON，可与上一次的报告对比
+#
+#   python benchmark.py --bars 1000,10000,100000 --tickers 1,50 --compare data/bench_old.json
+
+BENCH_OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "bench.json")
+INTERVAL_FREQ = {"1m": "1min", "5m": "5min", "15m": "15min", "30m": "30min", "60m": "60min", "1h": "60min", "1d": "1D"}
+
+
+def synthetic_frame(n_bars, seed=0, interval="5m", start="2020-01-02 09:30", tz="America/New_York"):
+    """生成一只股票的合成K线（几何布朗运动 + 跳空 + 对数正态成交量）与对齐的 VIX"""
+    rng = np.random.default_rng(seed)
+    times = pd.date_range(start, periods=n_bars, freq=INTERVAL_FREQ[interval], tz=tz)
+    returns = rng.normal(0, 0.004, n_bars)
+    jumps = rng.random(n_bars) < 0.01
+    returns[jumps] += rng.normal(0, 0.02, jumps.sum())
+    close = 100 * np.exp(np.cumsum(returns))
+    open_ = np.concatenate([[close[0]], close[:-1]]) * (1 + rng.normal(0, 0.002, n_bars))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.002, n_bars)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.002, n_bars)))
+    volume = np.round(rng.lognormal(11, 0.6, n_bars))
+    data = pd.DataFrame({"Datetime": times, "Open": open_, "High": high, "Low": low, "Close": close,
+                         "Volume": volume})
+    vix_close = 20 + np.cumsum(rng.normal(0, 0.15, n_bars))
+    vix_data = pd.DataFrame({"Datetime": times, "Close": np.clip(vix_close, 9, 80)})
+    vix_data["VIX Change %"] = vix_data["Close"].pct_change().round(4) * 100
+    return data, vix_data
+
+
+def synthetic_universe(n_tickers, n_bars, interval="5m", seed=0):
+    """多只股票共用同一条 VIX，返回 ({ticker: data}, vix_data)"""
+    frames = {}
+    vix_data = None
+    for i in range(n_tickers):
+        data, vix = synthetic_frame(n_bars, seed + i, interval)
+        frames[f"SYN{i:03d}"] = data
+        vix_data = vix if vix_data is None else vix_data
+    return frames, vix_data
+
+
+def _time(fn, repeat):
+    """执行 repeat 次，返回每次耗时（秒）"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def stage_benchmarks(n_bars, params, repeat=3, interval="5m"):
+    """单只股票各阶段耗时，返回 [{stage, bars, ...}]"""
+    data, vix_data = synthetic_frame(n_bars, interval=interval)
+    prepared = prepare_data(data.copy(), vix_data, params)
+    signal_params = {key: params[key] for key in SIGNAL_PARAM_KEYS}
+
+    # 增量指标：状态先提交到倒数第二根，每次只推进最新一根
+    state = new_indicator_state(params)
+    state.update(data.iloc[:-1])
+
+    stages = {
+        "indicators_full": lambda: new_indicator_state(params).update(data),
+        "indicators_incremental": lambda: state.update(data),
+        "prepare_data": lambda: prepare_data(data.copy(), vix_data, params),
+        "mark_signals": lambda: mark_signals(prepared, **signal_params),
+        "kline_patterns": lambda: compute_kline_patterns(prepared, params["body_ratio_threshold"],
+                                                         params["shadow_ratio_threshold"],
+                                                         params["doji_body_threshold"]),
+        "latest_signals": lambda: detect_latest_signals(prepared, params),
+        "success_rate": lambda: calculate_signal_success_rate(prepared.copy()),
+        "percentile_ranges": lambda: percentile_ranges(prepared, 5),
+        "chart_build": lambda: build_chart(prepared, "SYN", 50),
+        "chart_json": lambda: build_chart(prepared, "SYN", 50).to_json(),
+        "analyze_ticker": lambda: analyze_ticker("SYN", data.copy(), vix_data, None, params, interval),
+    }
+    results = []
+    for name, fn in stages.items():
+        fn()  # 预热（导入、缓存）
+        timings = _time(fn, repeat)
+        results.append(_record(name, n_bars, 1, timings))
+    return results
+
+
+def universe_benchmark(n_tickers, n_bars, params, repeat=3, interval="5m"):
+    """多只股票经进程池（analysis_pool）完整分析一个周期的耗时"""
+    frames, vix_data = synthetic_universe(n_tickers, n_bars, interval)
+
+    def run():
+        jobs = {t: (t, d.copy(), vix_data, None, params, interval, None) for t, d in frames.items()}
+        for ticker, (result, _) in analyze_many(jobs).items():
+            if isinstance(result, Exception):
+                raise result
+
+    run()
+    return _record("analyze_many", n_bars, n_tickers, _time(run, repeat))
+
+
+def _record(stage, n_bars, n_tickers, timings):
+    best = min(timings)
+    return {
+        "stage": stage,
+        "bars": n_bars,
+        "tickers": n_tickers,
+        "repeat": len(timings),
+        "min_s": best,
+        "median_s": statistics.median(timings),
+        "bars_per_s": n_bars * n_tickers / best if best > 0 else None,
+    }
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except Exception:
+        commit = None
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+    }
+
+
+def compare(results, baseline):
+    """与上一次报告按 (stage, bars, tickers) 对比，返回 DataFrame（ratio < 1 表示变快）"""
+    key = ["stage", "bars", "tickers"]
+    new = pd.DataFrame(results)[key + ["min_s"]]
+    old = pd.DataFrame(baseline["results"])[key + ["min_s"]]
+    merged = new.merge(old, on=key, how="left", suffixes=("", "_baseline"))
+    merged["ratio"] = merged["min_s"] / merged["min_s_baseline"]
+    return merged
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分析流水线离线基准测试")
+    parser.add_argument("--bars", default="1000,10000,100000", help="单只股票K线数（逗號分隔，最多约 1000000）")
+    parser.add_argument("--tickers", default="1,50", help="多股票周期测试的股票数（逗號分隔，最多约 500）")
+    parser.add_argument("--ticker-bars", type=int, default=2000, help="多股票测试中每只股票的K线数")
+    parser.add_argument("--interval", default="5m", choices=sorted(INTERVAL_FREQ))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default=BENCH_OUTPUT, help="JSON 报告路径")
+    parser.add_argument("--compare", help="上一次的 JSON 报告，输出耗时对比")
+    args = parser.parse_args()
+
+    params = dict(DEFAULT_PARAMS)
+    results = []
+    for n_bars in (int(b) for b in args.bars.split(",") if b.strip()):
+        print(f"單只股票 {n_bars:,} 根K線 ...")
+        results += stage_benchmarks(n_bars, params, args.repeat, args.interval)
+    for n_tickers in (int(t) for t in args.tickers.split(",") if t.strip()):
+        print(f"{n_tickers} 只股票 × {args.ticker_bars:,} 根K線 ...")
+        results.append(universe_benchmark(n_tickers, args.ticker_bars, params, args.repeat, args.interval))
+
+    report = {"environment": environment(), "results": results}
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    table = pd.DataFrame(results)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            table = compare(results, json.load(f))
+    print(table.to_string(index=False, float_format=lambda x: f"{x:.4f}"))
+    print(f"報告已寫入 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import numpy as np
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+from signal_engine import SIGNALS, SIGNAL_MASK_COLUMN, prefix_bits
+
+# K线图：每种信号一条散点 trace（由布尔掩码一次取出全部触发点），取代逐根K线 add_annotation/add_scatter
+
+# (異動標記前缀, 子图行, 标记形状, 颜色, 文字位置, 文字模板)；行 2/3 的标记画在 OBV/MFI 上
+# 除关键转折点外，其余由信号表的 chart 栏生成
+CHART_MARKERS = [("🔥 关键转折点", 1, "star", "yellow", "top center", "🔥 转折点 $%{y:.2f}")] + [
+    (s.label,) + s.chart for s in SIGNALS if s.chart]
+_MARKER_BITS = {prefix: prefix_bits(prefix) for prefix, *_ in CHART_MARKERS}
+_ROW_VALUE = {1: "Close", 2: "OBV", 3: "MFI"}
+
+
+def marker_masks(data, window):
+    """最近 window 根K线中各标记的布尔掩码 {名称: ndarray}；与原逐根循环一致，窗口第一根不标记"""
+    view = data.tail(window)
+    masks = {}
+    # EMA5/EMA10 交叉直接由指标列判断（图上不要求放量，与異動標記中的 EMA買入/賣出 不同）
+    ema5, ema10 = data["EMA5"].to_numpy(), data["EMA10"].to_numpy()
+    prev5, prev10 = np.roll(ema5, 1), np.roll(ema10, 1)
+    cross_up = ((ema5 > ema10) & (prev5 <= prev10))[-len(view):]
+    cross_down = ((ema5 < ema10) & (prev5 >= prev10))[-len(view):]
+    masks["📈 EMA買入"] = cross_up
+    masks["📉 EMA賣出"] = cross_down & ~cross_up
+
+    codes = view[SIGNAL_MASK_COLUMN].to_numpy(dtype=np.int64)
+    for prefix, bits in _MARKER_BITS.items():
+        masks[prefix] = (codes & bits) != 0
+    for mask in masks.values():
+        mask[:1] = False
+    return view, masks
+
+
+def build_chart(data, ticker, window=50):
+    """K线（含 EMA/VWAP）、成交量/OBV、RSI/MFI 三个子图，信号按类型合并为散点 trace"""
+    view, masks = marker_masks(data, window)
+    x = view["Datetime"]
+    fig = make_subplots(rows=3, cols=1, shared_xaxes=True,
+                        subplot_titles=(f"{ticker} K線與EMA/VWAP", "成交量/OBV", "RSI/MFI"),
+                        vertical_spacing=0.1, row_heights=[0.5, 0.2, 0.3])
+
+    # 添加 K 线图
+    fig.add_trace(go.Candlestick(x=x, open=view["Open"], high=view["High"], low=view["Low"], close=view["Close"],
+                                 name="K線"), row=1, col=1)
+
+    # 添加 EMA5、EMA10、EMA30 和 EMA40
+    for column in ("EMA5", "EMA10", "EMA30", "EMA40"):
+        fig.add_trace(go.Scatter(x=x, y=view[column], mode="lines", name=column), row=1, col=1)
+
+    # 新增：VWAP 線（主圖）
+    fig.add_trace(go.Scatter(x=x, y=view["VWAP"], mode='lines', name='VWAP', line=dict(color='purple', width=2)),
+                  row=1, col=1)
+
+    # 添加成交量柱状图
+    fig.add_bar(x=x, y=view["Volume"], name="成交量", opacity=0.5, row=2, col=1)
+
+    # 新增：OBV 線（成交量子圖，secondary_y）
+    fig.add_trace(go.Scatter(x=x, y=view["OBV"], mode='lines', name='OBV', yaxis="y2",
+                             line=dict(color='orange', width=2)), row=2, col=1)
+    fig.add_hline(y=0, line_dash="dash", line_color="black", row=2, col=1)
+    fig.update_layout(yaxis2=dict(overlaying="y", side="right", title="OBV"))
+
+    # 添加 RSI 子图
+    fig.add_trace(go.Scatter(x=x, y=view["RSI"], mode="lines", name="RSI"), row=3, col=1)
+    fig.add_hline(y=70, line_dash="dash", line_color="red", row=3, col=1)  # 超买线
+    fig.add_hline(y=30, line_dash="dash", line_color="green", row=3, col=1)  # 超卖线
+
+    # 新增：MFI 線（RSI子圖，secondary_y）
+    fig.add_trace(go.Scatter(x=x, y=view["MFI"], mode='lines', name='MFI', yaxis="y3",
+                             line=dict(color='brown', width=2)), row=3, col=1)
+    fig.add_hline(y=80, line_dash="dash", line_color="red", row=3, col=1, yref="y3")  # MFI超买
+    fig.add_hline(y=20, line_dash="dash", line_color="green", row=3, col=1, yref="y3")  # MFI超卖
+    fig.update_layout(yaxis3=dict(overlaying="y", side="right", title="MFI", range=[0, 100]))
+
+    # 信号标记：每种信号一条 trace，只包含触发的K线
+    markers = [("📈 EMA買入", 1, "triangle-up", "green", "bottom center", "📈 EMA買入"),
+               ("📉 EMA賣出", 1, "triangle-down", "red", "top center", "📉 EMA賣出")] + CHART_MARKERS
+    for name, row, symbol, color, position, template in markers:
+        mask = masks[name]
+        if not mask.any():
+            continue
+        fig.add_trace(go.Scatter(x=x[mask], y=view[_ROW_VALUE[row]][mask], mode="markers+text", name=name,
+                                 marker=dict(symbol=symbol, size=10, color=color),
+                                 texttemplate=template, textposition=position), row=row, col=1)
+
+    fig.update_layout(yaxis_title="價格", yaxis2_title="成交量", yaxis3_title="RSI", showlegend=True)
+    return fig
@@ -0,0 +1,147 @@
+import argparse
+import json
+import time
+from datetime import datetime
+
+from data_fetch import fetch_all, CycleCache, get_vix_data
+from pipeline import DEFAULT_PARAMS, new_indicator_state
+from analysis_pool import analyze_many
+from alerts import build_email_alert, get_dispatcher
+from result_store import save_result
+from alert_state import AlertStateStore, ALERT_STATE_PATH
+from history_archive import append_history
+from data_provider import get_provider, set_provider, ReplayProvider
+from stage_timing import timer, start_metrics_server, METRICS_PORT
+
+# 背景监控服务：与页面无关地持续抓取、计算并发送提醒，每个周期把结果写入 data/latest/，
+# Streamlit 页面勾选“使用背景監控服務結果”后直接读取
+#
+#   python daemon.py --tickers TSLA,NIO,TSLL,XPEV,META --period 5d --interval 5m --refresh 144
+#
+# 回放模式：以已保存的K线代替 yfinance，模拟时钟每周期前进 --refresh 秒，提醒只计数不发送、不写结果与归档，
+# 结束时输出每分钟回放的模拟交易日数
+#
+#   python daemon.py --replay data/archive --replay-speed 0 --refresh 300
+
+
+def run_cycle(tickers, period, interval, params, states, vix_cache, cycle, dispatcher, alert_state, replay=False):
+    """执行一个周期；replay=True 时提醒只计数不发送、不写结果与归档，返回本周期通过去重/冷却的提醒数"""
+    provider = get_provider()
+    alerts = 0
+    vix_cache.start_cycle(cycle)
+    fetch_results = fetch_all(tickers, period, interval)
+    vix_data = vix_cache.get(("^VIX", period, interval), lambda: get_vix_data(period, interval))
+
+    # 性能优化：各股票的分析在进程池中并行执行
+    jobs = {}
+    for ticker in tickers:
+        fetched = fetch_results[ticker]
+        if fetched["error"] is None and len(fetched["data"]) >= 2:
+            state = states.get((ticker, interval, period)) or new_indicator_state(params)
+            jobs[ticker] = (ticker, fetched["data"], vix_data, fetched["previous_close"], params, interval, state)
+    analyses = analyze_many(jobs)
+
+    for ticker in tickers:
+        try:
+            fetched = fetch_results[ticker]
+            if fetched["error"] is not None:
+                raise fetched["error"]
+            if ticker not in analyses:
+                print(f"[{ticker}] 無數據或數據不足（期間：{period}，間隔：{interval}）")
+                continue
+
+            result, state = analyses[ticker]
+            if isinstance(result, Exception):
+                raise result
+            states[(ticker, interval, period)] = state
+            result["updated_at"] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            if not replay:
+                save_result(result, period)
+                append_history(ticker, interval, result["data"])
+
+            if result["alert_msg"]:
+                metrics = result["metrics"]
+                bar_time = result["data"]["Datetime"].iloc[-1]
+                email_alert = ("email", ticker, interval, bar_time, result["signals"])
+                if replay:
+                    if alert_state.should_send(*email_alert, now=provider.now()):
+                        alert_state.mark_sent(*email_alert, now=provider.now())
+                        alerts += 1
+                        print(f"[{ticker}] {bar_time} 📣 {result['alert_msg']}")
+                    continue
+                print(f"[{ticker}] 📣 {result['alert_msg']}")
+                # 发送成功后才计入去重/冷却（on_result 由后台发送线程回调）
+                if alert_state.should_send(*email_alert):
+                    dispatcher.add_email(ticker, *build_email_alert(
+                        ticker, metrics["price_pct_change"], metrics["volume_pct_change"], result["signals"],
+                        price_change_threshold=params["price_change_threshold"],
+                        volume_change_threshold=params["volume_change_threshold"]),
+                        on_result=alert_state.on_result(*email_alert))
+                telegram_alert = ("telegram", ticker, interval, bar_time, params["telegram_signals"])
+                if result["telegram_msg"] and alert_state.should_send(*telegram_alert):
+                    dispatcher.add_telegram(result["telegram_msg"], on_result=alert_state.on_result(*telegram_alert))
+        except Exception as e:
+            print(f"[{ticker}] 無法取得資料：{e}，將跳過此股票")
+    # 本周期全部股票的提醒合并后由后台线程发送
+    if not replay:
+        dispatcher.flush()
+    return alerts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="股票監控背景服務")
+    parser.add_argument("--tickers", default="TSLA,NIO,TSLL,XPEV,META", help="股票代號（逗號分隔）")
+    parser.add_argument("--period", default="5d")
+    parser.add_argument("--interval", default="5m")
+    parser.add_argument("--refresh", type=int, default=144, help="刷新间隔（秒）")
+    parser.add_argument("--params", help="JSON 文件，覆盖 pipeline.DEFAULT_PARAMS 中的阈值")
+    parser.add_argument("--metrics-port", type=int, default=METRICS_PORT,
+                        help="Prometheus 指标端口（/metrics），0 表示不启动")
+    parser.add_argument("--replay", metavar="DIR", help="回放目录或文件（CSV/Parquet、bar 缓存或历史归档）")
+    parser.add_argument("--replay-speed", type=float, default=0.0, help="回放倍速，0 表示不等待")
+    parser.add_argument("--replay-start", help="回放起始时间（默认为数据第一天之后）")
+    args = parser.parse_args()
+
+    tickers = [t.strip().upper() for t in args.tickers.split(",") if t.strip()]
+    params = dict(DEFAULT_PARAMS)
+    if args.params:
+        with open(args.params, encoding="utf-8") as f:
+            params.update(json.load(f))
+
+    if args.replay:
+        set_provider(ReplayProvider.from_path(args.replay, interval=args.interval, speed=args.replay_speed,
+                                              start=args.replay_start))
+    provider = get_provider()
+    replay = provider.name == "replay"
+
+    if start_metrics_server(args.metrics_port) is not None:
+        print(f"Prometheus 指標：http://127.0.0.1:{args.metrics_port}/metrics")
+
+    states = {}  # (ticker, interval, period) -> IndicatorState
+    vix_cache = CycleCache()
+    dispatcher = get_dispatcher()
+    cooldown = params["alert_cooldown_minutes"] * 60
+    alert_state = AlertStateStore(path=None if replay else ALERT_STATE_PATH,
+                                  cooldowns={"email": cooldown, "telegram": cooldown})
+    cycle = 0
+    alerts = 0
+    replay_started = time.time()
+    while not provider.finished:
+        cycle += 1
+        started = time.time()
+        alerts += run_cycle(tickers, args.period, args.interval, params, states, vix_cache, cycle, dispatcher,
+                            alert_state, replay=replay)
+        timer.end_cycle(time.time() - started, args.refresh)
+        clock = (provider.clock if replay else datetime.now()).strftime('%Y-%m-%d %H:%M:%S')
+        print(f"⏱ {clock} 第 {cycle} 輪完成，用時 {time.time() - started:.1f}s")
+        provider.sleep(args.refresh)
+
+    if replay:
+        elapsed = time.time() - replay_started
+        days, _ = provider.progress()
+        print(f"回放完成：{cycle} 輪，{days} 個模擬交易日，提醒 {alerts} 次，用時 {elapsed:.1f}s，"
+              f"約 {days / max(elapsed, 1e-9) * 60:.1f} 交易日/分鐘")
+
+
+if __name__ == "__main__":
+    main()
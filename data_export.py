@@ -0,0 +1,43 @@
+import io
+import zipfile
+
+from signal_engine import SIGNAL_MASK_COLUMN, signal_text
+
+# 数据导出：只在用户选择导出格式后才序列化，单只股票与多股票打包共用同一份序列化结果；
+# 导出文件同时包含異動標記位掩码与解码后的文字列，便于在表格软件中阅读
+
+EXPORT_FORMATS = {
+    "CSV": ("csv", "text/csv"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+    "Arrow (Feather)": ("arrow", "application/vnd.apache.arrow.file"),
+}
+
+
+def to_bytes(data, fmt):
+    """把分析结果序列化为指定格式的 bytes"""
+    if SIGNAL_MASK_COLUMN in data.columns and "異動標記" not in data.columns:
+        data = data.assign(異動標記=signal_text(data[SIGNAL_MASK_COLUMN]))
+    if fmt == "CSV":
+        return data.to_csv(index=False).encode("utf-8")
+    buf = io.BytesIO()
+    if fmt == "Parquet":
+        data.to_parquet(buf, index=False)
+    elif fmt == "Arrow (Feather)":
+        data.reset_index(drop=True).to_feather(buf)
+    else:
+        raise ValueError(f"不支援的匯出格式：{fmt}")
+    return buf.getvalue()
+
+
+def file_name(ticker, fmt, stamp):
+    return f"{ticker}_數據_{stamp}.{EXPORT_FORMATS[fmt][0]}"
+
+
+def bundle(files):
+    """多股票打包为 ZIP：files 为 {文件名: bytes}；CSV 压缩，Parquet/Arrow 本身已压缩则直接存储"""
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        for name, payload in files.items():
+            method = zipfile.ZIP_DEFLATED if name.endswith(".csv") else zipfile.ZIP_STORED
+            zf.writestr(name, payload, compress_type=method)
+    return buf.getvalue()
@@ -0,0 +1,85 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from data_provider import get_provider
+from stage_timing import timed
+
+# 并发抓取：整个自选清单一次性以有界线程池下载，单只股票慢或失败不拖累其他股票
+
+FETCH_MAX_WORKERS = 8
+FETCH_TIMEOUT = 20  # 秒，单只股票 history 请求超时
+
+
+def fetch_ticker(ticker, period, interval, timeout=FETCH_TIMEOUT):
+    """抓取单只股票的历史K线与前收盘价（经当前数据源，默认 yfinance）"""
+    return get_provider().fetch(ticker, period, interval, timeout)
+
+
+def fetch_all(tickers, period, interval, max_workers=FETCH_MAX_WORKERS, timeout=FETCH_TIMEOUT, fetcher=fetch_ticker):
+    """并发抓取全部股票，返回 {ticker: {"data", "previous_close", "error"}}
+
+    单只股票最多占用 timeout 的两倍（history + info/日K线），整批按线程池轮数计算等待上限；
+    超时或出错的股票记为 error，其余股票照常返回。
+    """
+    results = {}
+    if not tickers:
+        return results
+    workers = min(max_workers, len(tickers))
+    rounds = -(-len(tickers) // workers)
+    executor = ThreadPoolExecutor(max_workers=workers)
+    futures = {executor.submit(fetcher, ticker, period, interval, timeout): ticker for ticker in tickers}
+    done, not_done = wait(futures, timeout=timeout * 2 * rounds)
+    for future in done:
+        ticker = futures[future]
+        try:
+            results[ticker] = dict(future.result(), error=None)
+        except Exception as e:
+            results[ticker] = {"data": None, "previous_close": None, "error": e}
+    for future in not_done:
+        ticker = futures[future]
+        future.cancel()
+        results[ticker] = {"data": None, "previous_close": None,
+                           "error": TimeoutError(f"{ticker} 抓取超時")}
+    # 不等待仍在执行的慢请求，线程结束后自行回收
+    executor.shutdown(wait=False, cancel_futures=True)
+    return results
+
+
+class CycleCache:
+    """刷新周期内共享的取数缓存（如 ^VIX），同一周期同一 key 只下载一次"""
+
+    def __init__(self):
+        self.cycle = None
+        self.hits = 0
+        self.misses = 0
+        self._store = {}
+        self._lock = threading.Lock()
+
+    def start_cycle(self, cycle):
+        """进入新周期时清空上一周期的数据，计数器累计保留"""
+        with self._lock:
+            if cycle != self.cycle:
+                self.cycle = cycle
+                self._store.clear()
+
+    def get(self, key, loader):
+        with self._lock:
+            if key in self._store:
+                self.hits += 1
+                return self._store[key]
+            self.misses += 1
+            value = loader()
+            self._store[key] = value
+            return value
+
+    def stats(self):
+        return {"cycle": self.cycle, "hits": self.hits, "misses": self.misses}
+
+
+# 新增：VIX 获取函数
+def get_vix_data(period, interval):
+    with timed("vix", "^VIX") as rec:
+        vix_data = get_provider().vix(period, interval)
+        rec["rows"] = len(vix_data)
+    vix_data["VIX Change %"] = vix_data["Close"].pct_change().round(4) * 100
+    return vix_data
@@ -0,0 +1,233 @@
+import glob
+import os
+import threading
+import time
+
+import pandas as pd
+import yfinance as yf
+
+from bar_store import get_bars, trim_to_period
+from quote_cache import get_previous_close, MARKET_TZ
+from stage_timing import timed
+
+# 数据源：刷新流水线（页面、daemon.py、扫描）只通过 get_provider() 取K线、前收盘价与 VIX，
+# 默认 yfinance；回放数据源把已保存的K线（下载按钮导出的 CSV/Parquet、bar 缓存、历史归档）
+# 按模拟时钟逐步放出，用于离线开发、重现问题与压测
+#
+#   DATA_PROVIDER=replay REPLAY_DIR=data/archive streamlit run buy.v1.py
+#   python daemon.py --replay data/archive --replay-speed 0
+
+OHLCV_COLUMNS = ["Datetime", "Open", "High", "Low", "Close", "Volume"]
+YF_INTERVALS = {"1m", "2m", "5m", "15m", "30m", "60m", "90m", "1h", "1d", "5d", "1wk", "1mo", "3mo"}
+
+
+class YFinanceProvider:
+    """实时数据：yfinance + 增量K线缓存 + 每日报价缓存"""
+
+    name = "yfinance"
+
+    def fetch(self, ticker, period, interval, timeout=20):
+        """抓取单只股票的历史K线与前收盘价"""
+        stock = yf.Ticker(ticker)
+        with timed("history", ticker) as rec:
+            data = get_bars(ticker, period, interval, timeout=timeout, stock=stock)
+            rec["rows"] = len(data)
+        # 性能优化：前收盘价按交易日缓存，不再每个周期请求 stock.info
+        try:
+            with timed("previous_close", ticker):
+                previous_close = get_previous_close(ticker, stock, timeout)
+        except Exception:
+            previous_close = None
+        return {"data": data, "previous_close": previous_close}
+
+    def vix(self, period, interval):
+        vix_data = get_bars("^VIX", period, interval)  # 性能优化：增量K线缓存
+        if "Date" in vix_data.columns:
+            vix_data = vix_data.rename(columns={"Date": "Datetime"})
+        return vix_data
+
+    def now(self):
+        return time.time()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+    @property
+    def finished(self):
+        return False
+
+
+class ReplayProvider:
+    """回放已保存的K线：模拟时钟从 start 开始，每次 sleep(seconds) 前进 seconds 秒
+
+    speed 为加速倍数（1 为实时，60 表示 1 分钟走完 1 小时），0 表示不等待、尽快回放（并跳过没有新K线的时段）。
+    只放出在模拟时钟之前已完成的K线，请求的 interval 以文件中的K线间隔为准，period 照常裁剪。
+    """
+
+    name = "replay"
+
+    def __init__(self, frames, speed=0.0, start=None, tz=MARKET_TZ):
+        self.frames = {ticker: _normalize(data, tz) for ticker, data in frames.items()}
+        self.frames = {ticker: data for ticker, data in self.frames.items() if not data.empty}
+        if not self.frames:
+            raise ValueError("回放資料為空")
+        self.speed = speed
+        self.first = min(data["Datetime"].iloc[0] for data in self.frames.values())
+        self.last = max(data["Datetime"].iloc[-1] for data in self.frames.values())
+        # 默认从第一天之后开始，让首个周期已有一段历史
+        self.start = _to_tz(pd.Timestamp(start), tz) if start is not None else self.first + pd.Timedelta(days=1)
+        self.clock = self.start
+        self._bar_length = {ticker: data["Datetime"].diff().median() for ticker, data in self.frames.items()}
+        self._days = pd.DatetimeIndex(sorted({d for data in self.frames.values()
+                                              for d in data["Datetime"].dt.normalize().unique()}))
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_path(cls, path, interval=None, speed=0.0, start=None, tz=MARKET_TZ):
+        """读取目录（或单个文件）中的 CSV/Parquet
+
+        文件名第一段为股票代號（如 TSLA_數據_20260101_093000.csv、bar 缓存的 TSLA_5m_5d.parquet，
+        _VIX 对应 ^VIX）；子目录按历史归档的 <股票>/<间隔>/<月份>.parquet 读取。
+        指定 interval 时跳过其他间隔的 bar 缓存文件与归档目录；同一股票的多个文件合并并按 Datetime 去重。
+        """
+        if os.path.isfile(path):
+            files = [(path, _ticker_from_name(os.path.basename(path)))]
+        else:
+            files = []
+            for file in sorted(glob.glob(os.path.join(path, "*.csv")) + glob.glob(os.path.join(path, "*.parquet"))):
+                tokens = os.path.splitext(os.path.basename(file))[0].lstrip("_").split("_")
+                if interval and len(tokens) >= 3 and tokens[1] in YF_INTERVALS and tokens[1] != interval:
+                    continue
+                files.append((file, _ticker_from_name(os.path.basename(file))))
+            for directory in sorted(d for d in glob.glob(os.path.join(path, "*")) if os.path.isdir(d)):
+                ticker = _ticker_from_name(os.path.basename(directory), whole=True)
+                pattern = os.path.join(directory, interval or "*", "*.parquet")
+                files += [(file, ticker) for file in sorted(glob.glob(pattern))]
+        pieces = {}
+        for file, ticker in files:
+            data = pd.read_csv(file) if file.endswith(".csv") else pd.read_parquet(file)
+            if "Date" in data.columns and "Datetime" not in data.columns:
+                data = data.rename(columns={"Date": "Datetime"})
+            pieces.setdefault(ticker, []).append(data[OHLCV_COLUMNS])
+        frames = {ticker: pd.concat(parts, ignore_index=True) for ticker, parts in pieces.items()}
+        return cls(frames, speed=speed, start=start, tz=tz)
+
+    def _visible(self, ticker, period):
+        data = self.frames[ticker]
+        with self._lock:
+            clock = self.clock
+        end = data["Datetime"].searchsorted(clock - self._bar_length[ticker], side="right")
+        return trim_to_period(data.iloc[:end].reset_index(drop=True), period), clock
+
+    def fetch(self, ticker, period, interval, timeout=20):
+        if ticker not in self.frames:
+            raise KeyError(f"{ticker} 無回放資料")
+        with timed("history", ticker) as rec:
+            data, clock = self._visible(ticker, period)
+            rec["rows"] = len(data)
+        # 前收盘价：模拟当日之前最后一根K线的收盘价
+        before_today = data[data["Datetime"] < clock.normalize()]
+        previous_close = float(before_today["Close"].iloc[-1]) if not before_today.empty else None
+        return {"data": data, "previous_close": previous_close}
+
+    def vix(self, period, interval):
+        if "^VIX" not in self.frames:
+            return pd.DataFrame(columns=["Datetime", "Close"])
+        return self._visible("^VIX", period)[0]
+
+    def now(self):
+        with self._lock:
+            return self.clock.timestamp()
+
+    def sleep(self, seconds):
+        with self._lock:
+            previous = self.clock
+            self.clock += pd.Timedelta(seconds=seconds)
+            if not self.speed:
+                # 尽快回放时跳过收盘后、周末等没有新K线完成的时段，直接到下一根K线完成的时刻
+                upcoming = [self._next_close(ticker, previous) for ticker in self.frames]
+                upcoming = [t for t in upcoming if t is not None]
+                if upcoming and min(upcoming) > self.clock:
+                    self.clock = min(upcoming)
+        if self.speed:
+            time.sleep(seconds / self.speed)
+
+    def _next_close(self, ticker, after):
+        """after 之后第一根完成的K线的完成时刻"""
+        closes = self.frames[ticker]["Datetime"] + self._bar_length[ticker]
+        i = closes.searchsorted(after, side="right")
+        return closes.iloc[i] if i < len(closes) else None
+
+    @property
+    def finished(self):
+        with self._lock:
+            return self.clock > self.last + max(self._bar_length.values())
+
+    def progress(self):
+        """(已回放的交易日数, 回放范围内的交易日总数)"""
+        with self._lock:
+            clock = self.clock
+        first = int(self._days.searchsorted(self.start.normalize()))
+        return int(self._days.searchsorted(clock, side="right")) - first, len(self._days) - first
+
+
+def _ticker_from_name(name, whole=False):
+    """文件名（whole=True 时为归档目录名）转股票代號，开头的 _ 还原为 ^"""
+    stem = name if whole else os.path.splitext(name)[0]
+    index = stem.startswith("_")
+    stem = stem.lstrip("_")
+    if not whole:
+        stem = stem.split("_")[0]
+    return "^" + stem if index else stem
+
+
+def _to_tz(ts, tz):
+    return ts.tz_localize(tz) if ts.tzinfo is None else ts.tz_convert(tz)
+
+
+_OFFSET = r"\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?\s*(?:Z|[+-]\d{2}:?\d{2})$"  # 时间后带时差（-05:00、Z）
+
+
+def _localize(times, tz):
+    """时间列转为市场时区：带时差的换算，不带时差的（如日K的 2024-01-02）视为市场当地时间"""
+    if pd.api.types.is_datetime64_any_dtype(times):
+        return times.dt.tz_localize(tz) if times.dt.tz is None else times.dt.tz_convert(tz)
+    text = times.astype(str).str.strip()
+    aware = text.str.contains(_OFFSET)
+    # 夏令时前后时差不同（-05:00 / -04:00），先统一换算为 UTC
+    parts = [pd.to_datetime(text[aware], utc=True).dt.tz_convert(tz),
+             pd.to_datetime(text[~aware]).dt.tz_localize(tz)]
+    return pd.concat([p for p in parts if len(p)] or parts[:1]).sort_index()
+
+
+def _normalize(data, tz):
+    data = data.copy()
+    data["Datetime"] = _localize(data["Datetime"], tz)
+    return (data.drop_duplicates("Datetime", keep="last").sort_values("Datetime", kind="stable")
+            .reset_index(drop=True))
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_provider():
+    """当前数据源；环境变量 DATA_PROVIDER=replay 时以 REPLAY_DIR / REPLAY_INTERVAL / REPLAY_SPEED / REPLAY_START
+    建立回放数据源"""
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            if os.getenv("DATA_PROVIDER", "yfinance") == "replay":
+                _provider = ReplayProvider.from_path(os.getenv("REPLAY_DIR", "data/archive"),
+                                                     interval=os.getenv("REPLAY_INTERVAL"),
+                                                     speed=float(os.getenv("REPLAY_SPEED", "0")),
+                                                     start=os.getenv("REPLAY_START"))
+            else:
+                _provider = YFinanceProvider()
+        return _provider
+
+
+def set_provider(provider):
+    global _provider
+    with _provider_lock:
+        _provider = provider
@@ -0,0 +1,256 @@
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from signal_engine import KEY_PIVOT_LABEL, MASK_LABELS, SIGNAL_BITS, SIGNAL_MASK_COLUMN, signal_bits
+
+# 历史归档：每个周期的K线、指标与異動標記按 股票/间隔/月份 分区写入 Parquet，按 Datetime 去重，
+# 成功率、百分位等统计可跨数月历史计算而无需重新下载
+#
+#   data/archive/TSLA/5m/2026-10.parquet                         月分区（已合并）
+#   data/archive/TSLA/5m/2026-10~1792222222000000000-123.parquet  本周期新增K线（增量文件）
+#
+# 性能优化：每个周期只写入新增的一两根K线（增量文件，文件名排在所属月分区之后），不再读取并改写整个月分区；
+# 读取时同月的分区与增量文件按 Datetime 去重（后写入的优先），增量文件累计 COMPACT_DELTAS 个或进入新月份时
+# 在后台线程合并（只合并当时已有的文件，合并期间新写入的增量文件排在新的月分区之后，仍然优先）
+#
+# 信号位掩码的位序取决于信号表顺序：每个分区在 Parquet 元数据中记录写入时的信号名表（MASK_LABELS），
+# 读取时按信号名重排为当前位序；位掩码之前写入的分区只有異動標記文字，读取时由文字重建位掩码
+
+LABELS_KEY = b"signal_labels"  # Parquet 元数据中信号名表的键
+TEXT_COLUMN = "異動標記"  # 旧格式的逗号分隔信号文字列
+COMPACT_DELTAS = int(os.getenv("HISTORY_COMPACT_DELTAS", "48"))  # 每月增量文件达到此数时合并进月分区
+ARCHIVE_DIR = os.getenv("HISTORY_ARCHIVE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "archive"))
+
+_lock = threading.Lock()
+_last_archived = {}  # (ticker, interval) -> 已归档的最后一根K线时间
+_compacting = {}  # (目录, 月份) -> 后台合并线程
+stats = {"rows": 0, "writes": 0, "compactions": 0}
+
+
+def _dir(ticker, interval):
+    safe = ticker.replace("^", "_").replace("/", "_")
+    return os.path.join(ARCHIVE_DIR, safe, interval)
+
+
+def _partitions(ticker, interval):
+    """全部分区与增量文件，按月份排序（同月的增量文件按写入先后排在月分区之后）"""
+    return sorted(glob.glob(os.path.join(_dir(ticker, interval), "*.parquet")))
+
+
+def _months(paths):
+    """{月份: [该月的分区与增量文件]}，按月份排序"""
+    months = {}
+    for path in paths:
+        months.setdefault(os.path.basename(path)[:7], []).append(path)
+    return months
+
+
+def _read_month(paths, columns=None):
+    """读取一个月的分区与增量文件并按 Datetime 去重（后写入的优先）"""
+    wanted = columns if columns is None or "Datetime" in columns else ["Datetime"] + list(columns)
+    frames = [f for f in (_read(p, wanted) for p in paths) if f is not None and not f.empty]
+    if not frames:
+        return None
+    if len(frames) == 1:
+        data = frames[0]
+    else:
+        data = pd.concat(frames, ignore_index=True).drop_duplicates("Datetime", keep="last")
+        data = data.sort_values("Datetime", kind="stable", ignore_index=True)
+    return data if wanted is columns else data.drop(columns="Datetime")
+
+
+def _read(path, columns=None):
+    """读取分区，信号位掩码统一为当前位序；无法读取时返回 None"""
+    try:
+        schema = pq.read_schema(path)
+        rebuild = (SIGNAL_MASK_COLUMN not in schema.names and TEXT_COLUMN in schema.names and
+                   (columns is None or SIGNAL_MASK_COLUMN in columns))
+        if rebuild and columns is not None:
+            columns = list(dict.fromkeys([c for c in columns if c != SIGNAL_MASK_COLUMN] + [TEXT_COLUMN]))
+        data = pd.read_parquet(path, columns=columns)
+    except Exception:
+        return None
+    if rebuild:
+        # 旧格式分区：由文字重建位掩码，文字列不再返回（改写分区时即迁移为位掩码格式）
+        data[SIGNAL_MASK_COLUMN] = _codes_from_text(data.pop(TEXT_COLUMN))
+    # 按分区记录的信号名表重排位序；没有信号名表的分区（位掩码格式最初的版本）按当前位序读取
+    elif SIGNAL_MASK_COLUMN in data.columns and LABELS_KEY in (schema.metadata or {}):
+        data[SIGNAL_MASK_COLUMN] = _remap(data[SIGNAL_MASK_COLUMN], json.loads(schema.metadata[LABELS_KEY]))
+    return data
+
+
+def _codes_from_text(texts):
+    """異動標記文字 -> 位掩码；不再存在的信号名忽略，相同文字只解析一次"""
+    rows, uniques = pd.factorize(texts, use_na_sentinel=False)
+    codes = []
+    for text in uniques:
+        labels = text.split(", ") if isinstance(text, str) else []
+        codes.append(signal_bits(label for label in labels
+                                 if label in SIGNAL_BITS or label.startswith(KEY_PIVOT_LABEL)))
+    return pd.Series(np.array(codes, dtype=np.int64)[rows], index=texts.index)
+
+
+def _remap(codes, labels):
+    """按写入时的信号名表把位掩码重排为当前位序；已删除的信号丢弃"""
+    if labels == MASK_LABELS:
+        return codes
+    old = codes.to_numpy(dtype=np.int64)
+    new = np.zeros_like(old)
+    for i, label in enumerate(labels):
+        if label in SIGNAL_BITS:
+            new |= ((old >> i) & 1) * SIGNAL_BITS[label]
+    return pd.Series(new, index=codes.index)
+
+
+def _write(directory, name, data):
+    """原子写入（先写临时文件再替换），读取方不会读到半个分区；元数据中记录信号名表"""
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    os.close(fd)
+    try:
+        table = pa.Table.from_pandas(data, preserve_index=False)
+        metadata = dict(table.schema.metadata or {})
+        metadata[LABELS_KEY] = json.dumps(MASK_LABELS, ensure_ascii=False).encode("utf-8")
+        pq.write_table(table.replace_schema_metadata(metadata), tmp)
+        os.replace(tmp, os.path.join(directory, f"{name}.parquet"))
+    except Exception:
+        os.remove(tmp)
+        raise
+
+
+def _last_time(key):
+    if key not in _last_archived:
+        paths = _partitions(*key)
+        last = _read(paths[-1], columns=["Datetime"]) if paths else None
+        _last_archived[key] = last["Datetime"].max() if last is not None and not last.empty else None
+    return _last_archived[key]
+
+
+def _compact(directory, paths):
+    """把一个月的分区与增量文件合并为月分区，并删除增量文件"""
+    data = _read_month(paths)
+    if data is None:
+        return
+    _write(directory, os.path.basename(paths[0])[:7], data)
+    for path in paths:
+        if "~" in os.path.basename(path):
+            os.remove(path)
+    stats["compactions"] += 1
+
+
+def _compact_quietly(directory, paths):
+    try:
+        _compact(directory, paths)
+    except Exception:
+        pass  # 合并失败时保留增量文件，读取结果不受影响，下次再合并
+
+
+def _compact_later(directory, paths):
+    """在后台线程合并，不阻塞刷新循环；同一月份同时只有一个合并任务"""
+    key = (directory, os.path.basename(paths[0])[:7])
+    running = _compacting.get(key)
+    if running is not None and running.is_alive():
+        return
+    thread = threading.Thread(target=_compact_quietly, args=(directory, paths), name="history-compact", daemon=True)
+    _compacting[key] = thread
+    thread.start()
+
+
+def wait_compactions():
+    """等待后台合并全部完成"""
+    for thread in list(_compacting.values()):
+        thread.join()
+
+
+def compact(ticker, interval):
+    """立即合并全部月份的增量文件"""
+    wait_compactions()
+    with _lock:
+        directory = _dir(ticker, interval)
+        for paths in _months(_partitions(ticker, interval)).values():
+            if len(paths) > 1 or "~" in os.path.basename(paths[0]):
+                _compact(directory, paths)
+
+
+def append_history(ticker, interval, data):
+    """把本周期的分析结果并入归档，返回写入的K线数
+
+    早于已归档最后一根K线的数据视为已归档，不再重写；最后一根（可能仍在形成中）
+    与新K线写入一个增量文件，读取时按 Datetime 去重、保留本周期的计算结果。
+    """
+    if data is None or data.empty or "Datetime" not in data.columns:
+        return 0
+    key = (ticker, interval)
+    with _lock:
+        last = _last_time(key)
+        # 先按时间截取本周期新增的几根K线，再去掉前瞻列，不复制整段数据
+        frame = data.iloc[int(data["Datetime"].searchsorted(last)):] if last is not None else data
+        frame = frame.drop(columns=[c for c in frame.columns if c.startswith("Next_")])
+        if frame.empty:
+            return 0
+        directory = _dir(ticker, interval)
+        months = frame["Datetime"].dt.strftime("%Y-%m")
+        for month, part in frame.groupby(months, sort=True):
+            _write(directory, f"{month}~{time.time_ns()}-{os.getpid()}", part)
+            stats["writes"] += 1
+        stats["rows"] += len(frame)
+        # 增量文件过多的月份、以及已经结束的月份合并为月分区
+        current = months.iloc[-1]
+        for month, paths in _months(_partitions(ticker, interval)).items():
+            deltas = sum("~" in os.path.basename(p) for p in paths)
+            if deltas and (month < current or deltas >= COMPACT_DELTAS):
+                _compact_later(directory, paths)
+        _last_archived[key] = frame["Datetime"].max()
+    return len(frame)
+
+
+def load_history(ticker, interval, start=None, end=None, columns=None):
+    """读取归档历史（可按时间范围与列裁剪），无归档时返回 None"""
+    paths = _partitions(ticker, interval)
+    if start is not None:
+        start = pd.Timestamp(start)
+        # 分区按交易所时区划分月份，边界各放宽一天以免时区差漏掉分区
+        paths = [p for p in paths if os.path.basename(p)[:7] >= (start - pd.Timedelta(days=1)).strftime("%Y-%m")]
+    if end is not None:
+        end = pd.Timestamp(end)
+        paths = [p for p in paths if os.path.basename(p)[:7] <= (end + pd.Timedelta(days=1)).strftime("%Y-%m")]
+    if columns is not None and "Datetime" not in columns:
+        columns = ["Datetime"] + list(columns)
+    frames = [f for f in (_read_month(p, columns) for p in _months(paths).values()) if f is not None]
+    if not frames:
+        return None
+    data = pd.concat(frames, ignore_index=True)
+    if start is not None:
+        data = data[data["Datetime"] >= _align(start, data["Datetime"])]
+    if end is not None:
+        data = data[data["Datetime"] <= _align(end, data["Datetime"])]
+    return data.reset_index(drop=True)
+
+
+def has_history(ticker, interval):
+    return bool(_partitions(ticker, interval))
+
+
+def iter_history(ticker, interval, columns=None):
+    """逐个月分区读取归档，供流式统计使用，避免一次载入全部历史"""
+    for paths in _months(_partitions(ticker, interval)).values():
+        data = _read_month(paths, columns)
+        if data is not None:
+            yield data
+
+
+def _align(ts, times):
+    """把查询时间对齐到归档时间列的时区"""
+    tz = times.dt.tz
+    if tz is None:
+        return ts.tz_localize(None) if ts.tzinfo else ts
+    return ts.tz_convert(tz) if ts.tzinfo else ts.tz_localize(tz)
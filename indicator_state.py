@@ -0,0 +1,213 @@
+import copy
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+# 增量指标状态：保存 EMA 累加器、滚动窗口与 VWAP/OBV 累计值，新K线到达时只按新增K线数计算，
+# 结果与 calculate_macd / calculate_rsi / calculate_vwap / calculate_mfi / calculate_obv 等整表计算一致（见 tests/test_indicator_state.py）
+
+
+class IndicatorState:
+    """单只股票（单个 interval/period）的流式指标状态
+
+    只有倒数第二根及更早的K线会被提交进状态；最后一根K线仍在形成中，
+    每次都基于已提交状态的副本临时计算，下次刷新时以新数据替换。
+    输出保存在按倍数扩容的 ndarray 中，每次 update 只处理新增K线，返回值为缓冲区的视图。
+    """
+
+    def __init__(self, ema_spans=(5, 10, 30, 40), macd=(12, 26, 9), rsi_period=14, mfi_period=14,
+                 sma_windows=(50, 200)):
+        self.ema_spans = tuple(sorted(set(ema_spans) | set(macd[:2])))
+        self.macd = macd
+        self.rsi_period = rsi_period
+        self.mfi_period = mfi_period
+        self.sma_windows = tuple(sma_windows)
+        self.rebuilds = 0
+        self.reset()
+
+    def reset(self):
+        self.anchor = None  # 第一根K线的时间，变化（如按 period 裁剪）时重建
+        self.last_committed = None
+        self.committed = 0
+        self.acc = {
+            "ema": {span: None for span in self.ema_spans},
+            "macd_signal": None,
+            "prev_close": None,
+            "prev_tp": None,
+            "gains": deque(maxlen=self.rsi_period),
+            "losses": deque(maxlen=self.rsi_period),
+            "pos_flow": deque(maxlen=self.mfi_period),
+            "neg_flow": deque(maxlen=self.mfi_period),
+            "sma": {w: deque(maxlen=w) for w in self.sma_windows},
+            "cum_pv": 0.0,
+            "cum_v": 0.0,
+            "obv": 0.0,
+        }
+        self.outputs = {name: np.empty(0) for name in self.columns()}  # 前 committed 个为已提交K线的指标
+
+    def columns(self):
+        return ([f"EMA{span}" for span in self.ema_spans] + ["MACD", "Signal", "RSI", "VWAP", "MFI", "OBV"] +
+                [f"SMA{w}" for w in self.sma_windows])
+
+    def _step(self, acc, o, h, l, c, v):
+        """推进一根K线，返回该K线的全部指标值"""
+        out = {}
+        for span in self.ema_spans:
+            prev = acc["ema"][span]
+            alpha = 2.0 / (span + 1)
+            acc["ema"][span] = c if prev is None else prev + alpha * (c - prev)
+            out[f"EMA{span}"] = acc["ema"][span]
+
+        fast, slow, signal_span = self.macd
+        macd = acc["ema"][fast] - acc["ema"][slow]
+        prev_signal = acc["macd_signal"]
+        alpha = 2.0 / (signal_span + 1)
+        acc["macd_signal"] = macd if prev_signal is None else prev_signal + alpha * (macd - prev_signal)
+        out["MACD"] = macd
+        out["Signal"] = acc["macd_signal"]
+
+        # RSI：第一根的 delta 为 NaN，where(delta>0, 0) 后按 0 计入窗口
+        delta = np.nan if acc["prev_close"] is None else c - acc["prev_close"]
+        acc["gains"].append(delta if delta > 0 else 0.0)
+        acc["losses"].append(-delta if delta < 0 else 0.0)
+        acc["prev_close"] = c
+        if len(acc["gains"]) == self.rsi_period:
+            gain = sum(acc["gains"]) / self.rsi_period
+            loss = sum(acc["losses"]) / self.rsi_period
+            with np.errstate(divide="ignore", invalid="ignore"):
+                out["RSI"] = float(100 - (100 / (1 + np.float64(gain) / loss)))
+        else:
+            out["RSI"] = np.nan
+
+        tp = (h + l + c) / 3
+        acc["cum_pv"] += tp * v
+        acc["cum_v"] += v
+        with np.errstate(divide="ignore", invalid="ignore"):
+            out["VWAP"] = float(np.float64(acc["cum_pv"]) / acc["cum_v"])
+
+        flow = tp * v
+        prev_tp = acc["prev_tp"]
+        acc["pos_flow"].append(flow if prev_tp is not None and tp > prev_tp else 0.0)
+        acc["neg_flow"].append(flow if prev_tp is not None and tp < prev_tp else 0.0)
+        acc["prev_tp"] = tp
+        if len(acc["pos_flow"]) == self.mfi_period:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                ratio = np.float64(sum(acc["pos_flow"])) / sum(acc["neg_flow"])
+                out["MFI"] = float(100 - (100 / (1 + ratio)))
+        else:
+            out["MFI"] = np.nan
+
+        if not np.isnan(delta):
+            acc["obv"] += np.sign(delta) * v
+        out["OBV"] = acc["obv"]
+
+        for w, window in acc["sma"].items():
+            window.append(c)
+            out[f"SMA{w}"] = sum(window) / w if len(window) == w else np.nan
+        return out
+
+    def _bootstrap(self, o, h, l, c, v):
+        """重建时整表向量化计算已提交K线，并由末端数值初始化累加器"""
+        acc = self.acc
+        close = pd.Series(c)
+        out = {}
+        for span in self.ema_spans:
+            ema = close.ewm(span=span, adjust=False).mean()
+            out[f"EMA{span}"] = ema
+            acc["ema"][span] = float(ema.iloc[-1])
+        fast, slow, signal_span = self.macd
+        macd = out[f"EMA{fast}"] - out[f"EMA{slow}"]
+        signal = macd.ewm(span=signal_span, adjust=False).mean()
+        out["MACD"], out["Signal"] = macd, signal
+        acc["macd_signal"] = float(signal.iloc[-1])
+
+        delta = close.diff()
+        gains = delta.where(delta > 0, 0)
+        losses = -delta.where(delta < 0, 0)
+        out["RSI"] = 100 - (100 / (1 + gains.rolling(window=self.rsi_period).mean() /
+                                   losses.rolling(window=self.rsi_period).mean()))
+        acc["gains"].extend(gains.iloc[-self.rsi_period:].tolist())
+        acc["losses"].extend(losses.iloc[-self.rsi_period:].tolist())
+        acc["prev_close"] = float(c[-1])
+
+        tp = pd.Series((h + l + c) / 3)
+        volume = pd.Series(v)
+        cum_pv, cum_v = (tp * volume).cumsum(), volume.cumsum()
+        out["VWAP"] = cum_pv / cum_v
+        acc["cum_pv"], acc["cum_v"] = float(cum_pv.iloc[-1]), float(cum_v.iloc[-1])
+
+        flow = tp * volume
+        pos_flow = flow.where(tp > tp.shift(1), 0)
+        neg_flow = flow.where(tp < tp.shift(1), 0)
+        out["MFI"] = 100 - (100 / (1 + pos_flow.rolling(window=self.mfi_period).sum() /
+                                   neg_flow.rolling(window=self.mfi_period).sum()))
+        acc["pos_flow"].extend(pos_flow.iloc[-self.mfi_period:].tolist())
+        acc["neg_flow"].extend(neg_flow.iloc[-self.mfi_period:].tolist())
+        acc["prev_tp"] = float(tp.iloc[-1])
+
+        obv = (np.sign(delta) * volume).fillna(0).cumsum()
+        out["OBV"] = obv
+        acc["obv"] = float(obv.iloc[-1])
+
+        for w in self.sma_windows:
+            out[f"SMA{w}"] = close.rolling(window=w).mean()
+            acc["sma"][w].extend(c[-w:].tolist())
+
+        for name, buffer in self.outputs.items():
+            buffer[:len(c)] = out[name].to_numpy(dtype=float)
+
+    def _reserve(self, n):
+        """保证输出缓冲区可容纳 n 根K线，不足时按倍数扩容（均摊 O(1)）"""
+        capacity = len(next(iter(self.outputs.values())))
+        if capacity >= n:
+            return
+        capacity = max(n + n // 4, 2 * capacity, 64)  # 重建时也预留余量，后续新增K线不必立即扩容
+        for name, buffer in self.outputs.items():
+            grown = np.empty(capacity)
+            grown[:self.committed] = buffer[:self.committed]
+            self.outputs[name] = grown
+
+    def __getstate__(self):
+        """进程池传输时只带已提交部分，不带预留容量"""
+        state = self.__dict__.copy()
+        state["outputs"] = {name: buffer[:self.committed].copy() for name, buffer in self.outputs.items()}
+        return state
+
+    def _is_continuation(self, times):
+        # 只比较首根与最后提交的K线时间（逐个取值为 O(1)，整列 to_numpy 会装箱全部时间戳）
+        if self.anchor is None or self.committed == 0 or len(times) <= self.committed:
+            return False
+        return times.iloc[0] == self.anchor and times.iloc[self.committed - 1] == self.last_committed
+
+    def update(self, data):
+        """以最新完整数据更新状态，返回 {列名: ndarray}（长度与 data 相同，为内部缓冲区的视图，下次 update 前有效）"""
+        times = data["Datetime"]
+        if not self._is_continuation(times):
+            if self.anchor is not None:
+                self.rebuilds += 1
+            self.reset()
+        n = len(data)
+        if n == 0:
+            return {name: np.array([], dtype=float) for name in self.outputs}
+
+        start = self.committed
+        cols = [data[k].iloc[start:].to_numpy(dtype=float) for k in ("Open", "High", "Low", "Close", "Volume")]
+        self._reserve(n)
+        if start == 0 and n > 1:
+            self._bootstrap(*(col[:n - 1] for col in cols))
+        else:
+            for i in range(n - 1 - start):
+                out = self._step(self.acc, *(col[i] for col in cols))
+                for name, value in out.items():
+                    self.outputs[name][start + i] = value
+        self.committed = n - 1
+        self.anchor = times.iloc[0]
+        self.last_committed = times.iloc[n - 2] if n > 1 else None
+
+        last = self._step(copy.deepcopy(self.acc), *(col[-1] for col in cols))
+        result = {}
+        for name, buffer in self.outputs.items():
+            buffer[n - 1] = last[name]
+            result[name] = buffer[:n]
+        return result
@@ -0,0 +1,191 @@
+import argparse
+import itertools
+import json
+import math
+import random
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from pipeline import DEFAULT_PARAMS, prepare_data, calculate_signal_success_rate
+
+# 阈值参数寻优：对每只股票在参数组合上评估信号成功率（与页面“各信号成功率”相同定义），
+# 以进程池并行；OHLCV/VIX 数组放在共享内存中，子进程直接映射，不随每个任务序列化传输
+#
+#   python optimizer.py --tickers TSLA,NIO --period 1y --interval 1d --trials 100
+
+# 默认搜索空间（页面上对应各 st.number_input）；只含影响異動標記的阈值——
+# body_ratio_threshold 等K线形态阈值不改变评分所用的信号成功率，不参与搜索
+DEFAULT_SPACE = {
+    "gap_threshold": [0.5, 1.0, 1.5, 2.0, 3.0],
+    "continuous_up_threshold": [2, 3, 4, 5],
+    "continuous_down_threshold": [2, 3, 4, 5],
+    "mfi_divergence_window": [3, 5, 8, 13],
+    "vix_high_threshold": [25.0, 30.0, 35.0],
+    "vix_low_threshold": [15.0, 18.0, 20.0],
+    "vix_ema_fast": [3, 5, 8],
+    "vix_ema_slow": [10, 15, 20],
+}
+
+_COLUMNS = ("Open", "High", "Low", "Close", "Volume", "VIX", "VIX Change %", "Datetime")
+
+# 子进程内：ticker -> (SharedMemory, ndarray 视图, 时区)
+_shared = {}
+
+
+def grid_trials(space):
+    keys = list(space)
+    return [dict(zip(keys, values)) for values in itertools.product(*(space[k] for k in keys))]
+
+
+def random_trials(space, n_trials, seed=0):
+    """从网格中不放回随机抽取 n_trials 组（网格更小时返回全部）
+
+    只抽取组合序号，再按混合进制解码为各参数取值（顺序与 grid_trials 一致），不生成完整网格。
+    """
+    keys = list(space)
+    sizes = [len(space[k]) for k in keys]
+    total = math.prod(sizes)
+    if n_trials >= total:
+        return grid_trials(space)
+    trials = []
+    for index in random.Random(seed).sample(range(total), n_trials):
+        values = {}
+        for k, size in zip(reversed(keys), reversed(sizes)):
+            index, i = divmod(index, size)
+            values[k] = space[k][i]
+        trials.append({k: values[k] for k in keys})
+    return trials
+
+
+def share_frame(data, vix_data):
+    """把一只股票的 OHLCV 与按时间对齐的 VIX 写入共享内存，返回 (SharedMemory, 描述信息)"""
+    if vix_data is not None and not vix_data.empty:
+        aligned = data[["Datetime"]].merge(vix_data[["Datetime", "Close", "VIX Change %"]], on="Datetime", how="left")
+        vix, vix_change = aligned["Close"].to_numpy(dtype=float), aligned["VIX Change %"].to_numpy(dtype=float)
+    else:
+        vix = vix_change = np.full(len(data), np.nan)
+    times = data["Datetime"]
+    tz = str(times.dt.tz) if times.dt.tz is not None else None
+    if tz:
+        times = times.dt.tz_convert("UTC").dt.tz_localize(None)
+    shape = (len(_COLUMNS), len(data))
+    shm = shared_memory.SharedMemory(create=True, size=max(int(np.prod(shape)) * 8, 8))
+    block = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+    for i, k in enumerate(_COLUMNS[:5]):
+        block[i] = data[k].to_numpy(dtype=float)
+    block[5], block[6] = vix, vix_change
+    block[7].view(np.int64)[:] = times.to_numpy(dtype="datetime64[ns]").view(np.int64)  # 时间以 int64 纳秒原样存放
+    return shm, {"name": shm.name, "shape": shape, "tz": tz}
+
+
+def _attach(specs):
+    """子进程初始化：映射全部共享内存块"""
+    for ticker, spec in specs.items():
+        shm = shared_memory.SharedMemory(name=spec["name"])
+        _shared[ticker] = (shm, np.ndarray(spec["shape"], dtype=np.float64, buffer=shm.buf), spec["tz"])
+
+
+def _frames_from_shared(ticker):
+    _, block, tz = _shared[ticker]
+    times = pd.to_datetime(block[7].view(np.int64))
+    if tz:
+        times = times.tz_localize("UTC").tz_convert(tz)
+    data = pd.DataFrame({k: block[i] for i, k in enumerate(_COLUMNS[:5])})
+    data.insert(0, "Datetime", times)
+    vix_data = pd.DataFrame({"Datetime": times, "Close": block[5], "VIX Change %": block[6]}).dropna(subset=["Close"])
+    return data, vix_data
+
+
+def score_params(data, vix_data, params, min_trades=5, target_signals=None):
+    """一组参数的得分：全部（或指定）信号的合计成功次数 / 合计触发次数，触发过少的信号不计入"""
+    prepared = prepare_data(data, vix_data, params)
+    rates = calculate_signal_success_rate(prepared)
+    successes = trades = 0
+    for signal, stats in rates.items():
+        if target_signals and signal not in target_signals:
+            continue
+        if stats["total_signals"] < min_trades:
+            continue
+        trades += stats["total_signals"]
+        successes += stats["success_rate"] * stats["total_signals"] / 100
+    return (successes / trades * 100 if trades else 0.0), trades
+
+
+def _run_trial(task):
+    ticker, trial, base_params, min_trades, target_signals = task
+    data, vix_data = _frames_from_shared(ticker)
+    params = dict(base_params, **trial)
+    score, trades = score_params(data, vix_data, params, min_trades, target_signals)
+    return ticker, trial, score, trades
+
+
+def optimize(frames, vix_data, trials, base_params=None, max_workers=None, min_trades=5, target_signals=None):
+    """并行评估 {ticker: OHLCV DataFrame} × trials，返回全部结果（DataFrame，按股票、得分排序）"""
+    base_params = dict(base_params or DEFAULT_PARAMS)
+    segments, specs = [], {}
+    try:
+        for ticker, data in frames.items():
+            shm, spec = share_frame(data, vix_data)
+            segments.append(shm)
+            specs[ticker] = spec
+        tasks = [(ticker, trial, base_params, min_trades, target_signals) for ticker in specs for trial in trials]
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_attach, initargs=(specs,)) as pool:
+            rows = list(pool.map(_run_trial, tasks, chunksize=max(1, len(tasks) // 64)))
+    finally:
+        for shm in segments:
+            shm.close()
+            shm.unlink()
+
+    result = pd.DataFrame([{"ticker": ticker, "成功率 (%)": score, "触发次数": trades, **trial}
+                           for ticker, trial, score, trades in rows])
+    return result.sort_values(["ticker", "成功率 (%)", "触发次数"], ascending=[True, False, False]).reset_index(drop=True)
+
+
+def best_per_ticker(result):
+    return result.groupby("ticker", sort=False).head(1).reset_index(drop=True)
+
+
+def main():
+    from data_fetch import fetch_all, get_vix_data
+
+    parser = argparse.ArgumentParser(description="信号阈值参数寻优")
+    parser.add_argument("--tickers", default="TSLA,NIO,TSLL,XPEV,META", help="股票代號（逗號分隔）")
+    parser.add_argument("--period", default="1y")
+    parser.add_argument("--interval", default="1d")
+    parser.add_argument("--trials", type=int, default=100, help="随机搜索组数；0 表示完整网格")
+    parser.add_argument("--space", help="JSON 文件，覆盖默认搜索空间")
+    parser.add_argument("--workers", type=int, help="进程数（默认 CPU 数）")
+    parser.add_argument("--min-trades", type=int, default=5, help="信号至少触发次数才计入得分")
+    parser.add_argument("--signals", help="只按这些信号评分（逗號分隔）")
+    parser.add_argument("--output", help="全部结果另存为 CSV")
+    args = parser.parse_args()
+
+    space = dict(DEFAULT_SPACE)
+    if args.space:
+        with open(args.space, encoding="utf-8") as f:
+            space = json.load(f)
+    trials = grid_trials(space) if args.trials == 0 else random_trials(space, args.trials)
+    target_signals = [s.strip() for s in args.signals.split(",")] if args.signals else None
+
+    tickers = [t.strip().upper() for t in args.tickers.split(",") if t.strip()]
+    vix_data = get_vix_data(args.period, args.interval)
+    frames = {}
+    for ticker, fetched in fetch_all(tickers, args.period, args.interval).items():
+        if fetched["error"] is not None or fetched["data"].empty:
+            print(f"[{ticker}] 無法取得資料：{fetched['error']}")
+            continue
+        frames[ticker] = fetched["data"]
+
+    result = optimize(frames, vix_data, trials, max_workers=args.workers, min_trades=args.min_trades,
+                      target_signals=target_signals)
+    if args.output:
+        result.to_csv(args.output, index=False)
+    with pd.option_context("display.max_columns", None, "display.width", 200):
+        print(best_per_ticker(result).round(2).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import numpy as np
+
+# 前 X% 数据范围：五项指标堆叠为一个数组，一次 np.partition 求出全部边界，取代每列升序/降序各排序一次；
+# 归档的长历史按分区逐块送入可合并的分位数草图（固定内存，近似结果）
+
+PERCENTILE_COLUMNS = ["Price Change %", "Volume Change %", "Volume", "📈 股價漲跌幅 (%)", "📊 成交量變動幅 (%)"]
+
+
+def percentile_ranges(data, pct, columns=PERCENTILE_COLUMNS):
+    """精确计算各列前/后 pct% 的范围，返回 {列名: {"top": (最大值, 最小值), "bottom": (最大值, 最小值)}}
+
+    与 dropna().sort_values().head(max(1, int(n * pct / 100))) 的结果一致；全为 NaN 的列不返回。
+    """
+    values = np.vstack([data[c].to_numpy(dtype=float) for c in columns])
+    valid = (~np.isnan(values)).sum(axis=1)
+    ks = np.maximum(1, (valid * pct / 100).astype(int))
+    kth = set()
+    for m, k in zip(valid, ks):
+        if m:
+            kth.update((0, k - 1, m - k, m - 1))
+    if not kth:
+        return {}
+    # NaN 在 partition 中排在最后，因此每列前 m 个位置都是有效值
+    part = np.partition(values, sorted(kth), axis=1)
+    ranges = {}
+    for row, column, m, k in zip(part, columns, valid, ks):
+        if m:
+            ranges[column] = {"top": (row[m - 1], row[m - k]), "bottom": (row[k - 1], row[0])}
+    return ranges
+
+
+class QuantileSketch:
+    """可合并的流式分位数草图（KLL 风格压缩器）
+
+    第 i 层的每个值代表 2**i 个原始值；某层超过 capacity 时排序后隔一取一晋升到上一层，
+    内存约为 capacity × 层数，排名误差随 capacity 增大而减小。最小/最大值精确记录。
+    """
+
+    def __init__(self, capacity=512, seed=0):
+        self.capacity = capacity
+        self.levels = [np.empty(0)]
+        self.count = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        self.count += len(values)
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+
+    def merge(self, other):
+        for level, items in enumerate(other.levels):
+            if level == len(self.levels):
+                self.levels.append(np.empty(0))
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self.capacity:
+                items = np.sort(items)
+                # 奇数个时保留最大的一个在本层，保证总权重不变
+                keep, items = (items[-1:], items[:-1]) if len(items) % 2 else (np.empty(0), items)
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], items[self._rng.integers(2)::2]])
+                self.levels[level] = keep
+            level += 1
+
+    def value_at(self, rank):
+        """升序排名为 rank（从 0 开始）的近似值"""
+        if rank <= 0:
+            return self.min
+        if rank >= self.count - 1:
+            return self.max
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(l), 2 ** i) for i, l in enumerate(self.levels)])
+        order = np.argsort(items, kind="stable")
+        cum = np.cumsum(weights[order])
+        return items[order][min(np.searchsorted(cum, rank, side="right"), len(items) - 1)]
+
+
+def sketch_ranges(chunks, pct, columns=PERCENTILE_COLUMNS, capacity=512):
+    """逐块（如归档的月分区）累积草图后近似计算前/后 pct% 范围，返回格式同 percentile_ranges"""
+    sketches = {c: QuantileSketch(capacity) for c in columns}
+    for chunk in chunks:
+        for c in columns:
+            sketches[c].update(chunk[c].to_numpy(dtype=float))
+    ranges = {}
+    for c, sketch in sketches.items():
+        m = sketch.count
+        if m:
+            k = max(1, int(m * pct / 100))
+            ranges[c] = {"top": (sketch.max, sketch.value_at(m - k)), "bottom": (sketch.value_at(k - 1), sketch.min)}
+    return ranges
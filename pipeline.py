@@ -0,0 +1,290 @@
+import time
+
+import numpy as np
+
+from signal_engine import (mark_signals, classify_kline_patterns, signal_matrix, latest_signals, signal_bits,
+                           signal_text, ALERT_KEYS, ALERT_SIGNALS, SIGNAL_DIRECTIONS, SIGNAL_MASK_COLUMN)
+from indicator_state import IndicatorState
+from stage_timing import timed
+
+# 单只股票的分析流水线：指标 → 異動標記 → K线形态 → 最新K线信号 → 提醒文本
+# Streamlit 页面与 daemon.py 共用，保证两边结果一致
+
+# 与页面上各输入框的默认值一致
+DEFAULT_PARAMS = {
+    "price_threshold": 80.0,
+    "volume_threshold": 80.0,
+    "price_change_threshold": 5.0,
+    "volume_change_threshold": 10.0,
+    "gap_threshold": 1.0,
+    "continuous_up_threshold": 3,
+    "continuous_down_threshold": 3,
+    "body_ratio_threshold": 0.6,
+    "shadow_ratio_threshold": 2.0,
+    "doji_body_threshold": 0.1,
+    "mfi_divergence_window": 5,
+    "vix_high_threshold": 30.0,
+    "vix_low_threshold": 20.0,
+    "vix_ema_fast": 5,
+    "vix_ema_slow": 10,
+    "telegram_signals": ["📈 連續向上買入", "📉 SMA50下降趨勢", "📉 EMA-SMA Downtrend Sell", "📈 VIX平靜買入"],
+    "alert_cooldown_minutes": 30,
+}
+
+SIGNAL_PARAM_KEYS = (
+    "price_threshold", "volume_threshold", "price_change_threshold", "volume_change_threshold",
+    "gap_threshold", "continuous_up_threshold", "continuous_down_threshold",
+    "mfi_divergence_window", "vix_high_threshold", "vix_low_threshold",
+)
+
+# 最新K线信号名称（提醒信号的键），由信号表生成
+SIGNAL_NAMES = ALERT_KEYS
+
+
+def new_indicator_state(params):
+    return IndicatorState(ema_spans=(5, 10, 30, 40, params["vix_ema_fast"], params["vix_ema_slow"]))
+
+
+def compute_kline_patterns(data, body_ratio_threshold, shadow_ratio_threshold, doji_body_threshold):
+    """K线形态计算（向量化，毫秒级，无需 st.cache_data 对整表做哈希）"""
+    data = data.copy()
+    pattern, interpretation, volume_mark = classify_kline_patterns(
+        data, body_ratio_threshold, shadow_ratio_threshold, doji_body_threshold
+    )
+    data["成交量標記"] = volume_mark
+    data["K線形態"] = pattern
+    data["單根解讀"] = interpretation
+    return data
+
+
+def prepare_data(data, vix_data, params, state=None, timings=None):
+    """计算全部指标、異動標記与K线形态；state 为该股票的 IndicatorState（可选），
+    timings 为列表时追加各阶段 (阶段, 秒, 行数)"""
+    started = time.perf_counter()
+    data["Price Change %"] = data["Close"].pct_change().round(4) * 100
+    data["Volume Change %"] = data["Volume"].pct_change().round(4) * 100
+    data["Close_Difference"] = data['Close'].diff().round(2)
+
+    data["前5均價"] = data["Price Change %"].rolling(window=5).mean()
+    data["前5均價ABS"] = abs(data["Price Change %"]).rolling(window=5).mean()
+    data["前5均量"] = data["Volume"].rolling(window=5).mean()
+    data["📈 股價漲跌幅 (%)"] = ((abs(data["Price Change %"]) - data["前5均價ABS"]) / data["前5均價ABS"]).round(4) * 100
+    data["📊 成交量變動幅 (%)"] = ((data["Volume"] - data["前5均量"]) / data["前5均量"]).round(4) * 100
+
+    # 性能优化：增量指标状态，只计算新增K线（结果与 calculate_* 整表计算一致，见 tests/test_indicator_state.py）
+    if state is None:
+        state = new_indicator_state(params)
+    indicators = state.update(data)
+    data["MACD"], data["Signal"] = indicators["MACD"], indicators["Signal"]
+    data["EMA5"] = indicators["EMA5"]
+    data["EMA10"] = indicators["EMA10"]
+    data["EMA30"] = indicators["EMA30"]
+    data["EMA40"] = indicators["EMA40"]
+    data["RSI"] = indicators["RSI"]
+
+    # 新增：计算 VWAP、MFI、OBV
+    data["VWAP"] = indicators["VWAP"]
+    data["MFI"] = indicators["MFI"]
+    data["OBV"] = indicators["OBV"]
+
+    # 新增：获取 VIX 数据并合并
+    if vix_data is not None and not vix_data.empty:
+        data = data.merge(vix_data[["Datetime", "Close", "VIX Change %"]], on="Datetime", how="left", suffixes=("", "_VIX"))
+        data.rename(columns={"Close_VIX": "VIX"}, inplace=True)
+    else:
+        data["VIX"] = np.nan
+        data["VIX Change %"] = np.nan
+
+    # 新增：計算 VIX 趨勢 EMA
+    if not data["VIX"].isna().all():
+        # calculate_vix_trend(data, ...) 取的是 data["Close"]，即对应 EMA 列
+        data["VIX_EMA_Fast"] = indicators[f"EMA{params['vix_ema_fast']}"]
+        data["VIX_EMA_Slow"] = indicators[f"EMA{params['vix_ema_slow']}"]
+    else:
+        data["VIX_EMA_Fast"] = np.nan
+        data["VIX_EMA_Slow"] = np.nan
+
+    data['Up'] = (data['Close'] > data['Close'].shift(1)).astype(int)
+    data['Down'] = (data['Close'] < data['Close'].shift(1)).astype(int)
+    data['Continuous_Up'] = data['Up'] * (data['Up'].groupby((data['Up'] == 0).cumsum()).cumcount() + 1)
+    data['Continuous_Down'] = data['Down'] * (data['Down'].groupby((data['Down'] == 0).cumsum()).cumcount() + 1)
+
+    data["SMA50"] = indicators["SMA50"]
+    data["SMA200"] = indicators["SMA200"]
+
+    # 新增：MFI背离检测（预计算列）
+    window = params["mfi_divergence_window"]
+    data['Close_Roll_Max'] = data['Close'].rolling(window=window).max()
+    data['MFI_Roll_Max'] = data['MFI'].rolling(window=window).max()
+    data['Close_Roll_Min'] = data['Close'].rolling(window=window).min()
+    data['MFI_Roll_Min'] = data['MFI'].rolling(window=window).min()
+    data['MFI_Bear_Div'] = (data['Close'] == data['Close_Roll_Max']) & (data['MFI'] < data['MFI_Roll_Max'].shift(1))
+    data['MFI_Bull_Div'] = (data['Close'] == data['Close_Roll_Min']) & (data['MFI'] > data['MFI_Roll_Min'].shift(1))
+
+    # 新增：OBV突破（预计算，20期滚动新高/新低）
+    data['OBV_Roll_Max'] = data['OBV'].rolling(window=20).max()
+    data['OBV_Roll_Min'] = data['OBV'].rolling(window=20).min()
+
+    if timings is not None:
+        timings.append(("indicators", time.perf_counter() - started, len(data)))
+
+    # 性能优化：向量化信号引擎，整列计算異動標記（每根K线一个 int64 位掩码，显示时再解码为文字）
+    with timed("mark_signals", sink=timings) as rec:
+        rec["rows"] = len(data)
+        data[SIGNAL_MASK_COLUMN] = mark_signals(
+            data,
+            **{key: params[key] for key in SIGNAL_PARAM_KEYS},
+        )
+
+    # 性能优化：向量化计算K线形态
+    with timed("kline_patterns", sink=timings) as rec:
+        rec["rows"] = len(data)
+        data = compute_kline_patterns(data, params["body_ratio_threshold"], params["shadow_ratio_threshold"], params["doji_body_threshold"])
+    return data
+
+
+# 新增：综合解读（最后 5 根 K 线）（最小改动，添加VWAP/MFI/OBV/VIX提及）
+def generate_comprehensive_interpretation(data, params):
+    last_5 = data.tail(5)
+    if len(last_5) < 5:
+        return "數據不足，無法生成綜合解讀"
+
+    patterns = last_5["K線形態"].value_counts()
+    volume_status = last_5["成交量標記"].value_counts()
+    bullish_count = len(last_5[last_5["K線形態"].isin(["錘子線", "大陽線", "看漲吞噬", "刺透形態", "早晨之星"])])
+    bearish_count = len(last_5[last_5["K線形態"].isin(["射擊之星", "大陰線", "看跌吞噬", "烏雲蓋頂", "黃昏之星"])])
+    neutral_count = len(last_5[last_5["K線形態"].isin(["十字星", "普通K線"])])
+    high_volume_count = len(last_5[last_5["成交量標記"] == "放量"])
+
+    vwap_trend = "多頭（價格>VWAP）" if last_5["Close"].iloc[-1] > last_5["VWAP"].iloc[-1] else "空頭（價格<VWAP）"
+    mfi_level = f"MFI={last_5['MFI'].iloc[-1]:.1f}（{'超賣背離機會' if last_5['MFI'].iloc[-1] < 20 else '超買背離風險' if last_5['MFI'].iloc[-1] > 80 else '中性'}）"
+    obv_trend = "OBV上漲確認量能" if last_5["OBV"].iloc[-1] > last_5["OBV"].iloc[0] else "OBV下跌警示量能不足"
+    vix_level = f"VIX={last_5['VIX'].iloc[-1]:.1f}（{'恐慌高位' if last_5['VIX'].iloc[-1] > params['vix_high_threshold'] else '平靜低位' if last_5['VIX'].iloc[-1] < params['vix_low_threshold'] else '中性'}）"
+    vix_trend = "VIX趨勢上升（EMA Fast > Slow）" if last_5["VIX_EMA_Fast"].iloc[-1] > last_5["VIX_EMA_Slow"].iloc[-1] else "VIX趨勢下降（EMA Fast < Slow）"
+
+    if bullish_count >= 3 and high_volume_count >= 3:
+        return f"最近五日多方主導，出現多根看漲形態（如大陽線或看漲吞噬）且多伴隨放量，市場呈現強勢上漲趨勢，{vwap_trend}，{mfi_level}，{obv_trend}，{vix_level}，{vix_trend}，建議關注買入機會。"
+    elif bearish_count >= 3 and high_volume_count >= 3:
+        return f"最近五日空方主導，出現多根看跌形態（如大陰線或看跌吞噬）且多伴隨放量，市場呈現強勢下跌趨勢，{vwap_trend}，{mfi_level}，{obv_trend}，{vix_level}，{vix_trend}，建議注意賣出風險。"
+    elif neutral_count >= 3:
+        return f"最近五日多空交戰，型態以十字星或普通K線為主，成交量無明顯趨勢，市場處於盤整或方向不明階段，{vwap_trend}，{mfi_level}，{obv_trend}，{vix_level}，{vix_trend}。"
+    elif bullish_count >= 2 and bearish_count >= 2:
+        return f"最近五日多空激烈爭奪，看漲與看跌形態交替出現，成交量變化不一，市場方向不明，建議觀望，{vwap_trend}，{mfi_level}，{obv_trend}，{vix_level}，{vix_trend}。"
+    else:
+        return f"最近五日市場型態與成交量無明顯趨勢，建議持續觀察後續動向，{vwap_trend}，{mfi_level}，{obv_trend}，{vix_level}，{vix_trend}。"
+
+
+# 计算所有信号的成功率
+def calculate_signal_success_rate(data):
+    data["Next_Close_Higher"] = data["Close"].shift(-1) > data["Close"]
+    data["Next_Close_Lower"] = data["Close"].shift(-1) < data["Close"]
+    data["Next_High_Higher"] = data["High"].shift(-1) > data["High"]
+    data["Next_Low_Lower"] = data["Low"].shift(-1) < data["Low"]
+
+    # 性能优化：異動標記位掩码展开成布尔矩阵，所有信号的触发次数/成功次数由一次矩阵乘法得到
+    matrix, labels = signal_matrix(data[SIGNAL_MASK_COLUMN])
+    up_success = (data["Next_High_Higher"] & data["Next_Close_Higher"]).to_numpy(dtype=np.int64)
+    down_success = (data["Next_Low_Lower"] & data["Next_Close_Lower"]).to_numpy(dtype=np.int64)
+    totals = matrix.sum(axis=0)
+    up_counts = up_success @ matrix
+    down_counts = down_success @ matrix
+
+    success_rates = {}
+    for j, signal in enumerate(labels):
+        total_signals = int(totals[j])
+        direction = "down" if SIGNAL_DIRECTIONS.get(signal) == "down" else "up"
+        success_count = down_counts[j] if direction == "down" else up_counts[j]
+        success_rates[signal] = {
+            "success_rate": (success_count / total_signals) * 100 if total_signals else 0.0,
+            "total_signals": total_signals,
+            "direction": direction
+        }
+
+    return success_rates
+
+
+def latest_metrics(data, previous_close=None):
+    """最新价格/成交量变动"""
+    current_price = data["Close"].iloc[-1]
+    previous_close = previous_close or current_price
+    price_change = current_price - previous_close
+    price_pct_change = (price_change / previous_close) * 100 if previous_close else 0
+
+    last_volume = data["Volume"].iloc[-1]
+    prev_volume = data["Volume"].iloc[-2] if len(data) > 1 else last_volume
+    volume_change = last_volume - prev_volume
+    volume_pct_change = (volume_change / prev_volume) * 100 if prev_volume else 0
+    return {
+        "current_price": current_price,
+        "previous_close": previous_close,
+        "price_change": price_change,
+        "price_pct_change": price_pct_change,
+        "last_volume": last_volume,
+        "volume_change": volume_change,
+        "volume_pct_change": volume_pct_change,
+    }
+
+
+def detect_latest_signals(data, params):
+    """最新一根K线的提醒信号，返回 {信号名: bool}（键见 SIGNAL_NAMES）"""
+    return latest_signals(data, params)
+
+
+def should_alert(metrics, signals, params):
+    return ((abs(metrics["price_pct_change"]) >= params["price_threshold"] and
+             abs(metrics["volume_pct_change"]) >= params["volume_threshold"]) or any(signals.values()))
+
+
+def build_alert_message(ticker, metrics, signals, data, params):
+    alert_msg = f"{ticker} 異動：價格 {metrics['price_pct_change']:.2f}%、成交量 {metrics['volume_pct_change']:.2f}%"
+    for signal in ALERT_SIGNALS:
+        if signals[signal.key]:
+            alert_msg += "，" + signal.message.format(**params)
+    # 新增：加入最新K线形态到提醒
+    if data["K線形態"].iloc[-1] != "普通K線":
+        alert_msg += f"，最新K線形態：{data['K線形態'].iloc[-1]}（{data['單根解讀'].iloc[-1]}）"
+    return alert_msg
+
+
+def build_telegram_message(ticker, data, interval, telegram_signals):
+    """用户选中的信号全部出现在最新K线時返回推送文本，否则返回 None"""
+    if len(data) == 0:
+        return None
+    code = int(data[SIGNAL_MASK_COLUMN].iloc[-1])  # 最新一根K线的信号位掩码
+
+    # 检查是否所有用户选中的信号都存在于最新K线中（按位与）
+    try:
+        required = signal_bits(telegram_signals)
+    except KeyError:
+        return None  # 未知信号名永远不会出现
+    if code & required != required:
+        return None
+    K_signals = signal_text([code])[0]
+    return f"下跌趨勢反轉,買入訊號: {data['Datetime'].iloc[-1]} {ticker}:{interval}:$ {data['Close'].iloc[-1].round(2)} *{K_signals}*{data['成交量標記'].iloc[-1]}*{data['K線形態'].iloc[-1]}*{data['單根解讀'].iloc[-1]}* 同时出现全部信号 => {', '.join(telegram_signals)}"
+
+
+def analyze_ticker(ticker, data, vix_data, previous_close, params, interval, state=None):
+    """完整分析单只股票，返回页面/daemon 需要的全部结果（含各阶段耗时 timings）"""
+    timings = []
+    data = prepare_data(data, vix_data, params, state, timings)
+    with timed("latest_signals", sink=timings):
+        metrics = latest_metrics(data, previous_close)
+        signals = detect_latest_signals(data, params)
+    alert_msg = telegram_msg = None
+    if should_alert(metrics, signals, params):
+        with timed("alert_message", sink=timings):
+            alert_msg = build_alert_message(ticker, metrics, signals, data, params)
+            telegram_msg = build_telegram_message(ticker, data, interval, params["telegram_signals"])
+    with timed("interpretation", sink=timings):
+        interpretation = generate_comprehensive_interpretation(data, params)
+    return {
+        "ticker": ticker,
+        "interval": interval,
+        "data": data,
+        "metrics": metrics,
+        "interpretation": interpretation,
+        "signals": signals,
+        "alert_msg": alert_msg,
+        "telegram_msg": telegram_msg,
+        "timings": timings,
+    }
@@ -0,0 +1,93 @@
+import json
+import os
+import tempfile
+import threading
+
+import pandas as pd
+import yfinance as yf
+
+from bar_store import get_bars
+
+# 报价元数据缓存：stock.info 很慢（多次 HTTP + 大 JSON），而前收盘价每个交易日只变一次；
+# 内存 + 磁盘（JSON）缓存，按美东日期每个交易日刷新一次；info 取不到时由日K线推算前收盘价
+
+QUOTE_CACHE_PATH = os.getenv("QUOTE_CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "quotes.json"))
+QUOTE_FIELDS = ("previousClose", "regularMarketPreviousClose", "shortName", "currency", "exchange",
+                "marketCap", "fiftyTwoWeekHigh", "fiftyTwoWeekLow")
+MARKET_TZ = "America/New_York"
+
+_memory = None  # ticker -> {"date": "YYYY-MM-DD", "source": "info"/"bars", 字段...}
+_lock = threading.Lock()
+stats = {"hits": 0, "info": 0, "bars": 0}
+
+
+def _today():
+    return pd.Timestamp.now(tz=MARKET_TZ).strftime("%Y-%m-%d")
+
+
+def _load():
+    global _memory
+    if _memory is None:
+        try:
+            with open(QUOTE_CACHE_PATH, encoding="utf-8") as f:
+                _memory = json.load(f)
+        except (OSError, ValueError):
+            _memory = {}
+    return _memory
+
+
+def _save():
+    try:
+        directory = os.path.dirname(QUOTE_CACHE_PATH)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(_memory, f, ensure_ascii=False)
+        os.replace(tmp, QUOTE_CACHE_PATH)
+    except OSError:
+        pass  # 无法写盘时只保留内存缓存
+
+
+def previous_close_from_bars(ticker, timeout=20):
+    """由日K线推算前收盘价：今天之前最后一根日K线的收盘价"""
+    daily = get_bars(ticker, "5d", "1d", timeout=timeout)
+    if daily.empty:
+        return None
+    dates = daily["Datetime"].dt.strftime("%Y-%m-%d")
+    before = daily[dates < _today()]
+    return float(before["Close"].iloc[-1]) if not before.empty else None
+
+
+def get_quote(ticker, stock=None, timeout=20):
+    """取得 ticker 的报价元数据（QUOTE_FIELDS），同一交易日内只请求一次"""
+    today = _today()
+    with _lock:
+        cached = _load().get(ticker)
+        if cached is not None and cached.get("date") == today:
+            stats["hits"] += 1
+            return cached
+
+    quote = {"date": today}
+    try:
+        info = (stock or yf.Ticker(ticker)).info
+        quote.update({field: info.get(field) for field in QUOTE_FIELDS})
+        quote["source"] = "info"
+    except Exception:
+        quote["source"] = "bars"
+    if not quote.get("previousClose"):
+        try:
+            quote["previousClose"] = previous_close_from_bars(ticker, timeout)
+        except Exception:
+            quote["previousClose"] = None
+        quote["source"] = "bars"
+
+    with _lock:
+        stats[quote["source"]] += 1
+        if quote.get("previousClose"):
+            _load()[ticker] = quote
+            _save()
+    return quote
+
+
+def get_previous_close(ticker, stock=None, timeout=20):
+    return get_quote(ticker, stock, timeout).get("previousClose")
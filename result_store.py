@@ -0,0 +1,30 @@
+import os
+import pickle
+import tempfile
+
+# daemon.py 每个周期写入的最新分析结果，Streamlit 页面直接读取而不再重复抓取/计算
+
+RESULT_DIR = os.getenv("RESULT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "latest"))
+
+
+def _path(ticker, interval, period):
+    safe = ticker.replace("^", "_").replace("/", "_")
+    return os.path.join(RESULT_DIR, f"{safe}_{interval}_{period}.pkl")
+
+
+def save_result(result, period):
+    """原子写入（先写临时文件再替换），页面读取时不会读到半个文件"""
+    os.makedirs(RESULT_DIR, exist_ok=True)
+    path = _path(result["ticker"], result["interval"], period)
+    fd, tmp = tempfile.mkstemp(dir=RESULT_DIR, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+
+def load_result(ticker, interval, period):
+    path = _path(ticker, interval, period)
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return pickle.load(f)
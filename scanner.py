@@ -0,0 +1,88 @@
+import io
+
+import pandas as pd
+
+from analysis_pool import ANALYSIS_WORKERS, get_pool
+from data_fetch import fetch_all, get_vix_data
+from pipeline import prepare_data, latest_metrics, detect_latest_signals, should_alert
+from signal_engine import SIGNAL_MASK_COLUMN, prefix_bits, signal_text
+
+# 扫描模式：对大量股票（如 S&P 500）运行同一信号流水线，只返回每只股票一行的最新信号汇总，
+# 计算在共享进程池中按 CPU 核数并行；页面只渲染一张表，单只股票详情按需计算
+
+SCAN_FETCH_WORKERS = 32
+BUY_BITS, SELL_BITS = prefix_bits("📈"), prefix_bits("📉")
+
+
+def parse_universe(text, uploaded=None):
+    """从输入框文本（逗号/换行分隔）与上传文件（TXT，或含 Symbol/Ticker 列的 CSV）解析股票清单"""
+    tickers = [t for line in (text or "").splitlines() for t in line.split(",")]
+    if uploaded is not None:
+        content = uploaded.getvalue().decode("utf-8", errors="ignore")
+        if uploaded.name.lower().endswith(".csv"):
+            frame = pd.read_csv(io.StringIO(content))
+            column = next((c for c in frame.columns if c.strip().lower() in ("symbol", "ticker", "代號")), frame.columns[0])
+            tickers += frame[column].astype(str).tolist()
+        else:
+            tickers += [t for line in content.splitlines() for t in line.split(",")]
+    seen = dict.fromkeys(t.strip().upper().replace(".", "-") for t in tickers if t.strip())
+    return list(seen)
+
+
+def scan_ticker(ticker, data, vix_data, previous_close, params):
+    """单只股票的汇总行（纯函数，可在子进程中执行）"""
+    data = prepare_data(data, vix_data, params)
+    metrics = latest_metrics(data, previous_close)
+    signals = detect_latest_signals(data, params)
+    code = int(data[SIGNAL_MASK_COLUMN].iloc[-1])
+    return {
+        "股票": ticker,
+        "時間": data["Datetime"].iloc[-1],
+        "價格": round(float(metrics["current_price"]), 2),
+        "價格變動 (%)": round(float(metrics["price_pct_change"]), 2),
+        "成交量變動 (%)": round(float(metrics["volume_pct_change"]), 2),
+        "RSI": round(float(data["RSI"].iloc[-1]), 1) if pd.notna(data["RSI"].iloc[-1]) else None,
+        "買入信號數": (code & BUY_BITS).bit_count(),
+        "賣出信號數": (code & SELL_BITS).bit_count(),
+        "K線形態": data["K線形態"].iloc[-1],
+        "異動提醒": should_alert(metrics, signals, params),
+        "異動標記": signal_text([code])[0],
+    }
+
+
+def _scan_task(args):
+    try:
+        return scan_ticker(*args)
+    except Exception as e:
+        return {"股票": args[0], "錯誤": str(e)}
+
+
+def scan(tickers, period, interval, params, max_workers=None):
+    """抓取并分析整个清单，返回 (汇总表, 失败清单)；max_workers=1 时在本进程内顺序执行"""
+    fetched = fetch_all(tickers, period, interval, max_workers=SCAN_FETCH_WORKERS)
+    vix_data = get_vix_data(period, interval)
+    tasks, errors = [], {}
+    for ticker in tickers:
+        result = fetched[ticker]
+        if result["error"] is not None:
+            errors[ticker] = str(result["error"])
+        elif result["data"].empty or len(result["data"]) < 2:
+            errors[ticker] = "無數據或數據不足"
+        else:
+            tasks.append((ticker, result["data"], vix_data, result["previous_close"], params))
+
+    rows = []
+    workers = max_workers or ANALYSIS_WORKERS
+    if workers > 1 and len(tasks) > 1:
+        outputs = get_pool().map(_scan_task, tasks, chunksize=max(1, len(tasks) // (workers * 4)))
+    else:
+        outputs = map(_scan_task, tasks)
+    for row in outputs:
+        if "錯誤" in row:
+            errors[row["股票"]] = row["錯誤"]
+        else:
+            rows.append(row)
+    table = pd.DataFrame(rows)
+    if not table.empty:
+        table = table.sort_values(["異動提醒", "買入信號數", "賣出信號數"], ascending=False).reset_index(drop=True)
+    return table, errors
@@ -0,0 +1,508 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+# 向量化信号引擎：以整列布尔数组计算所有異動標記（编码为每根K线一个位掩码），取代逐行 mark_signal
+# 全部信号定义在 SIGNALS 表中，異動標記、最新K线提醒、提醒文本、K线图标记与成功率方向都由此表生成
+
+
+def _shift(values, periods=1):
+    """数组平移（与 Series.shift 相同，空位补 NaN）"""
+    out = np.full(values.shape, np.nan)
+    if periods > 0:
+        out[periods:] = values[:-periods]
+    elif periods < 0:
+        out[:periods] = values[-periods:]
+    else:
+        out[:] = values
+    return out
+
+
+def _window_mean(values, window):
+    """以第 i 根为终点（含）的 window 根均值，跳过 NaN，与 iloc 切片 .mean() 一致"""
+    out = np.full(values.shape, np.nan)
+    if len(values) < window:
+        return out
+    windows = np.lib.stride_tricks.sliding_window_view(values, window)
+    valid = ~np.isnan(windows)
+    count = valid.sum(axis=1)
+    total = np.where(valid, windows, 0.0).sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out[window - 1:] = np.where(count > 0, total / np.maximum(count, 1), np.nan)
+    return out
+
+
+def _col(data, name):
+    return data[name].to_numpy(dtype=float, na_value=np.nan)
+
+
+class SignalContext:
+    """信号判断共用的数组（开高低收量、前一根/前两根、各指标列），每个数组只计算一次
+
+    start 为 data 第一行在完整数据中的位置；只判断最新K线时传入尾段即可，
+    “是否有前一根”等条件仍按完整数据的位置计算。
+    """
+
+    def __init__(self, data, params, start=0):
+        self.params = params
+        n = len(data)
+        self.idx = idx = np.arange(start, start + n)
+        self.has_prev = idx > 0
+        self.has_prev2 = idx > 1
+
+        o, h, l, c, v = (_col(data, k) for k in ("Open", "High", "Low", "Close", "Volume"))
+        po, ph, pl, pc, pv = (_shift(x) for x in (o, h, l, c, v))
+        o2, c2 = _shift(o, 2), _shift(c, 2)
+        self.o, self.h, self.l, self.c, self.v = o, h, l, c, v
+        self.po, self.ph, self.pl, self.pc, self.pv = po, ph, pl, pc, pv
+        self.o2, self.c2 = o2, c2
+        self.nc = _shift(c, -1)
+
+        self.rsi = _col(data, "RSI")
+        self.macd = _col(data, "MACD")
+        self.pmacd = _shift(self.macd)
+        self.signal = _col(data, "Signal")
+        self.ema5, self.ema10, self.ema30, self.ema40 = (_col(data, k) for k in ("EMA5", "EMA10", "EMA30", "EMA40"))
+        self.pema5, self.pema10, self.pema30 = _shift(self.ema5), _shift(self.ema10), _shift(self.ema30)
+        self.sma50, self.sma200 = _col(data, "SMA50"), _col(data, "SMA200")
+        self.price_pct = _col(data, "Price Change %")
+        self.volume_pct = _col(data, "Volume Change %")
+        self.continuous_up = _col(data, "Continuous_Up")
+        self.continuous_down = _col(data, "Continuous_Down")
+        self.vwap = _col(data, "VWAP")
+        self.pvwap = _shift(self.vwap)
+        self.mfi = _col(data, "MFI")
+        self.mfi_bull = data["MFI_Bull_Div"].to_numpy(dtype=bool)
+        self.mfi_bear = data["MFI_Bear_Div"].to_numpy(dtype=bool)
+        self.obv = _col(data, "OBV")
+        self.obv_prev_max = _shift(_col(data, "OBV_Roll_Max"))
+        self.obv_prev_min = _shift(_col(data, "OBV_Roll_Min"))
+        self.vix = _col(data, "VIX")
+        self.pvix = _shift(self.vix)
+        self.vix_fast, self.vix_slow = _col(data, "VIX_EMA_Fast"), _col(data, "VIX_EMA_Slow")
+        self.pvix_fast, self.pvix_slow = _shift(self.vix_fast), _shift(self.vix_slow)
+        self.price_abs_pct = _col(data, "📈 股價漲跌幅 (%)")
+        self.volume_abs_pct = _col(data, "📊 成交量變動幅 (%)")
+
+        self.high_volume = v > _col(data, "前5均量")
+        self.price_up = self.has_prev & (h > ph) & (l > pl) & (c > pc)
+        self.price_down = self.has_prev & (h < ph) & (l < pl) & (c < pc)
+        self.ema10_30_up = self.has_prev & (self.ema10 > self.ema30) & (self.pema10 <= self.pema30)
+        self.ema10_30_down = self.has_prev & (self.ema10 < self.ema30) & (self.pema10 >= self.pema30)
+        body = np.abs(c - o)
+        lower_shadow = np.minimum(o, c) - l
+        upper_shadow = h - np.maximum(o, c)
+        self.hammer_shape = (body < (h - l) * 0.3) & (lower_shadow >= 2 * body) & (upper_shadow < lower_shadow)
+        self.small_middle = np.abs(pc - po) < 0.3 * np.abs(c2 - o2)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            gap_pct = (o - pc) / pc * 100
+        self.up_gap = self.has_prev & (gap_pct > params["gap_threshold"])
+        self.down_gap = self.has_prev & (gap_pct < -params["gap_threshold"])
+        self.mean5 = _window_mean(c, 5)
+        self._gaps = {}
+
+    def _classify_gaps(self, trend, prev_trend, reversal):
+        """跳空分类优先级：衰竭 > 持續 > 突破 > 普通，每根K线至多一种"""
+        c, hv = self.c, self.high_volume
+        up_trend = (c > trend) & (trend > prev_trend)
+        down_trend = (c < trend) & (trend < prev_trend)
+        gaps = {}
+        for side, gap, trending, breakout in (("up", self.up_gap, up_trend, self.h > self.ph),
+                                              ("down", self.down_gap, down_trend, self.l < self.pl)):
+            exhaustion = gap & reversal & hv
+            runaway = gap & ~exhaustion & trending & hv
+            breakaway = gap & ~exhaustion & ~runaway & breakout & hv
+            gaps[f"exhaustion_{side}"] = exhaustion
+            gaps[f"runaway_{side}"] = runaway
+            gaps[f"breakaway_{side}"] = breakaway
+            gaps[f"common_{side}"] = gap & ~exhaustion & ~runaway & ~breakaway
+        return gaps
+
+    @property
+    def mark_gaps(self):
+        """異動標記的跳空：前5根均值作趋势，由下一根K线判断反转（不足5/6根时趋势为 0 / 同 trend）"""
+        if "mark" not in self._gaps:
+            idx = self.idx
+            trend = np.where(idx >= 5, _shift(self.mean5, 1), 0.0)
+            prev_trend = np.where(idx >= 6, _shift(self.mean5, 2), trend)
+            n = self.idx[-1] + 1 if len(idx) else 0
+            reversal = (idx < n - 1) & ((self.up_gap & (self.nc < self.c)) | (self.down_gap & (self.nc > self.c)))
+            self._gaps["mark"] = self._classify_gaps(trend, prev_trend, reversal)
+        return self._gaps["mark"]
+
+    @property
+    def alert_gaps(self):
+        """提醒的跳空：含当前K线的5根均值作趋势，由当前K线与前一根比较判断反转"""
+        if "alert" not in self._gaps:
+            idx = self.idx
+            trend = np.where(idx >= 4, self.mean5, 0.0)
+            prev_trend = np.where(idx >= 5, _shift(self.mean5, 1), trend)
+            reversal = self.has_prev2 & ((self.up_gap & (self.c < self.pc)) | (self.down_gap & (self.c > self.pc)))
+            self._gaps["alert"] = self._classify_gaps(trend, prev_trend, reversal)
+        return self._gaps["alert"]
+
+
+# 信号表：每个信号一行 —— 異動標記名称、方向、異動標記条件、最新K线提醒的键与条件、提醒/Email 文本、K线图标记
+# mark / alert 为以 SignalContext 为参数的向量化条件；alert=SAME 表示提醒条件与異動標記相同，
+# alert=None 表示只出现在異動標記中；文本中的 {参数名} 按阈值参数填入；
+# chart 为 (子图行, 标记形状, 颜色, 文字位置, 文字模板)，行 2/3 的标记画在 OBV/MFI 上
+Signal = namedtuple("Signal", "label direction mark key alert message email chart",
+                    defaults=(None, None, None, None, None))
+SAME = "same"
+
+SIGNALS = [
+    Signal("✅ 量價", "neutral",
+           lambda x: (np.abs(x.price_abs_pct) >= x.params["price_threshold"]) &
+                     (np.abs(x.volume_abs_pct) >= x.params["volume_threshold"])),
+    Signal("📈 Low>High", "up", lambda x: x.has_prev & (x.l > x.ph),
+           "low_high_signal", SAME, "當前最低價高於前一時段最高價", "⚠️ 當前最低價高於前一時段最高價！"),
+    Signal("📉 High<Low", "down", lambda x: x.has_prev & (x.h < x.pl),
+           "high_low_signal", SAME, "當前最高價低於前一時段最低價", "⚠️ 當前最高價低於前一時段最低價！"),
+    Signal("📈 MACD買入", "up", lambda x: x.has_prev & (x.macd > 0) & (x.pmacd <= 0) & (x.rsi < 50),
+           "macd_buy_signal", lambda x: x.has_prev & (x.macd > 0) & (x.pmacd <= 0),
+           "MACD 買入訊號（MACD 線由負轉正）", "📈 MACD 買入訊號：MACD 線由負轉正！"),
+    Signal("📉 MACD賣出", "down", lambda x: x.has_prev & (x.macd <= 0) & (x.pmacd > 0) & (x.rsi > 50),
+           "macd_sell_signal", lambda x: x.has_prev & (x.macd <= 0) & (x.pmacd > 0),
+           "MACD 賣出訊號（MACD 線由正轉負）", "📉 MACD 賣出訊號：MACD 線由正轉負！"),
+    Signal("📈 EMA買入", "up",
+           lambda x: x.has_prev & (x.ema5 > x.ema10) & (x.pema5 <= x.pema10) & (x.v > x.pv) & (x.rsi < 50),
+           "ema_buy_signal", lambda x: x.has_prev & (x.ema5 > x.ema10) & (x.pema5 <= x.pema10) & (x.v > x.pv),
+           "EMA 買入訊號（EMA5 上穿 EMA10，成交量放大）", "📈 EMA 買入訊號：EMA5 上穿 EMA10，成交量放大！"),
+    Signal("📉 EMA賣出", "down",
+           lambda x: x.has_prev & (x.ema5 < x.ema10) & (x.pema5 >= x.pema10) & (x.v > x.pv) & (x.rsi > 50),
+           "ema_sell_signal", lambda x: x.has_prev & (x.ema5 < x.ema10) & (x.pema5 >= x.pema10) & (x.v > x.pv),
+           "EMA 賣出訊號（EMA5 下破 EMA10，成交量放大）", "📉 EMA 賣出訊號：EMA5 下破 EMA10，成交量放大！"),
+    Signal("📈 價格趨勢買入", "up", lambda x: x.price_up & (x.macd > 0),
+           "price_trend_buy_signal", lambda x: x.price_up,
+           "價格趨勢買入訊號（最高價、最低價、收盤價均上漲）", "📈 價格趨勢買入訊號：最高價、最低價、收盤價均上漲！"),
+    Signal("📉 價格趨勢賣出", "down", lambda x: x.price_down & (x.macd < 0),
+           "price_trend_sell_signal", lambda x: x.price_down,
+           "價格趨勢賣出訊號（最高價、最低價、收盤價均下跌）", "📉 價格趨勢賣出訊號：最高價、最低價、收盤價均下跌！"),
+    Signal("📈 價格趨勢買入(量)", "up", lambda x: x.price_up & x.high_volume & (x.rsi < 50),
+           "price_trend_vol_buy_signal", lambda x: x.price_up & x.high_volume,
+           "價格趨勢買入訊號（量）（最高價、最低價、收盤價均上漲且成交量放大）",
+           "📈 價格趨勢買入訊號（量）：最高價、最低價、收盤價均上漲且成交量放大！"),
+    Signal("📉 價格趨勢賣出(量)", "down", lambda x: x.price_down & x.high_volume & (x.rsi > 50),
+           "price_trend_vol_sell_signal", lambda x: x.price_down & x.high_volume,
+           "價格趨勢賣出訊號（量）（最高價、最低價、收盤價均下跌且成交量放大）",
+           "📉 價格趨勢賣出訊號（量）：最高價、最低價、收盤價均下跌且成交量放大！"),
+    Signal("📈 價格趨勢買入(量%)", "up", lambda x: x.price_up & (x.volume_pct > 15) & (x.rsi < 50),
+           "price_trend_vol_pct_buy_signal", lambda x: x.price_up & (x.volume_pct > 15),
+           "價格趨勢買入訊號（量%）（最高價、最低價、收盤價均上漲且成交量變化 > 15%）",
+           "📈 價格趨勢買入訊號（量%）：最高價、最低價、收盤價均上漲且成交量變化 > 15%！"),
+    Signal("📉 價格趨勢賣出(量%)", "down", lambda x: x.price_down & (x.volume_pct > 15) & (x.rsi > 50),
+           "price_trend_vol_pct_sell_signal", lambda x: x.price_down & (x.volume_pct > 15),
+           "價格趨勢賣出訊號（量%）（最高價、最低價、收盤價均下跌且成交量變化 > 15%）",
+           "📉 價格趨勢賣出訊號（量%）：最高價、最低價、收盤價均下跌且成交量變化 > 15%！"),
+    Signal("📈 衰竭跳空(上)", "up", lambda x: x.mark_gaps["exhaustion_up"],
+           "gap_exhaustion_up", lambda x: x.alert_gaps["exhaustion_up"],
+           "衰竭跳空(上)（價格向上跳空，趨勢末端且隨後價格下跌，成交量放大）",
+           "📈 衰竭跳空(上)：價格向上跳空，趨勢末端且隨後價格下跌，成交量放大！"),
+    Signal("📈 持續跳空(上)", "up", lambda x: x.mark_gaps["runaway_up"],
+           "gap_runaway_up", lambda x: x.alert_gaps["runaway_up"],
+           "持續跳空(上)（價格向上跳空，處於上漲趨勢且成交量放大）", "📈 持續跳空(上)：價格向上跳空，處於上漲趨勢且成交量放大！"),
+    Signal("📈 突破跳空(上)", "up", lambda x: x.mark_gaps["breakaway_up"],
+           "gap_breakaway_up", lambda x: x.alert_gaps["breakaway_up"],
+           "突破跳空(上)（價格向上跳空，突破前高且成交量放大）", "📈 突破跳空(上)：價格向上跳空，突破前高且成交量放大！"),
+    Signal("📈 普通跳空(上)", "up", lambda x: x.mark_gaps["common_up"],
+           "gap_common_up", lambda x: x.alert_gaps["common_up"],
+           "普通跳空(上)（價格向上跳空，未伴隨明顯趨勢或成交量放大）", "📈 普通跳空(上)：價格向上跳空，未伴隨明顯趨勢或成交量放大！"),
+    Signal("📉 衰竭跳空(下)", "down", lambda x: x.mark_gaps["exhaustion_down"],
+           "gap_exhaustion_down", lambda x: x.alert_gaps["exhaustion_down"],
+           "衰竭跳空(下)（價格向下跳空，趨勢末端且隨後價格上漲，成交量放大）",
+           "📉 衰竭跳空(下)：價格向下跳空，趨勢末端且隨後價格上漲，成交量放大！"),
+    Signal("📉 持續跳空(下)", "down", lambda x: x.mark_gaps["runaway_down"],
+           "gap_runaway_down", lambda x: x.alert_gaps["runaway_down"],
+           "持續跳空(下)（價格向下跳空，處於下跌趨勢且成交量放大）", "📉 持續跳空(下)：價格向下跳空，處於下跌趨勢且成交量放大！"),
+    Signal("📉 突破跳空(下)", "down", lambda x: x.mark_gaps["breakaway_down"],
+           "gap_breakaway_down", lambda x: x.alert_gaps["breakaway_down"],
+           "突破跳空(下)（價格向下跳空，跌破前低且成交量放大）", "📉 突破跳空(下)：價格向下跳空，跌破前低且成交量放大！"),
+    Signal("📉 普通跳空(下)", "down", lambda x: x.mark_gaps["common_down"],
+           "gap_common_down", lambda x: x.alert_gaps["common_down"],
+           "普通跳空(下)（價格向下跳空，未伴隨明顯趨勢或成交量放大）", "📉 普通跳空(下)：價格向下跳空，未伴隨明顯趨勢或成交量放大！"),
+    Signal("📈 連續向上買入", "up",
+           lambda x: (x.continuous_up >= x.params["continuous_up_threshold"]) & (x.rsi < 70),
+           "continuous_up_buy_signal", lambda x: x.continuous_up >= x.params["continuous_up_threshold"],
+           "連續向上策略買入訊號（至少連續 {continuous_up_threshold} 根K線上漲）", "📈 連續向上策略買入訊號：至少連續上漲！"),
+    Signal("📉 連續向下賣出", "down",
+           lambda x: (x.continuous_down >= x.params["continuous_down_threshold"]) & (x.rsi > 30),
+           "continuous_down_sell_signal", lambda x: x.continuous_down >= x.params["continuous_down_threshold"],
+           "連續向下策略賣出訊號（至少連續 {continuous_down_threshold} 根K線下跌）", "📉 連續向下策略賣出訊號：至少連續下跌！"),
+    Signal("📈 SMA50上升趨勢", "up", lambda x: (x.c > x.sma50) & (x.macd > 0),
+           "sma50_up_trend", lambda x: x.c > x.sma50,
+           "SMA50 上升趨勢（當前價格高於 SMA50）", "📈 SMA50 上升趨勢：當前價格高於 SMA50！"),
+    Signal("📉 SMA50下降趨勢", "down", lambda x: (x.c < x.sma50) & (x.macd < 0),
+           "sma50_down_trend", lambda x: x.c < x.sma50,
+           "SMA50 下降趨勢（當前價格低於 SMA50）", "📉 SMA50 下降趨勢：當前價格低於 SMA50！"),
+    Signal("📈 SMA50_200上升趨勢", "up", lambda x: (x.c > x.sma50) & (x.sma50 > x.sma200) & (x.macd > 0),
+           "sma50_200_up_trend", lambda x: (x.c > x.sma50) & (x.sma50 > x.sma200),
+           "SMA50_200 上升趨勢（當前價格高於 SMA50 且 SMA50 高於 SMA200）",
+           "📈 SMA50_200 上升趨勢：當前價格高於 SMA50 且 SMA50 高於 SMA200！"),
+    Signal("📉 SMA50_200下降趨勢", "down", lambda x: (x.c < x.sma50) & (x.sma50 < x.sma200) & (x.macd < 0),
+           "sma50_200_down_trend", lambda x: (x.c < x.sma50) & (x.sma50 < x.sma200),
+           "SMA50_200 下降趨勢（當前價格低於 SMA50 且 SMA50 低於 SMA200）",
+           "📉 SMA50_200 下降趨勢：當前價格低於 SMA50 且 SMA50 低於 SMA200！"),
+    Signal("📈 新买入信号", "up", lambda x: x.has_prev & (x.c > x.o) & (x.o > x.pc) & (x.rsi < 70),
+           "new_buy_signal", lambda x: x.has_prev & (x.c > x.o) & (x.o > x.pc),
+           "新买入信号（今日收盘价大于开盘价且今日开盘价大于前日收盘价）", "📈 新买入信号：今日收盘价大于开盘价且今日开盘价大于前日收盘价！",
+           (1, "triangle-up", "green", "bottom center", "📈 新买入 $%{y:.2f}")),
+    Signal("📉 新卖出信号", "down", lambda x: x.has_prev & (x.c < x.o) & (x.o < x.pc) & (x.rsi > 30),
+           "new_sell_signal", lambda x: x.has_prev & (x.c < x.o) & (x.o < x.pc),
+           "新卖出信号（今日收盘价小于开盘价且今日开盘价小于前日收盘价）", "📉 新卖出信号：今日收盘价小于开盘价且今日开盘价小于前日收盘价！",
+           (1, "triangle-down", "red", "top center", "📉 新卖出 $%{y:.2f}")),
+    Signal("🔄 新转折点", "neutral",
+           lambda x: x.has_prev & (np.abs(x.price_pct) > x.params["price_change_threshold"]) &
+                     (np.abs(x.volume_pct) > x.params["volume_change_threshold"]) & (x.macd > x.signal),
+           "new_pivot_signal",
+           lambda x: x.has_prev & (np.abs(x.price_pct) > x.params["price_change_threshold"]) &
+                     (np.abs(x.volume_pct) > x.params["volume_change_threshold"]),
+           "新转折点（|Price Change %| > {price_change_threshold}% 且 |Volume Change %| > {volume_change_threshold}%）",
+           "🔄 新转折点：|Price Change %| > {price_change_threshold}% 且 |Volume Change %| > {volume_change_threshold}%！",
+           (1, "star", "purple", "top center", "🔄 新转折点 $%{y:.2f}")),
+    Signal("📈 RSI-MACD Oversold Crossover", "up", lambda x: x.has_prev & (x.rsi < 30) & (x.macd > 0) & (x.pmacd <= 0)),
+    Signal("📈 EMA-SMA Uptrend Buy", "up", lambda x: x.has_prev & (x.ema5 > x.ema10) & (x.c > x.sma50)),
+    Signal("📈 Volume-MACD Buy", "up", lambda x: x.has_prev & x.high_volume & (x.macd > 0) & (x.pmacd <= 0)),
+    Signal("📉 RSI-MACD Overbought Crossover", "down",
+           lambda x: x.has_prev & (x.rsi > 70) & (x.macd < 0) & (x.pmacd >= 0)),
+    Signal("📉 EMA-SMA Downtrend Sell", "down", lambda x: x.has_prev & (x.ema5 < x.ema10) & (x.c < x.sma50)),
+    Signal("📉 Volume-MACD Sell", "down", lambda x: x.has_prev & x.high_volume & (x.macd < 0) & (x.pmacd >= 0)),
+    Signal("📈 EMA10_30買入", "up", lambda x: x.ema10_30_up,
+           "ema10_30_buy_signal", SAME, "EMA10_30 買入訊號（EMA10 上穿 EMA30）", "📈 EMA10_30 買入訊號：EMA10 上穿 EMA30！",
+           (1, "triangle-up", "limegreen", "bottom center", "📈 EMA10_30買入")),
+    Signal("📈 EMA10_30_40強烈買入", "up", lambda x: x.ema10_30_up & (x.ema10 > x.ema40),
+           "ema10_30_40_strong_buy_signal", SAME,
+           "EMA10_30_40 強烈買入訊號（EMA10 上穿 EMA30 且高於 EMA40）", "📈 EMA10_30_40 強烈買入訊號：EMA10 上穿 EMA30 且高於 EMA40！",
+           (1, "triangle-up", "darkgreen", "bottom center", "📈 EMA10_30_40強烈買入")),
+    Signal("📉 EMA10_30賣出", "down", lambda x: x.ema10_30_down,
+           "ema10_30_sell_signal", SAME, "EMA10_30 賣出訊號（EMA10 下破 EMA30）", "📉 EMA10_30 賣出訊號：EMA10 下破 EMA30！",
+           (1, "triangle-down", "tomato", "top center", "📉 EMA10_30賣出")),
+    Signal("📉 EMA10_30_40強烈賣出", "down", lambda x: x.ema10_30_down & (x.ema10 < x.ema40),
+           "ema10_30_40_strong_sell_signal", SAME,
+           "EMA10_30_40 強烈賣出訊號（EMA10 下破 EMA30 且低於 EMA40）", "📉 EMA10_30_40 強烈賣出訊號：EMA10 下破 EMA30 且低於 EMA40！",
+           (1, "triangle-down", "darkred", "top center", "📉 EMA10_30_40強烈賣出")),
+    Signal("📈 看漲吞沒", "up",
+           lambda x: x.has_prev & (x.pc < x.po) & (x.c > x.o) & (x.o < x.pc) & (x.c > x.po) & x.high_volume & (x.rsi < 50),
+           "bullish_engulfing", SAME,
+           "看漲吞沒形態（當前K線完全包圍前一根看跌K線，成交量放大）", "📈 看漲吞沒形態：當前K線完全包圍前一根看跌K線，成交量放大！",
+           (1, "triangle-up", "green", "bottom center", "📈 看漲吞沒")),
+    Signal("📉 看跌吞沒", "down",
+           lambda x: x.has_prev & (x.pc > x.po) & (x.c < x.o) & (x.o > x.pc) & (x.c < x.po) & x.high_volume & (x.rsi > 50),
+           "bearish_engulfing", SAME,
+           "看跌吞沒形態（當前K線完全包圍前一根看漲K線，成交量放大）", "📉 看跌吞沒形態：當前K線完全包圍前一根看漲K線，成交量放大！",
+           (1, "triangle-down", "red", "top center", "📉 看跌吞沒")),
+    Signal("📈 錘頭線", "up", lambda x: x.has_prev & (x.c > x.pc) & x.hammer_shape & x.high_volume & (x.rsi < 50),
+           "hammer", SAME, "錘頭線（下影線較長，買方介入，預示反轉）", "📈 錘頭線：下影線較長，買方介入，預示反轉！",
+           (1, "triangle-up", "green", "bottom center", "📈 錘頭線")),
+    Signal("📉 上吊線", "down", lambda x: x.has_prev & (x.c < x.pc) & x.hammer_shape & x.high_volume & (x.rsi > 50),
+           "hanging_man", SAME, "上吊線（下影線較長，賣方介入，預示反轉）", "📉 上吊線：下影線較長，賣方介入，預示反轉！",
+           (1, "triangle-down", "red", "top center", "📉 上吊線")),
+    Signal("📈 早晨之星", "up",
+           lambda x: x.has_prev2 & (x.c2 < x.o2) & x.small_middle & (x.c > x.o) & (x.c > (x.o2 + x.c2) / 2) &
+                     x.high_volume & (x.rsi < 50),
+           "morning_star", SAME,
+           "早晨之星（下跌後出現小實體K線，隨後強烈看漲K線，預示反轉）", "📈 早晨之星：下跌後出現小實體K線，隨後強烈看漲K線，預示反轉！",
+           (1, "triangle-up", "green", "bottom center", "📈 早晨之星")),
+    Signal("📉 黃昏之星", "down",
+           lambda x: x.has_prev2 & (x.c2 > x.o2) & x.small_middle & (x.c < x.o) & (x.c < (x.o2 + x.c2) / 2) &
+                     x.high_volume & (x.rsi > 50),
+           "evening_star", SAME,
+           "黃昏之星（上漲後出現小實體K線，隨後強烈看跌K線，預示反轉）", "📉 黃昏之星：上漲後出現小實體K線，隨後強烈看跌K線，預示反轉！",
+           (1, "triangle-down", "red", "top center", "📉 黃昏之星")),
+    Signal("📉 烏雲蓋頂", "down",
+           lambda x: x.has_prev & (x.pc > x.po) & (x.o > x.pc) & (x.c < x.o) & (x.c < (x.po + x.pc) / 2) & x.high_volume),
+    Signal("📈 刺透形態", "up",
+           lambda x: x.has_prev & (x.pc < x.po) & (x.o < x.pc) & (x.c > x.o) & (x.c > (x.po + x.pc) / 2) & x.high_volume),
+    Signal("📈 VWAP買入", "up", lambda x: x.has_prev & ~np.isnan(x.vwap) & (x.c > x.vwap) & (x.pc <= x.pvwap),
+           "vwap_buy_signal", SAME, "VWAP 買入訊號（價格上穿 VWAP，作為主進場基準）", "📈 VWAP 買入訊號：價格上穿 VWAP，作為主進場基準！",
+           (1, "triangle-up", "purple", "bottom center", "📈 VWAP買入")),
+    Signal("📉 VWAP賣出", "down", lambda x: x.has_prev & ~np.isnan(x.vwap) & (x.c < x.vwap) & (x.pc >= x.pvwap),
+           "vwap_sell_signal", SAME, "VWAP 賣出訊號（價格下破 VWAP，作為主出場基準）", "📉 VWAP 賣出訊號：價格下破 VWAP，作為主出場基準！",
+           (1, "triangle-down", "purple", "top center", "📉 VWAP賣出")),
+    Signal("📈 MFI牛背離買入", "up",
+           lambda x: (x.idx >= x.params["mfi_divergence_window"]) & ~np.isnan(x.mfi) & x.mfi_bull,
+           "mfi_bull_divergence", lambda x: (x.idx >= x.params["mfi_divergence_window"]) & x.mfi_bull,
+           "MFI 牛背離買入（價格新低但 MFI 未新低，偵測超賣背離）", "📈 MFI 牛背離買入：價格新低但 MFI 未新低，偵測超賣背離！",
+           (3, "triangle-up", "green", "bottom center", "📈 MFI牛背離")),
+    Signal("📉 MFI熊背離賣出", "down",
+           lambda x: (x.idx >= x.params["mfi_divergence_window"]) & ~np.isnan(x.mfi) & x.mfi_bear,
+           "mfi_bear_divergence", lambda x: (x.idx >= x.params["mfi_divergence_window"]) & x.mfi_bear,
+           "MFI 熊背離賣出（價格新高但 MFI 未新高，偵測超買背離）", "📉 MFI 熊背離賣出：價格新高但 MFI 未新高，偵測超買背離！",
+           (3, "triangle-down", "red", "top center", "📉 MFI熊背離")),
+    Signal("📈 OBV突破買入", "up", lambda x: x.has_prev & (x.c > x.pc) & (x.obv > x.obv_prev_max),
+           "obv_breakout_buy", SAME, "OBV 突破買入（OBV 新高確認價格上漲量能）", "📈 OBV 突破買入：OBV 新高確認價格上漲量能！",
+           (2, "triangle-up", "green", "bottom center", "📈 OBV突破")),
+    Signal("📉 OBV突破賣出", "down", lambda x: x.has_prev & (x.c < x.pc) & (x.obv < x.obv_prev_min),
+           "obv_breakout_sell", SAME, "OBV 突破賣出（OBV 新低確認價格下跌量能）", "📉 OBV 突破賣出：OBV 新低確認價格下跌量能！",
+           (2, "triangle-down", "red", "top center", "📉 OBV突破")),
+    Signal("📉 VIX恐慌賣出", "down", lambda x: x.has_prev & (x.vix > x.params["vix_high_threshold"]) & (x.vix > x.pvix),
+           "vix_panic_sell", SAME, "VIX 恐慌賣出（VIX > 30 且上升，市場恐慌加劇）", "📉 VIX 恐慌賣出訊號：VIX > 30 且上升，市場恐慌加劇！",
+           (1, "x", "red", "top center", "📉 VIX恐慌")),
+    Signal("📈 VIX平靜買入", "up", lambda x: x.has_prev & (x.vix < x.params["vix_low_threshold"]) & (x.vix < x.pvix),
+           "vix_calm_buy", SAME, "VIX 平靜買入（VIX < 20 且下降，市場穩定）", "📈 VIX 平靜買入訊號：VIX < 20 且下降，市場穩定！",
+           (1, "circle", "green", "bottom center", "📈 VIX平靜")),
+    Signal("📉 VIX上升趨勢賣出", "down",
+           lambda x: x.has_prev & (x.vix_fast > x.vix_slow) & (x.pvix_fast <= x.pvix_slow),
+           "vix_uptrend_sell", SAME,
+           "VIX 上升趨勢賣出（VIX EMA5 上穿 EMA10，恐慌增加）", "📉 VIX 上升趨勢賣出訊號：VIX EMA5 上穿 EMA10，恐慌增加，建議減持！",
+           (1, "x", "orange", "top center", "📉 VIX上升")),
+    Signal("📈 VIX下降趨勢買入", "up",
+           lambda x: x.has_prev & (x.vix_fast < x.vix_slow) & (x.pvix_fast >= x.pvix_slow),
+           "vix_downtrend_buy", SAME,
+           "VIX 下降趨勢買入（VIX EMA5 下破 EMA10，市場平靜）", "📈 VIX 下降趨勢買入訊號：VIX EMA5 下破 EMA10，市場平靜，適合進場！",
+           (1, "circle", "teal", "bottom center", "📈 VIX下降")),
+]
+
+SIGNAL_LABELS = [s.label for s in SIGNALS]
+SIGNAL_DIRECTIONS = {s.label: s.direction for s in SIGNALS}
+ALERT_SIGNALS = [s for s in SIGNALS if s.key]
+ALERT_KEYS = tuple(s.key for s in ALERT_SIGNALS)
+ALERT_TAIL = 7  # 判断最新K线最多需要往前 6 根（跳空趋势的前一窗口均值）
+
+DEFAULT_SIGNAL_PARAMS = {
+    "price_threshold": 80.0, "volume_threshold": 80.0,
+    "price_change_threshold": 5.0, "volume_change_threshold": 10.0,
+    "gap_threshold": 1.0, "continuous_up_threshold": 3, "continuous_down_threshold": 3,
+    "mfi_divergence_window": 5, "vix_high_threshold": 30.0, "vix_low_threshold": 20.0,
+}
+
+
+def compute_signal_masks(data, **params):
+    """按信号表顺序返回 [(信号名, 布尔数组), ...]，关键转折点除外"""
+    ctx = SignalContext(data, dict(DEFAULT_SIGNAL_PARAMS, **params))
+    return [(s.label, s.mark(ctx)) for s in SIGNALS]
+
+
+def latest_signals(data, params):
+    """最新一根K线的提醒信号 {键: bool}，只取尾段计算，每个条件计算一次"""
+    tail = data.iloc[-ALERT_TAIL:]
+    ctx = SignalContext(tail, dict(DEFAULT_SIGNAL_PARAMS, **params), start=len(data) - len(tail))
+    return {s.key: bool(len(tail) and (s.mark if s.alert == SAME else s.alert)(ctx)[-1]) for s in ALERT_SIGNALS}
+
+
+KEY_PIVOT_AFTER = "🔄 新转折点"  # 关键转折点在此信号之后按已触发数插入
+KEY_PIVOT_LABEL = "🔥 关键转折点"
+
+# 紧凑编码：每根K线的異動標記存为一个 int64 位掩码（信号表第 i 个信号为第 i 位，关键转折点为最后一位），
+# 成员判断为按位与；可读字符串只在显示/推送/导出时由 signal_text 生成
+SIGNAL_MASK_COLUMN = "信號位元"
+MASK_LABELS = SIGNAL_LABELS + [KEY_PIVOT_LABEL]  # 位 -> 信号名
+SIGNAL_BITS = {label: 1 << i for i, label in enumerate(MASK_LABELS)}
+_PIVOT_COUNT_BITS = (1 << (SIGNAL_LABELS.index(KEY_PIVOT_AFTER) + 1)) - 1  # 关键转折点之前（含）的信号
+
+
+def signal_bits(labels):
+    """信号名列表的位掩码（关键转折点可带或不带“(信号数: N)”后缀），未知信号名抛出 KeyError"""
+    bits = 0
+    for label in labels:
+        bits |= SIGNAL_BITS[KEY_PIVOT_LABEL if label.startswith(KEY_PIVOT_LABEL) else label]
+    return bits
+
+
+def prefix_bits(prefix):
+    """名称以 prefix 开头的全部信号的位掩码（如 "📈" 为全部买入类信号）"""
+    return signal_bits(label for label in MASK_LABELS if label.startswith(prefix))
+
+
+def encode_signal_masks(masks, n):
+    """把按信号表顺序的布尔数组编码为 int64 位掩码数组"""
+    codes = np.zeros(n, dtype=np.int64)
+    count = np.zeros(n, dtype=int)
+    for label, mask in masks:
+        codes |= mask.astype(np.int64) << SIGNAL_LABELS.index(label)
+        count += mask
+        if label == KEY_PIVOT_AFTER:
+            codes |= (count > 8).astype(np.int64) * SIGNAL_BITS[KEY_PIVOT_LABEL]
+    return codes
+
+
+def signal_text(codes):
+    """位掩码 -> 逗号分隔的異動標記字符串列表（与原字符串编码一致），相同掩码只解码一次"""
+    rows, uniques = pd.factorize(pd.Series(codes, dtype=np.int64), sort=False)
+    texts = []
+    for code in (int(c) for c in uniques):
+        parts = []
+        for label in SIGNAL_LABELS:
+            if code & SIGNAL_BITS[label]:
+                parts.append(label)
+            if label == KEY_PIVOT_AFTER and code & SIGNAL_BITS[KEY_PIVOT_LABEL]:
+                parts.append(f"{KEY_PIVOT_LABEL} (信号数: {(code & _PIVOT_COUNT_BITS).bit_count()})")
+        texts.append(", ".join(parts))
+    return [texts[i] for i in rows]
+
+
+def mark_signals(data, **params):
+    """向量化计算整段数据的異動標記位掩码（int64 Series）"""
+    if data.empty:
+        return pd.Series([], index=data.index, dtype=np.int64)
+    masks = compute_signal_masks(data, **params)
+    return pd.Series(encode_signal_masks(masks, len(data)), index=data.index)
+
+
+def signal_matrix(codes):
+    """把位掩码展开成布尔指标矩阵，返回 (matrix[行数, 信号数], 信号名列表)；只含出现过的信号，按信号表顺序"""
+    codes = np.asarray(codes, dtype=np.int64)
+    present = np.bitwise_or.reduce(codes) if len(codes) else 0
+    columns = [i for i in range(len(MASK_LABELS)) if present >> i & 1]
+    matrix = (codes[:, None] >> np.array(columns, dtype=np.int64)) & 1 if columns else np.zeros((len(codes), 0))
+    return matrix.astype(bool), [MASK_LABELS[i] for i in columns]
+
+
+def classify_kline_patterns(data, body_ratio_threshold=0.6, shadow_ratio_threshold=2.0, doji_body_threshold=0.1):
+    """向量化K线形态分类，按原 if/elif 优先级以 np.select 输出 (K線形態, 單根解讀, 成交量標記)"""
+    n = len(data)
+    idx = np.arange(n)
+    has_prev = idx > 0
+    o, h, l, c, v = (_col(data, k) for k in ("Open", "High", "Low", "Close", "Volume"))
+    po, pc = _shift(o), _shift(c)
+    o2, c2 = _shift(o, 2), _shift(c, 2)
+
+    high_volume = v > _col(data, "前5均量")
+    volume_mark = np.where(high_volume, "放量", "縮量").astype(object)
+
+    body = np.abs(c - o)
+    candle_range = h - l
+    lower_shadow = np.minimum(o, c) - l
+    upper_shadow = h - np.maximum(o, c)
+    prev_mean5 = _shift(_window_mean(c, 5))
+    uptrend = (idx >= 5) & (prev_mean5 < c)
+    downtrend = (idx >= 5) & (prev_mean5 > c)
+    small_middle = has_prev & (idx > 1) & (np.abs(pc - po) < 0.3 * np.abs(c2 - o2))
+    prev_mid = (po + pc) / 2
+
+    def with_volume(base, suffix):
+        return np.where(high_volume, base + suffix, base)
+
+    rules = [
+        (has_prev & (body < candle_range * 0.3) & (lower_shadow >= shadow_ratio_threshold * body) &
+         (upper_shadow < lower_shadow) & downtrend,
+         "錘子線", with_volume("下方出現支撐，空方雖打壓但多方承接", "，放量增強買入信號")),
+        (has_prev & (body < candle_range * 0.3) & (upper_shadow >= shadow_ratio_threshold * body) &
+         (lower_shadow < upper_shadow) & uptrend,
+         "射擊之星", with_volume("高位拋壓沉重，短期見頂風險", "，放量增強賣出信號")),
+        (has_prev & (body < doji_body_threshold * candle_range),
+         "十字星", "市場猶豫，方向未明確"),
+        (has_prev & (c > o) & (body > body_ratio_threshold * candle_range),
+         "大陽線", with_volume("多方強勢推升", "，放量更有力")),
+        (has_prev & (c < o) & (body > body_ratio_threshold * candle_range),
+         "大陰線", with_volume("空方強勢壓制", "，放量更偏空")),
+        (has_prev & (c > o) & (pc < po) & (o < pc) & (c > po) & high_volume,
+         "看漲吞噬", "當前陽線完全包覆前日陰線，買方強勢反攻，預示反轉"),
+        (has_prev & (c < o) & (pc > po) & (o > pc) & (c < po) & high_volume,
+         "看跌吞噬", "當前陰線完全包覆前日陽線，賣方強勢壓制，預示反轉"),
+        (has_prev & uptrend & (c < o) & (pc > po) & (o > pc) & (c < prev_mid),
+         "烏雲蓋頂", "上升趨勢中陰線壓制，賣壓加重，短期可能下跌"),
+        (has_prev & downtrend & (c > o) & (pc < po) & (o < pc) & (c > prev_mid),
+         "刺透形態", "下跌趨勢中陽線反攻，買方介入，短期可能上漲"),
+        (small_middle & (c2 < o2) & (c > o) & (c > prev_mid) & high_volume,
+         "早晨之星", "下跌後小實體K線後強陽線，預示反轉，多方力量增強"),
+        (small_middle & (c2 > o2) & (c < o) & (c < prev_mid) & high_volume,
+         "黃昏之星", "上漲後小實體K線後強陰線，預示反轉，空方力量增強"),
+    ]
+    conditions = [cond for cond, _, _ in rules]
+    pattern = np.select(conditions, [np.full(n, name, dtype=object) for _, name, _ in rules],
+                        default="普通K線")
+    interpretation = np.select(conditions, [np.broadcast_to(np.asarray(text, dtype=object), (n,)) for _, _, text in rules],
+                               default="波動有限，方向不明顯")
+    return pattern, interpretation, volume_mark
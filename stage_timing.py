@@ -0,0 +1,194 @@
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+
+# 分阶段计时：每个周期按 (股票, 阶段) 记录耗时与行数（抓取、VIX、前收盘价、指标、異動標記、K线形态、
+# 图表、SMTP ...），保留最近 STAGE_WINDOW 个周期供页面侧栏汇总，并以 Prometheus 文本格式从本地端口输出
+#
+#   METRICS_PORT=9108 streamlit run buy.v1.py      或      python daemon.py --metrics-port 9108
+#   curl http://127.0.0.1:9108/metrics
+
+STAGE_WINDOW = 50  # 保留的周期数
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # 0 表示不启动 HTTP 端口
+METRIC_PREFIX = "stock_monitor"
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+class StageTimer:
+    """进程内的阶段耗时记录；record 可在抓取/发送线程中并发调用"""
+
+    def __init__(self, window=STAGE_WINDOW):
+        self.cycles = 0
+        self.overruns = 0
+        self.last_cycle = None
+        self.budget = None
+        self._history = deque(maxlen=window)  # [(周期耗时, {(股票, 阶段): [秒, 行数]})]
+        self._current = {}
+        self._histograms = {}  # 阶段 -> [各桶计数, 总秒数, 次数]；"cycle" 为整个周期
+        self._lock = threading.Lock()
+
+    def record(self, ticker, stage, seconds, rows=None):
+        with self._lock:
+            entry = self._current.setdefault((ticker, stage), [0.0, None])
+            entry[0] += seconds
+            if rows is not None:
+                entry[1] = rows
+            self._observe(stage, seconds)
+
+    def record_many(self, ticker, timings):
+        """子进程传回的 [(阶段, 秒, 行数)]"""
+        for stage, seconds, rows in timings or ():
+            self.record(ticker, stage, seconds, rows)
+
+    def _observe(self, stage, seconds):
+        histogram = self._histograms.setdefault(stage, [[0] * len(BUCKETS), 0.0, 0])
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                histogram[0][i] += 1
+        histogram[1] += seconds
+        histogram[2] += 1
+
+    def end_cycle(self, seconds, budget=None):
+        """周期结束：本周期的记录移入历史；budget 为刷新间隔（秒），超出时计为一次超时"""
+        with self._lock:
+            self._history.append((seconds, self._current))
+            self._current = {}
+            self._observe("cycle", seconds)
+            self.cycles += 1
+            self.last_cycle = seconds
+            self.budget = budget
+            if budget is not None and seconds > budget:
+                self.overruns += 1
+
+    def summary(self):
+        """最近各周期按阶段汇总（全部股票相加），返回 DataFrame；最慢股票取最近一个周期"""
+        with self._lock:
+            history = list(self._history)
+        if not history:
+            return pd.DataFrame()
+        per_cycle = {}
+        for _, entries in history:
+            totals = {}
+            for (_, stage), (seconds, _) in entries.items():
+                totals[stage] = totals.get(stage, 0.0) + seconds
+            for stage, seconds in totals.items():
+                per_cycle.setdefault(stage, []).append(seconds)
+        per_cycle["cycle"] = [seconds for seconds, _ in history]
+        last = history[-1][1]
+        rows = []
+        for stage, values in per_cycle.items():
+            values = pd.Series(values)
+            entries = {t: v for (t, s), v in last.items() if s == stage}
+            slowest = max(entries, key=lambda t: entries[t][0]) if entries else None
+            counts = [v[1] for v in entries.values() if v[1] is not None]
+            rows.append({
+                "階段": stage,
+                "最近(秒)": values.iloc[-1],
+                "平均(秒)": values.mean(),
+                "P95(秒)": values.quantile(0.95),
+                "最大(秒)": values.max(),
+                "行數": sum(counts) if counts else None,
+                "最慢股票": slowest or None,
+            })
+        return pd.DataFrame(rows).sort_values("平均(秒)", ascending=False, ignore_index=True)
+
+    def prometheus_text(self):
+        """Prometheus 文本格式（0.0.4）"""
+        with self._lock:
+            last = self._history[-1][1] if self._history else {}
+            histograms = {stage: (list(h[0]), h[1], h[2]) for stage, h in self._histograms.items()}
+            cycles, overruns, last_cycle, budget = self.cycles, self.overruns, self.last_cycle, self.budget
+        p = METRIC_PREFIX
+        lines = [f"# HELP {p}_stage_seconds Wall time of each stage per ticker in the last completed cycle.",
+                 f"# TYPE {p}_stage_seconds gauge"]
+        for (ticker, stage), (seconds, _) in sorted(last.items()):
+            lines.append(f'{p}_stage_seconds{{stage="{_escape(stage)}",ticker="{_escape(ticker)}"}} {seconds:.6f}')
+        lines += [f"# HELP {p}_stage_rows Rows processed by each stage per ticker in the last completed cycle.",
+                  f"# TYPE {p}_stage_rows gauge"]
+        for (ticker, stage), (_, rows) in sorted(last.items()):
+            if rows is not None:
+                lines.append(f'{p}_stage_rows{{stage="{_escape(stage)}",ticker="{_escape(ticker)}"}} {rows}')
+        lines += [f"# HELP {p}_stage_duration_seconds Distribution of stage wall time (cycle = whole refresh cycle).",
+                  f"# TYPE {p}_stage_duration_seconds histogram"]
+        for stage, (counts, total, count) in sorted(histograms.items()):
+            label = f'stage="{_escape(stage)}"'
+            for bound, n in zip(BUCKETS, counts):
+                lines.append(f'{p}_stage_duration_seconds_bucket{{{label},le="{bound}"}} {n}')
+            lines.append(f'{p}_stage_duration_seconds_bucket{{{label},le="+Inf"}} {count}')
+            lines.append(f"{p}_stage_duration_seconds_sum{{{label}}} {total:.6f}")
+            lines.append(f"{p}_stage_duration_seconds_count{{{label}}} {count}")
+        lines += [f"# HELP {p}_cycles_total Completed refresh cycles.", f"# TYPE {p}_cycles_total counter",
+                  f"{p}_cycles_total {cycles}",
+                  f"# HELP {p}_cycle_overruns_total Cycles that took longer than the refresh interval.",
+                  f"# TYPE {p}_cycle_overruns_total counter", f"{p}_cycle_overruns_total {overruns}"]
+        if last_cycle is not None:
+            lines += [f"# HELP {p}_cycle_seconds Wall time of the last completed cycle.",
+                      f"# TYPE {p}_cycle_seconds gauge", f"{p}_cycle_seconds {last_cycle:.6f}"]
+        if budget is not None:
+            lines += [f"# HELP {p}_refresh_interval_seconds Configured refresh interval.",
+                      f"# TYPE {p}_refresh_interval_seconds gauge", f"{p}_refresh_interval_seconds {budget}"]
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+timer = StageTimer()
+
+
+@contextmanager
+def timed(stage, ticker="", sink=timer):
+    """计时代码块：with timed("history", ticker) as rec: ... rec["rows"] = len(data)
+
+    默认记入 timer；sink 为列表时记为 (阶段, 秒, 行数) 追加其中（子进程内使用，随结果传回主进程），
+    为 None 时不记录（如优化器、基准测试直接调用流水线）。
+    """
+    record = {"rows": None}
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        seconds = time.perf_counter() - start
+        if isinstance(sink, list):
+            sink.append((stage, seconds, record["rows"]))
+        elif sink is not None:
+            sink.record(ticker, stage, seconds, record["rows"])
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = timer.prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # 不在控制台输出每次抓取
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port=METRICS_PORT, host="127.0.0.1"):
+    """在后台线程启动 /metrics 端口（进程内只启动一次）；port 为 0 或端口已被占用时返回 None"""
+    global _server
+    with _server_lock:
+        if _server is None and port:
+            try:
+                _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            except OSError:
+                return None
+            threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+        return _server
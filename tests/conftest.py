@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 模块平铺在仓库根目录（与 buy.v1.py 同级），测试直接导入
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+
+# 测试用合成K线：随机游走 + 跳空，可选价格取整（制造相等比较的边界）与 VIX 缺口
+
+
+def synthetic_bars(n, seed=0, flat=False, vix="full", freq="5min", start="2024-01-02 09:30"):
+    """返回 (K线, VIX)；vix 为 "full"、"gaps"（每 3 根缺 2 根）或 "none"（VIX 为 None）"""
+    rng = np.random.default_rng(seed)
+    returns = rng.normal(0, 0.01, n)
+    jumps = rng.random(n) < 0.05
+    returns[jumps] += rng.normal(0, 0.03, jumps.sum())
+    close = 100 * np.exp(np.cumsum(returns))
+    if flat:
+        close = np.round(close, 0)
+    open_ = close * (1 + rng.normal(0, 0.015, n))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.005, n)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.005, n)))
+    volume = rng.integers(1000, 100000, n).astype(float)
+    times = pd.date_range(start, periods=n, freq=freq, tz="America/New_York")
+    data = pd.DataFrame({"Datetime": times, "Open": open_, "High": high, "Low": low, "Close": close,
+                         "Volume": volume})
+    if vix == "none":
+        return data, None
+    vix_data = pd.DataFrame({"Datetime": times, "Close": 20 + 8 * np.sin(np.arange(n) / 15) + rng.normal(0, 1, n)})
+    vix_data["VIX Change %"] = vix_data["Close"].pct_change().round(4) * 100
+    if vix == "gaps":
+        vix_data = vix_data.iloc[::3].reset_index(drop=True)
+    return data, vix_data
@@ -0,0 +1,45 @@
+import json
+
+from alert_state import AlertStateStore
+
+ALERT = ("email", "TSLA", "5m", "2024-01-02 09:35:00-05:00", {"volume": True, "macd_cross": True})
+
+
+def test_cooldown_starts_only_after_successful_send(tmp_path):
+    store = AlertStateStore(path=str(tmp_path / "state.json"), cooldowns={"email": 600})
+    assert store.should_send(*ALERT, now=0)
+    assert not store.should_send(*ALERT, now=1)  # 发送中，不重复排队
+    assert not (tmp_path / "state.json").exists()  # 尚未发送，不写盘
+
+    store.release(*ALERT)  # 发送失败
+    assert store.should_send(*ALERT, now=2)
+    store.mark_sent(*ALERT, now=3)
+    assert not store.should_send(*ALERT, now=4)
+    later = (*ALERT[:3], "2024-01-02 09:40:00-05:00", ALERT[4])
+    assert not store.should_send(*later, now=500)  # 冷却期内
+    assert store.should_send(*later, now=700)
+    assert store.suppressed == 3
+
+
+def test_on_result_callback():
+    store = AlertStateStore(path=None)
+    assert store.should_send(*ALERT)
+    store.on_result(*ALERT)(False)
+    assert store.should_send(*ALERT)
+    store.on_result(*ALERT)(True)
+    assert not store.should_send(*ALERT)
+
+
+def test_processes_merge_instead_of_overwriting(tmp_path):
+    path = str(tmp_path / "state.json")
+    page, daemon = AlertStateStore(path=path), AlertStateStore(path=path)
+    other = ("telegram", "NIO", "5m", "2024-01-02 09:35:00-05:00", ["📈 MACD買入"])
+    assert page.should_send(*ALERT) and daemon.should_send(*other)
+    page.mark_sent(*ALERT)
+    daemon.mark_sent(*other)  # 保存前重新读取，不覆盖页面的记录
+
+    with open(path, encoding="utf-8") as f:
+        state = json.load(f)
+    assert len(state["sent"]) == 2 and len(state["last"]) == 2
+    assert not page.should_send(*other)  # 页面看到 daemon 已发送
+    assert not AlertStateStore(path=path).should_send(*ALERT)
@@ -0,0 +1,257 @@
+import json
+import socketserver
+import threading
+from email import message_from_string
+from email.header import decode_header, make_header
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+import alerts
+from alerts import AlertDispatcher, TELEGRAM_MAX_LEN
+
+
+# 本地替身：Telegram Bot API（HTML 模式下遇到未转义的 < 即返回 400）与最小 SMTP 服务器
+
+class TelegramStub(ThreadingHTTPServer):
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), TelegramHandler)
+        self.texts = []  # 接受的消息
+        self.rejected = 0
+        self.fail_next = 0  # 接下来几次请求返回 500
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class TelegramHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        text = query["text"][0]
+        server = self.server
+        if server.fail_next:
+            server.fail_next -= 1
+            self._reply(500, {"ok": False, "description": "Internal Server Error"})
+        elif query.get("parse_mode") == ["HTML"] and "<" in text:
+            server.rejected += 1
+            self._reply(400, {"ok": False, "description": "Bad Request: can't parse entities"})
+        elif len(text) > TELEGRAM_MAX_LEN:
+            server.rejected += 1
+            self._reply(400, {"ok": False, "description": "Bad Request: message is too long"})
+        else:
+            server.texts.append(text)
+            self._reply(200, {"ok": True, "result": {}})
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class SMTPStub(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), SMTPHandler)
+        self.messages = []
+        self.connections = 0
+        self.fail_data = 0  # 接下来几次 DATA 返回 451
+        self.drop = threading.Event()  # 置位后服务器断开当前连接（模拟空闲超时）
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        server = self.server
+        server.connections += 1
+        self.wfile.write(b"220 stub ESMTP\r\n")
+        while True:
+            line = self.rfile.readline()
+            if not line or server.drop.is_set():
+                server.drop.clear()
+                return
+            command = line.decode().strip().upper()
+            if command.startswith(("EHLO", "HELO")):
+                self.wfile.write(b"250 stub\r\n")
+            elif command.startswith(("MAIL", "RCPT", "RSET", "NOOP")):
+                self.wfile.write(b"250 OK\r\n")
+            elif command == "DATA":
+                self.wfile.write(b"354 End data with <CR><LF>.<CR><LF>\r\n")
+                lines = []
+                while (line := self.rfile.readline()) not in (b".\r\n", b""):
+                    lines.append(line.decode())
+                if server.fail_data:
+                    server.fail_data -= 1
+                    self.wfile.write(b"451 Try again later\r\n")
+                else:
+                    server.messages.append(message_from_string("".join(lines)))
+                    self.wfile.write(b"250 Queued\r\n")
+            elif command == "QUIT":
+                self.wfile.write(b"221 Bye\r\n")
+                return
+            else:
+                self.wfile.write(b"502 Not implemented\r\n")
+
+
+@pytest.fixture
+def telegram(monkeypatch):
+    server = TelegramStub()
+    monkeypatch.setattr(alerts, "BOT_TOKEN", "123:abc")
+    monkeypatch.setattr(alerts, "CHAT_ID", "42")
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def smtp(monkeypatch):
+    server = SMTPStub()
+    monkeypatch.setattr(alerts, "SENDER_EMAIL", "monitor@example.com")
+    monkeypatch.setattr(alerts, "RECIPIENT_EMAIL", "me@example.com")
+    monkeypatch.setattr(alerts, "SENDER_PASSWORD", None)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def dispatcher(telegram=None, smtp=None):
+    return AlertDispatcher(smtp_host="127.0.0.1", smtp_port=smtp.port if smtp else 1, smtp_ssl=False,
+                           telegram_api=telegram.url if telegram else "http://127.0.0.1:1", backoff=0)
+
+
+def run(d, emails=(), messages=()):
+    for email in emails:
+        d.add_email(*email)
+    for msg in messages:
+        d.add_telegram(msg)
+    d.flush()
+    d.join()
+
+
+def body(message):
+    payload = message.get_payload()[0]
+    return payload.get_payload(decode=True).decode(payload.get_content_charset()).replace("\r\n", "\n")
+
+
+def test_telegram_batches_cycle_into_one_message(telegram):
+    d = dispatcher(telegram=telegram)
+    run(d, messages=[f"TSLA 訊號 {i}" for i in range(5)])
+    d.stop()
+    assert telegram.texts == ["\n\n".join(f"TSLA 訊號 {i}" for i in range(5))]
+    assert d.stats["telegram_sent"] == 1 and d.stats["failed"] == 0
+
+
+def test_telegram_escapes_html(telegram):
+    d = dispatcher(telegram=telegram)
+    run(d, messages=["NIO *📉 High<Low* & 放量", "META *📈 ok*"])
+    d.stop()
+    assert telegram.rejected == 0
+    assert telegram.texts == ["NIO *📉 High&lt;Low* &amp; 放量\n\nMETA *📈 ok*"]
+    assert d.stats == dict(d.stats, telegram_sent=1, retries=0, failed=0)
+
+
+def test_rejected_chunk_falls_back_to_single_messages(telegram, monkeypatch):
+    # 转义失效时（例如 Telegram 拒绝其他内容），同批其他股票的提醒仍然送达
+    monkeypatch.setattr(alerts, "_telegram_text", lambda msg: msg)
+    d = dispatcher(telegram=telegram)
+    run(d, messages=["TSLA ok", "NIO *📉 High<Low*", "META ok"])
+    d.stop()
+    assert telegram.texts == ["TSLA ok", "META ok"]
+    assert telegram.rejected == 2  # 合并消息 1 次 + 坏消息本身 1 次，4xx 不重试
+    assert d.stats["retries"] == 0 and d.stats["failed"] == 1 and d.stats["telegram_sent"] == 2
+
+
+def test_telegram_splits_at_length_limit(telegram):
+    long_msg = "&" * 1000 + "x" * (TELEGRAM_MAX_LEN * 2)  # 转义后 &amp; 会跨过切分点
+    d = dispatcher(telegram=telegram)
+    run(d, messages=["short", long_msg, "tail"])
+    d.stop()
+    assert telegram.rejected == 0
+    assert all(len(text) <= TELEGRAM_MAX_LEN for text in telegram.texts)
+    assert telegram.texts[0] == "short"  # 加上长消息的第一段会超长，单独发送
+    assert "".join(telegram.texts[1:]) == long_msg.replace("&", "&amp;") + "\n\ntail"
+    assert len(telegram.texts) == 5
+
+
+def test_telegram_retries_server_errors(telegram):
+    telegram.fail_next = 2
+    d = dispatcher(telegram=telegram)
+    run(d, messages=["TSLA"])
+    assert telegram.texts == ["TSLA"]
+    assert d.stats["retries"] == 2 and d.stats["failed"] == 0
+
+    telegram.fail_next = d.max_retries + 1
+    run(d, messages=["NIO"])
+    d.stop()
+    assert telegram.texts == ["TSLA"]
+    assert d.stats["retries"] == 2 + d.max_retries and d.stats["failed"] == 1
+
+
+def test_emails_merge_into_one_message(smtp):
+    d = dispatcher(smtp=smtp)
+    run(d, emails=[("TSLA", "📣 股票異動通知：TSLA", "TSLA body"), ("NIO", "📣 股票異動通知：NIO", "NIO body"),
+                   ("TSLA", "📣 股票異動通知：TSLA", "TSLA again")])
+    d.stop()
+    assert len(smtp.messages) == 1
+    message = smtp.messages[0]
+    assert str(make_header(decode_header(message["Subject"]))) == "📣 股票異動通知：TSLA, NIO"
+    assert body(message).split("\n" + "-" * 30 + "\n") == ["TSLA body", "NIO body", "TSLA again"]
+    assert d.stats["emails_sent"] == 1
+
+
+def test_smtp_session_reused_and_reconnected(smtp):
+    d = dispatcher(smtp=smtp)
+    run(d, emails=[("TSLA", "s1", "b1")])
+    run(d, emails=[("NIO", "s2", "b2")])
+    assert smtp.connections == 1  # 同一 SMTP 会话
+
+    smtp.drop.set()  # 服务器关闭空闲连接，下次 NOOP 失败后重新连接
+    run(d, emails=[("META", "s3", "b3")])
+    assert smtp.connections == 2
+
+    smtp.fail_data = 1  # DATA 临时失败：关闭会话，重试时重新连接
+    run(d, emails=[("XPEV", "s4", "b4")])
+    d.stop()
+    assert smtp.connections == 3
+    assert [m["Subject"] for m in smtp.messages] == ["s1", "s2", "s3", "s4"]
+    assert d.stats["emails_sent"] == 4 and d.stats["retries"] == 1 and d.stats["failed"] == 0
+
+
+def test_unconfigured_channels_are_skipped(monkeypatch):
+    for name in ("SENDER_EMAIL", "RECIPIENT_EMAIL", "BOT_TOKEN", "CHAT_ID"):
+        monkeypatch.setattr(alerts, name, None)
+    d = dispatcher()
+    run(d, emails=[("TSLA", "s", "b")], messages=["TSLA"])
+    d.stop()
+    assert d.stats["skipped"] == 2 and d.stats["failed"] == 0
+
+
+def test_on_result_reports_per_alert_outcome(telegram, smtp, monkeypatch):
+    monkeypatch.setattr(alerts, "_telegram_text", lambda msg: msg)  # 让坏消息真正被拒绝
+    results = []
+    d = dispatcher(telegram=telegram, smtp=smtp)
+    d.add_email("TSLA", "s", "b", on_result=lambda sent: results.append(("email", sent)))
+    d.add_telegram("TSLA ok", on_result=lambda sent: results.append(("TSLA", sent)))
+    d.add_telegram("NIO High<Low", on_result=lambda sent: results.append(("NIO", sent)))
+    d.flush()
+    d.join()
+
+    smtp.fail_data = d.max_retries + 1
+    d.add_email("META", "s", "b", on_result=lambda sent: results.append(("email", sent)))
+    d.flush()
+    d.join()
+    d.stop()
+    assert results == [("email", True), ("TSLA", True), ("NIO", False), ("email", False)]
@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest import backtest_signals
+from signal_engine import SIGNAL_MASK_COLUMN, signal_bits
+
+BUY, SELL = "📈 MACD買入", "📉 MACD賣出"
+
+
+def frame(bars, marks):
+    """bars 为 (High, Low, Close) 列表，marks 为 {行号: 信号}"""
+    data = pd.DataFrame(bars, columns=["High", "Low", "Close"])
+    data[SIGNAL_MASK_COLUMN] = [signal_bits([marks[i]]) if i in marks else 0 for i in range(len(data))]
+    return data
+
+
+# 6 根K线：买入信号在 t0/t2/t3，卖出信号在 t1/t4（t4 只有 1 根前瞻K线）
+SIX_BARS = frame([(101, 99, 100), (112, 104, 110), (111, 95, 99), (109, 97, 108), (107, 88, 90), (96, 89, 95)],
+                 {0: BUY, 1: SELL, 2: BUY, 3: BUY, 4: SELL})
+
+
+def stats(returns, mfe, mae):
+    """按定义逐笔手算：命中率、平均收益、平均盈利、平均亏损、平均MFE/MAE 与期望值（%）"""
+    wins = [r for r in returns if r > 0]
+    losses = [r for r in returns if r <= 0]
+    hit = len(wins) / len(returns)
+    avg_win = sum(wins) / len(wins) if wins else np.nan
+    avg_loss = sum(losses) / len(losses) if losses else np.nan
+    return {"次数": len(returns), "命中率 (%)": hit * 100, "平均收益 (%)": sum(returns) / len(returns) * 100,
+            "平均盈利 (%)": avg_win * 100, "平均亏损 (%)": avg_loss * 100,
+            "平均MFE (%)": sum(mfe) / len(mfe) * 100, "平均MAE (%)": sum(mae) / len(mae) * 100,
+            "期望值 (%)": (hit * np.nan_to_num(avg_win) + (1 - hit) * np.nan_to_num(avg_loss)) * 100}
+
+
+# 逐笔前瞻结果（收益, MFE, MAE）：做多为 close[t+h]/close[t]-1 及区间最高/最低价；
+# 做空收益取负，MFE 为 -(区间最低价涨跌幅)、MAE 为 -(区间最高价涨跌幅)
+EXPECTED = {
+    (BUY, 1): stats([110 / 100 - 1, 108 / 99 - 1, 90 / 108 - 1],
+                    [112 / 100 - 1, 109 / 99 - 1, 107 / 108 - 1],
+                    [104 / 100 - 1, 97 / 99 - 1, 88 / 108 - 1]),
+    (BUY, 2): stats([99 / 100 - 1, 90 / 99 - 1, 95 / 108 - 1],
+                    [112 / 100 - 1, 109 / 99 - 1, 107 / 108 - 1],
+                    [95 / 100 - 1, 88 / 99 - 1, 88 / 108 - 1]),
+    (SELL, 1): stats([1 - 99 / 110, 1 - 95 / 90], [1 - 95 / 110, 1 - 89 / 90], [1 - 111 / 110, 1 - 96 / 90]),
+    (SELL, 2): stats([1 - 108 / 110], [1 - 95 / 110], [1 - 111 / 110]),
+}
+
+
+def rows(result):
+    return result.set_index(["信号", "周期"])
+
+
+def test_six_bars_match_hand_computed_stats():
+    result = rows(backtest_signals(SIX_BARS, horizons=2))
+    assert sorted(result.index) == sorted(EXPECTED)
+    for key, expected in EXPECTED.items():
+        row = result.loc[key]
+        assert row["方向"] == ("空" if key[0] == SELL else "多")
+        for column, value in expected.items():
+            assert row[column] == pytest.approx(value, nan_ok=True), (key, column)
+
+    # 平均亏损 = (总收益 - 盈利部分) / (次数 - 盈利次数)；全部盈利时为 NaN，全部亏损时等于平均收益
+    assert np.isnan(result.loc[(SELL, 2), "平均亏损 (%)"])
+    assert result.loc[(BUY, 2), "平均亏损 (%)"] == pytest.approx(result.loc[(BUY, 2), "平均收益 (%)"])
+    assert result.loc[(BUY, 1), "命中率 (%)"] == pytest.approx(200 / 3)
+
+
+def test_horizon_list_selects_columns():
+    result = rows(backtest_signals(SIX_BARS, horizons=[2]))
+    assert sorted(result.index) == [(BUY, 2), (SELL, 2)]
+    assert result.loc[(BUY, 2), "期望值 (%)"] == pytest.approx(EXPECTED[(BUY, 2)]["期望值 (%)"])
+
+
+def test_forward_paths_stop_at_ticker_boundary():
+    # 第二只股票价格高一个数量级：若前瞻路径跨股票，t4 的卖出信号会得到 2 根K线的结果、收益大幅失真
+    other = frame([(1001, 999, 1000), (1012, 1004, 1010), (1011, 995, 999)], {0: BUY})
+    result = rows(backtest_signals({"TSLA": SIX_BARS, "NIO": other}, horizons=2))
+    assert result.loc[(SELL, 2), "次数"] == 1
+    assert result.loc[(SELL, 1), "平均收益 (%)"] == pytest.approx(EXPECTED[(SELL, 1)]["平均收益 (%)"])
+
+    # 多只股票的样本合并统计
+    pooled = stats([110 / 100 - 1, 108 / 99 - 1, 90 / 108 - 1, 1010 / 1000 - 1],
+                   [112 / 100 - 1, 109 / 99 - 1, 107 / 108 - 1, 1012 / 1000 - 1],
+                   [104 / 100 - 1, 97 / 99 - 1, 88 / 108 - 1, 1004 / 1000 - 1])
+    for column, value in pooled.items():
+        assert result.loc[(BUY, 1), column] == pytest.approx(value), column
+
+    crossed = rows(backtest_signals(pd.concat([SIX_BARS, other], ignore_index=True), horizons=2))
+    assert crossed.loc[(SELL, 2), "次数"] == 2  # 对照：直接拼接会跨越边界
+
+
+def test_empty_inputs():
+    assert backtest_signals({"TSLA": SIX_BARS.iloc[:0], "NIO": None}).empty
@@ -0,0 +1,30 @@
+import pandas as pd
+
+from data_provider import MARKET_TZ, ReplayProvider
+
+COLUMNS = {"Open": 1.0, "High": 1.0, "Low": 1.0, "Close": 1.0, "Volume": 100}
+
+
+def test_naive_daily_bars_stay_on_their_date(tmp_path):
+    path = tmp_path / "TSLA_1d.csv"
+    pd.DataFrame({"Date": ["2024-01-02", "2024-01-03", "2024-01-04"], **COLUMNS}).to_csv(path, index=False)
+    provider = ReplayProvider.from_path(str(path))
+    times = provider.frames["TSLA"]["Datetime"]
+    assert list(times.dt.strftime("%Y-%m-%d %H:%M")) == ["2024-01-02 00:00", "2024-01-03 00:00", "2024-01-04 00:00"]
+    assert str(times.dt.tz) == MARKET_TZ
+
+
+def test_offsets_are_converted_across_dst(tmp_path):
+    path = tmp_path / "TSLA_5m.csv"
+    times = ["2024-03-08 15:55:00-05:00", "2024-03-11 09:30:00-04:00", "2024-03-11 13:35:00+00:00"]
+    pd.DataFrame({"Datetime": times, **COLUMNS}).to_csv(path, index=False)
+    frame = ReplayProvider.from_path(str(path)).frames["TSLA"]
+    assert list(frame["Datetime"].dt.strftime("%m-%d %H:%M")) == ["03-08 15:55", "03-11 09:30", "03-11 09:35"]
+
+
+def test_naive_and_aware_datetime_columns():
+    naive = pd.DataFrame({"Datetime": pd.to_datetime(["2024-01-02 09:30", "2024-01-02 09:35"]), **COLUMNS})
+    aware = naive.assign(Datetime=naive["Datetime"].dt.tz_localize("UTC") + pd.Timedelta(hours=5))
+    provider = ReplayProvider({"A": naive, "B": aware})
+    for ticker in ("A", "B"):
+        assert provider.frames[ticker]["Datetime"].iloc[0] == pd.Timestamp("2024-01-02 09:30", tz=MARKET_TZ)
@@ -0,0 +1,115 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+import history_archive
+from pipeline import DEFAULT_PARAMS, prepare_data
+from signal_engine import MASK_LABELS, SIGNAL_MASK_COLUMN, signal_text
+from synthetic import synthetic_bars
+
+
+@pytest.fixture
+def archive(tmp_path, monkeypatch):
+    monkeypatch.setattr(history_archive, "ARCHIVE_DIR", str(tmp_path))
+    monkeypatch.setattr(history_archive, "_last_archived", {})
+    return tmp_path
+
+
+@pytest.fixture(scope="module")
+def marked():
+    data, vix = synthetic_bars(400, seed=2, freq="1h", start="2024-01-29 09:30")
+    data = prepare_data(data, vix, dict(DEFAULT_PARAMS, price_change_threshold=0.5, gap_threshold=0.5))
+    assert data[SIGNAL_MASK_COLUMN].ne(0).sum() > 50
+    return data[["Datetime", "Open", "High", "Low", "Close", "Volume", SIGNAL_MASK_COLUMN]]
+
+
+def partition(archive):
+    return sorted((archive / "TSLA" / "1h").glob("*.parquet"))
+
+
+def test_partitions_record_the_label_table(archive, marked):
+    history_archive.append_history("TSLA", "1h", marked)
+    for path in partition(archive):
+        assert json.loads(pq.read_schema(path).metadata[history_archive.LABELS_KEY]) == MASK_LABELS
+    loaded = history_archive.load_history("TSLA", "1h", columns=[SIGNAL_MASK_COLUMN])
+    assert loaded[SIGNAL_MASK_COLUMN].tolist() == marked[SIGNAL_MASK_COLUMN].tolist()
+
+
+def test_masks_are_remapped_by_label(archive, marked):
+    # 模拟信号表改动后的旧分区：位序倒置，并含一个已删除的信号
+    old_labels = ["已刪除的信號"] + MASK_LABELS[::-1]
+    codes = marked[SIGNAL_MASK_COLUMN].to_numpy()
+    old = np.zeros_like(codes) | 1  # 已删除的信号在每根K线上都出现
+    for i, label in enumerate(old_labels[1:], start=1):
+        old |= ((codes >> MASK_LABELS.index(label)) & 1) << i
+    table = pa.Table.from_pandas(marked.assign(**{SIGNAL_MASK_COLUMN: old}), preserve_index=False)
+    table = table.replace_schema_metadata({**table.schema.metadata,
+                                           history_archive.LABELS_KEY: json.dumps(old_labels).encode()})
+    directory = archive / "TSLA" / "1h"
+    directory.mkdir(parents=True)
+    pq.write_table(table, directory / "2024-02.parquet")
+
+    loaded = history_archive.load_history("TSLA", "1h")
+    assert loaded[SIGNAL_MASK_COLUMN].tolist() == codes.tolist()
+    chunks = list(history_archive.iter_history("TSLA", "1h", [SIGNAL_MASK_COLUMN]))
+    assert pd.concat(chunks)[SIGNAL_MASK_COLUMN].tolist() == codes.tolist()
+
+
+def test_text_only_partitions_are_rebuilt_and_migrated(archive, marked):
+    # 位掩码之前的格式：只有逗号分隔的異動標記文字（含“关键转折点 (信号数: N)”）
+    old = marked.drop(columns=SIGNAL_MASK_COLUMN).assign(異動標記=signal_text(marked[SIGNAL_MASK_COLUMN]))
+    old = old.iloc[:-10]
+    directory = archive / "TSLA" / "1h"
+    directory.mkdir(parents=True)
+    old.to_parquet(directory / "2024-02.parquet", index=False)
+    assert old["異動標記"].str.contains("关键转折点").any()
+
+    loaded = history_archive.load_history("TSLA", "1h", columns=["Close", SIGNAL_MASK_COLUMN])
+    assert loaded is not None and list(loaded.columns) == ["Datetime", "Close", SIGNAL_MASK_COLUMN]
+    assert loaded[SIGNAL_MASK_COLUMN].tolist() == marked[SIGNAL_MASK_COLUMN].iloc[:-10].tolist()
+
+    # 新K线写入增量文件，合并时旧行迁移为位掩码格式
+    history_archive.append_history("TSLA", "1h", marked)
+    history_archive.compact("TSLA", "1h")
+    assert len(partition(archive)) == 1
+    schema = pq.read_schema(partition(archive)[0])
+    assert SIGNAL_MASK_COLUMN in schema.names and "異動標記" not in schema.names
+    loaded = history_archive.load_history("TSLA", "1h")
+    assert loaded[SIGNAL_MASK_COLUMN].tolist() == marked[SIGNAL_MASK_COLUMN].tolist()
+
+
+def test_cycles_append_small_delta_files(archive, marked, monkeypatch):
+    monkeypatch.setattr(history_archive, "COMPACT_DELTAS", 6)
+    reads = []
+    read = history_archive._read
+    monkeypatch.setattr(history_archive, "_read", lambda path, columns=None: reads.append(path) or read(path, columns))
+
+    history_archive.append_history("TSLA", "1h", marked.iloc[:300])
+    history_archive.wait_compactions()
+    names = [p.name for p in partition(archive)]
+    assert names[0] == "2024-01.parquet" and len(names) == 2 and "~" in names[1]  # 1 月已结束并合并，2 月为增量文件
+    for n in range(301, 305):
+        # 每个周期：形成中的K线被修正后重写，并新增一根
+        revised = marked.iloc[:n].copy()
+        revised.loc[revised.index[-1], "Close"] += 1
+        reads.clear()
+        history_archive.append_history("TSLA", "1h", revised)
+        assert reads == []  # 不读取月分区
+    assert sum("~" in p.name for p in partition(archive)) == 5
+
+    loaded = history_archive.load_history("TSLA", "1h")
+    expected = marked.iloc[:304].copy()
+    expected.loc[expected.index[-1], "Close"] += 1
+    assert loaded["Datetime"].tolist() == expected["Datetime"].tolist()
+    assert loaded["Close"].tolist() == expected["Close"].tolist()
+    chunks = list(history_archive.iter_history("TSLA", "1h", ["Close"]))
+    assert list(chunks[-1].columns) == ["Close"] and sum(map(len, chunks)) == 304
+
+    history_archive.append_history("TSLA", "1h", marked.iloc[:306])  # 第 6 个增量文件：后台合并
+    history_archive.wait_compactions()
+    assert [p.name for p in partition(archive)] == ["2024-01.parquet", "2024-02.parquet"]
+    assert history_archive.load_history("TSLA", "1h")["Close"].tolist() == marked["Close"].iloc[:306].tolist()
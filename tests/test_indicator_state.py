@@ -0,0 +1,152 @@
+import pickle
+import time
+
+import numpy as np
+import pytest
+
+from indicator_state import IndicatorState
+from synthetic import synthetic_bars
+
+# IndicatorState.update 与整表计算的一致性：以下 calculate_* 为原 buy.v1.py 中的整表实现，作为参照
+
+TOLERANCE = dict(rtol=1e-9, atol=1e-8)
+
+
+# MACD 计算函数
+def calculate_macd(data, fast=12, slow=26, signal=9):
+    exp1 = data["Close"].ewm(span=fast, adjust=False).mean()
+    exp2 = data["Close"].ewm(span=slow, adjust=False).mean()
+    macd = exp1 - exp2
+    signal_line = macd.ewm(span=signal, adjust=False).mean()
+    return macd, signal_line
+
+# RSI 计算函数
+def calculate_rsi(data, periods=14):
+    delta = data["Close"].diff()
+    gain = (delta.where(delta > 0, 0)).rolling(window=periods).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=periods).mean()
+    rs = gain / loss
+    rsi = 100 - (100 / (1 + rs))
+    return rsi
+
+# 新增：VWAP 计算函数
+def calculate_vwap(data):
+    typical_price = (data['High'] + data['Low'] + data['Close']) / 3
+    vwap = (typical_price * data['Volume']).cumsum() / data['Volume'].cumsum()
+    return vwap
+
+# 新增：MFI 计算函数
+def calculate_mfi(data, periods=14):
+    typical_price = (data['High'] + data['Low'] + data['Close']) / 3
+    money_flow = typical_price * data['Volume']
+    positive_flow = money_flow.where(typical_price > typical_price.shift(1), 0).rolling(window=periods).sum()
+    negative_flow = money_flow.where(typical_price < typical_price.shift(1), 0).rolling(window=periods).sum()
+    money_ratio = positive_flow / negative_flow
+    mfi = 100 - (100 / (1 + money_ratio))
+    return mfi
+
+# 新增：OBV 计算函数
+def calculate_obv(data):
+    obv = (np.sign(data['Close'].diff()) * data['Volume']).fillna(0).cumsum()
+    return obv
+
+# 新增：VIX 趨勢計算（EMA交叉）
+def calculate_vix_trend(vix_data, fast=5, slow=10):
+    vix_ema_fast = vix_data["Close"].ewm(span=fast, adjust=False).mean()
+    vix_ema_slow = vix_data["Close"].ewm(span=slow, adjust=False).mean()
+    return vix_ema_fast, vix_ema_slow
+
+
+def reference(data, state):
+    """按 state 的配置整表计算全部指标列"""
+    macd, signal = calculate_macd(data, *state.macd)
+    expected = {"MACD": macd, "Signal": signal, "RSI": calculate_rsi(data, state.rsi_period),
+                "VWAP": calculate_vwap(data), "MFI": calculate_mfi(data, state.mfi_period), "OBV": calculate_obv(data)}
+    for span in state.ema_spans:
+        expected[f"EMA{span}"] = calculate_vix_trend(data, fast=span)[0]
+    for w in state.sma_windows:
+        expected[f"SMA{w}"] = data["Close"].rolling(window=w).mean()
+    return expected
+
+
+def assert_matches(result, data, state):
+    expected = reference(data, state)
+    assert set(result) == set(expected)
+    for name, values in expected.items():
+        assert len(result[name]) == len(data), name
+        np.testing.assert_allclose(result[name], values.to_numpy(dtype=float), equal_nan=True, err_msg=name,
+                                   **TOLERANCE)
+
+
+def revise(bar, rng):
+    """模拟形成中的最后一根K线被下次刷新修正"""
+    bar = bar.copy()
+    bar["Close"] *= 1 + rng.normal(0, 0.004, len(bar))
+    bar["High"] = bar[["High", "Close"]].max(axis=1)
+    bar["Low"] = bar[["Low", "Close"]].min(axis=1)
+    bar["Volume"] += rng.integers(1, 500, len(bar))
+    return bar
+
+
+@pytest.mark.parametrize("flat", [False, True])
+def test_growing_window_with_revised_forming_bar(flat):
+    data, _ = synthetic_bars(320, seed=3, flat=flat, vix="none")
+    rng = np.random.default_rng(7)
+    state = IndicatorState(ema_spans=(5, 10, 30, 40))
+    n = 2  # 单根K线时没有已提交状态，见 test_empty_and_single_bar
+    while n <= len(data):
+        window = data.iloc[:n].copy()
+        window.iloc[-1:] = revise(window.iloc[-1:], rng)  # 先给出修正前的形成中K线
+        assert_matches(state.update(window), window, state)
+        window = data.iloc[:n]
+        assert_matches(state.update(window), window, state)
+        n += int(rng.integers(1, 4))
+    assert state.rebuilds == 0
+
+
+def test_sliding_window_rebuilds_and_matches():
+    data, _ = synthetic_bars(400, seed=5, vix="none")
+    state = IndicatorState()
+    size = 250
+    for start in range(0, len(data) - size, 17):
+        window = data.iloc[start:start + size].reset_index(drop=True)
+        assert_matches(state.update(window), window, state)
+        window = data.iloc[start:start + size + 5].reset_index(drop=True)  # 同一起点上继续增长
+        assert_matches(state.update(window), window, state)
+    assert state.rebuilds > 0
+
+
+def test_empty_and_single_bar():
+    data, _ = synthetic_bars(1, vix="none")
+    state = IndicatorState()
+    assert all(len(v) == 0 for v in state.update(data.iloc[:0]).values())
+    assert_matches(state.update(data), data, state)
+
+
+def test_update_with_one_new_bar_costs_far_less_than_rebuild():
+    data, _ = synthetic_bars(200_000, seed=11, vix="none", freq="1min")
+    state = IndicatorState()
+    state.update(data.iloc[:-1])
+
+    started = time.perf_counter()
+    IndicatorState().update(data)
+    rebuild = time.perf_counter() - started
+
+    incremental = []
+    for _ in range(3):
+        started = time.perf_counter()
+        state.update(data)  # 首次为一根新K线，之后为没有新K线的刷新
+        incremental.append(time.perf_counter() - started)
+    assert state.rebuilds == 0
+    assert max(incremental) < rebuild / 20, (incremental, rebuild)
+    assert_matches(state.update(data.iloc[-300:].reset_index(drop=True)), data.iloc[-300:], state)
+
+
+def test_pickled_state_keeps_only_committed_outputs():
+    data, _ = synthetic_bars(100, seed=1, vix="none")
+    state = IndicatorState()
+    state.update(data.iloc[:60])
+    state.update(data.iloc[:61])
+    restored = pickle.loads(pickle.dumps(state))
+    assert all(len(buffer) == 60 for buffer in restored.outputs.values())
+    assert_matches(restored.update(data), data, restored)
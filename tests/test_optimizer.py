@@ -0,0 +1,22 @@
+from optimizer import DEFAULT_SPACE, grid_trials, random_trials
+
+
+def test_random_trials_sample_the_grid_without_building_it():
+    grid = grid_trials(DEFAULT_SPACE)
+    trials = random_trials(DEFAULT_SPACE, 100, seed=1)
+    assert len(trials) == 100
+    assert len({tuple(t.values()) for t in trials}) == 100  # 不放回
+    assert all(list(t) == list(DEFAULT_SPACE) for t in trials)
+    assert all(t in grid for t in trials[:10])
+    assert trials == random_trials(DEFAULT_SPACE, 100, seed=1)
+
+
+def test_random_trials_decode_matches_grid_order():
+    space = {"a": [1, 2], "b": ["x", "y", "z"], "c": [0.5, 1.0]}
+    assert random_trials(space, 12) == grid_trials(space)
+    sampled = random_trials(space, 11, seed=3)
+    assert len(sampled) == 11 and all(sampled.count(t) == 1 and t in grid_trials(space) for t in sampled)
+
+
+def test_default_space_only_tunes_signal_thresholds():
+    assert "body_ratio_threshold" not in DEFAULT_SPACE
@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from percentiles import PERCENTILE_COLUMNS, QuantileSketch, percentile_ranges, sketch_ranges
+
+# 草图的排名误差上限（占总数的比例）：capacity=512、100 万个值时实测约 0.2%~0.3%
+RANK_ERROR = 0.005
+
+
+def reference_ranges(data, pct, columns=PERCENTILE_COLUMNS):
+    """原 buy.v1.py 的逐列实现：降序/升序各排序一次后取前 k 个"""
+    ranges = {}
+    for column in columns:
+        desc = data[column].dropna().sort_values(ascending=False)
+        if len(desc) > 0:
+            k = max(1, int(len(desc) * pct / 100))
+            top = desc.head(k)
+            bottom = data[column].dropna().sort_values(ascending=True).head(k)
+            ranges[column] = {"top": (top.max(), top.min()), "bottom": (bottom.max(), bottom.min())}
+    return ranges
+
+
+def random_frame(rng):
+    n = int(rng.integers(0, 120))
+    data = {}
+    for column in PERCENTILE_COLUMNS:
+        values = rng.normal(0, 10, n)
+        if rng.random() < 0.5:
+            values = values.round()  # 大量重复值
+        values[rng.random(n) < rng.choice([0.0, 0.3, 0.9])] = np.nan
+        if rng.random() < 0.15:
+            values[:] = np.nan  # 整列 NaN
+        data[column] = values
+    return pd.DataFrame(data)
+
+
+@pytest.mark.parametrize("seed", range(300))
+def test_percentile_ranges_match_sorting(seed):
+    rng = np.random.default_rng(seed)
+    data = random_frame(rng)
+    pct = float(rng.choice([1, 5, 10, 33.3, 50, 99, 100]))
+    assert percentile_ranges(data, pct) == reference_ranges(data, pct)
+
+
+def test_all_nan_frame():
+    data = pd.DataFrame({c: [np.nan] * 5 for c in PERCENTILE_COLUMNS})
+    assert percentile_ranges(data, 10) == {}
+    assert sketch_ranges([data], 10) == {}
+
+
+def rank_error(sketch, ordered):
+    """在 201 个等距排名上，草图返回值的真实排名区间与目标排名的最大距离（占总数的比例）"""
+    n = len(ordered)
+    worst = 0
+    for rank in np.linspace(0, n - 1, 201).astype(int):
+        value = sketch.value_at(rank)
+        lo, hi = np.searchsorted(ordered, value, "left"), np.searchsorted(ordered, value, "right") - 1
+        worst = max(worst, lo - rank, rank - hi)
+    return worst / n
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_sketch_rank_error_with_update_and_merge(seed):
+    rng = np.random.default_rng(seed)
+    values = np.concatenate([rng.lognormal(0, 2, 500_000), rng.normal(0, 1, 500_000)])
+    rng.shuffle(values)
+    ordered = np.sort(values)
+    chunks = np.array_split(values, 40)
+
+    chunked = QuantileSketch()
+    for chunk in chunks:
+        chunked.update(np.append(chunk, np.nan))
+    merged = QuantileSketch(seed=0)
+    for i, chunk in enumerate(chunks):
+        part = QuantileSketch(seed=i)
+        part.update(chunk)
+        merged.merge(part)
+
+    for sketch in (chunked, merged):
+        assert sketch.count == len(values)
+        assert (sketch.min, sketch.max) == (ordered[0], ordered[-1])
+        assert sum(len(level) for level in sketch.levels) < 2000  # 固定内存
+        assert rank_error(sketch, ordered) < RANK_ERROR
+
+
+def test_sketch_ranges_close_to_exact():
+    rng = np.random.default_rng(9)
+    data = pd.DataFrame({c: rng.normal(0, 10, 200_000) for c in PERCENTILE_COLUMNS})
+    data.iloc[::7, 0] = np.nan
+    exact = percentile_ranges(data, 5)
+    approx = sketch_ranges((data.iloc[i:i + 30_000] for i in range(0, len(data), 30_000)), 5)
+    assert set(approx) == set(exact)
+    for column, ranges in exact.items():
+        ordered = np.sort(data[column].dropna().to_numpy())
+        # 最大/最小值精确，top 的最小值与 bottom 的最大值为近似边界
+        assert approx[column]["top"][0] == ranges["top"][0] and approx[column]["bottom"][1] == ranges["bottom"][1]
+        for got, want in ((approx[column]["top"][1], ranges["top"][1]),
+                          (approx[column]["bottom"][0], ranges["bottom"][0])):
+            assert abs(np.searchsorted(ordered, got) - np.searchsorted(ordered, want)) < RANK_ERROR * len(ordered)
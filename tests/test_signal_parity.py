@@ -0,0 +1,440 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pipeline import DEFAULT_PARAMS, SIGNAL_PARAM_KEYS, prepare_data
+from signal_engine import SIGNAL_MASK_COLUMN, mark_signals, signal_text
+from synthetic import synthetic_bars
+
+# 向量化信号引擎与重构前逐行 mark_signal（原 buy.v1.py）的对照测试：
+# 信号表增删/调整顺序、位掩码编码改动后，解码出的異動標記必须与逐行实现逐字相同
+
+# 调低阈值，让跳空、新转折点、关键转折点、VIX 信号在合成数据上都能触发
+PARAMS = dict(DEFAULT_PARAMS, price_change_threshold=0.5, gap_threshold=0.5,
+              vix_low_threshold=18.0, vix_high_threshold=25.0)
+
+
+# ---- 参照实现：重构前的逐行 mark_signal，阈值改为从 p 读取，其余逐字保留 ----
+
+
+def reference_mark_signal(data, row, index, p):
+    signals = []
+    if abs(row["📈 股價漲跌幅 (%)"]) >= p["price_threshold"] and abs(row["📊 成交量變動幅 (%)"]) >= p["volume_threshold"]:
+        signals.append("✅ 量價")
+    if index > 0 and row["Low"] > data["High"].iloc[index-1]:
+        signals.append("📈 Low>High")
+    if index > 0 and row["High"] < data["Low"].iloc[index-1]:
+        signals.append("📉 High<Low")
+    if index > 0 and row["MACD"] > 0 and data["MACD"].iloc[index-1] <= 0 and row["RSI"] < 50:
+        signals.append("📈 MACD買入")
+    if index > 0 and row["MACD"] <= 0 and data["MACD"].iloc[index-1] > 0 and row["RSI"] > 50:
+        signals.append("📉 MACD賣出")
+    if (index > 0 and row["EMA5"] > row["EMA10"] and
+        data["EMA5"].iloc[index-1] <= data["EMA10"].iloc[index-1] and
+        row["Volume"] > data["Volume"].iloc[index-1] and row["RSI"] < 50):
+        signals.append("📈 EMA買入")
+    if (index > 0 and row["EMA5"] < row["EMA10"] and
+        data["EMA5"].iloc[index-1] >= data["EMA10"].iloc[index-1] and
+        row["Volume"] > data["Volume"].iloc[index-1] and row["RSI"] > 50):
+        signals.append("📉 EMA賣出")
+    if (index > 0 and row["High"] > data["High"].iloc[index-1] and
+        row["Low"] > data["Low"].iloc[index-1] and
+        row["Close"] > data["Close"].iloc[index-1] and row["MACD"] > 0):
+        signals.append("📈 價格趨勢買入")
+    if (index > 0 and row["High"] < data["High"].iloc[index-1] and
+        row["Low"] < data["Low"].iloc[index-1] and
+        row["Close"] < data["Close"].iloc[index-1] and row["MACD"] < 0):
+        signals.append("📉 價格趨勢賣出")
+    if (index > 0 and row["High"] > data["High"].iloc[index-1] and
+        row["Low"] > data["Low"].iloc[index-1] and
+        row["Close"] > data["Close"].iloc[index-1] and
+        row["Volume"] > data["前5均量"].iloc[index] and row["RSI"] < 50):
+        signals.append("📈 價格趨勢買入(量)")
+    if (index > 0 and row["High"] < data["High"].iloc[index-1] and
+        row["Low"] < data["Low"].iloc[index-1] and
+        row["Close"] < data["Close"].iloc[index-1] and
+        row["Volume"] > data["前5均量"].iloc[index] and row["RSI"] > 50):
+        signals.append("📉 價格趨勢賣出(量)")
+    if (index > 0 and row["High"] > data["High"].iloc[index-1] and
+        row["Low"] > data["Low"].iloc[index-1] and
+        row["Close"] > data["Close"].iloc[index-1] and
+        row["Volume Change %"] > 15 and row["RSI"] < 50):
+        signals.append("📈 價格趨勢買入(量%)")
+    if (index > 0 and row["High"] < data["High"].iloc[index-1] and
+        row["Low"] < data["Low"].iloc[index-1] and
+        row["Close"] < data["Close"].iloc[index-1] and
+        row["Volume Change %"] > 15 and row["RSI"] > 50):
+        signals.append("📉 價格趨勢賣出(量%)")
+    if index > 0:
+        gap_pct = ((row["Open"] - data["Close"].iloc[index-1]) / data["Close"].iloc[index-1]) * 100
+        is_up_gap = gap_pct > p["gap_threshold"]
+        is_down_gap = gap_pct < -p["gap_threshold"]
+        if is_up_gap or is_down_gap:
+            trend = data["Close"].iloc[index-5:index].mean() if index >= 5 else 0
+            prev_trend = data["Close"].iloc[index-6:index-1].mean() if index >= 6 else trend
+            is_up_trend = row["Close"] > trend and trend > prev_trend
+            is_down_trend = row["Close"] < trend and trend < prev_trend
+            is_high_volume = row["Volume"] > data["前5均量"].iloc[index]
+            is_price_reversal = (index < len(data) - 1 and
+                                ((is_up_gap and data["Close"].iloc[index+1] < row["Close"]) or
+                                 (is_down_gap and data["Close"].iloc[index+1] > row["Close"])))
+            if is_up_gap:
+                if is_price_reversal and is_high_volume:
+                    signals.append("📈 衰竭跳空(上)")
+                elif is_up_trend and is_high_volume:
+                    signals.append("📈 持續跳空(上)")
+                elif row["High"] > data["High"].iloc[index-1:index].max() and is_high_volume:
+                    signals.append("📈 突破跳空(上)")
+                else:
+                    signals.append("📈 普通跳空(上)")
+            elif is_down_gap:
+                if is_price_reversal and is_high_volume:
+                    signals.append("📉 衰竭跳空(下)")
+                elif is_down_trend and is_high_volume:
+                    signals.append("📉 持續跳空(下)")
+                elif row["Low"] < data["Low"].iloc[index-1:index].min() and is_high_volume:
+                    signals.append("📉 突破跳空(下)")
+                else:
+                    signals.append("📉 普通跳空(下)")
+    if row['Continuous_Up'] >= p["continuous_up_threshold"] and row["RSI"] < 70:
+        signals.append("📈 連續向上買入")
+    if row['Continuous_Down'] >= p["continuous_down_threshold"] and row["RSI"] > 30:
+        signals.append("📉 連續向下賣出")
+    if pd.notna(row["SMA50"]):
+        if row["Close"] > row["SMA50"] and row["MACD"] > 0:
+            signals.append("📈 SMA50上升趨勢")
+        elif row["Close"] < row["SMA50"] and row["MACD"] < 0:
+            signals.append("📉 SMA50下降趨勢")
+    if pd.notna(row["SMA50"]) and pd.notna(row["SMA200"]):
+        if row["Close"] > row["SMA50"] and row["SMA50"] > row["SMA200"] and row["MACD"] > 0:
+            signals.append("📈 SMA50_200上升趨勢")
+        elif row["Close"] < row["SMA50"] and row["SMA50"] < row["SMA200"] and row["MACD"] < 0:
+            signals.append("📉 SMA50_200下降趨勢")
+    if index > 0 and row["Close"] > row["Open"] and row["Open"] > data["Close"].iloc[index-1] and row["RSI"] < 70:
+        signals.append("📈 新买入信号")
+    if index > 0 and row["Close"] < row["Open"] and row["Open"] < data["Close"].iloc[index-1] and row["RSI"] > 30:
+        signals.append("📉 新卖出信号")
+    if index > 0 and abs(row["Price Change %"]) > p["price_change_threshold"] and abs(row["Volume Change %"]) > p["volume_change_threshold"] and row["MACD"] > row["Signal"]:
+        signals.append("🔄 新转折点")
+    if len(signals) > 8:
+        signals.append(f"🔥 关键转折点 (信号数: {len(signals)})")
+    if index > 0 and row["RSI"] < 30 and row["MACD"] > 0 and data["MACD"].iloc[index-1] <= 0:
+        signals.append("📈 RSI-MACD Oversold Crossover")
+    if index > 0 and row["EMA5"] > row["EMA10"] and row["Close"] > row["SMA50"]:
+        signals.append("📈 EMA-SMA Uptrend Buy")
+    if index > 0 and row["Volume"] > data["前5均量"].iloc[index] and row["MACD"] > 0 and data["MACD"].iloc[index-1] <= 0:
+        signals.append("📈 Volume-MACD Buy")
+    if index > 0 and row["RSI"] > 70 and row["MACD"] < 0 and data["MACD"].iloc[index-1] >= 0:
+        signals.append("📉 RSI-MACD Overbought Crossover")
+    if index > 0 and row["EMA5"] < row["EMA10"] and row["Close"] < row["SMA50"]:
+        signals.append("📉 EMA-SMA Downtrend Sell")
+    if index > 0 and row["Volume"] > data["前5均量"].iloc[index] and row["MACD"] < 0 and data["MACD"].iloc[index-1] >= 0:
+        signals.append("📉 Volume-MACD Sell")
+    if (index > 0 and row["EMA10"] > row["EMA30"] and
+        data["EMA10"].iloc[index-1] <= data["EMA30"].iloc[index-1]):
+        signals.append("📈 EMA10_30買入")
+    if (index > 0 and row["EMA10"] > row["EMA30"] and
+        data["EMA10"].iloc[index-1] <= data["EMA30"].iloc[index-1] and
+        row["EMA10"] > row["EMA40"]):
+        signals.append("📈 EMA10_30_40強烈買入")
+    if (index > 0 and row["EMA10"] < row["EMA30"] and
+        data["EMA10"].iloc[index-1] >= data["EMA30"].iloc[index-1]):
+        signals.append("📉 EMA10_30賣出")
+    if (index > 0 and row["EMA10"] < row["EMA30"] and
+        data["EMA10"].iloc[index-1] >= data["EMA30"].iloc[index-1] and
+        row["EMA10"] < row["EMA40"]):
+        signals.append("📉 EMA10_30_40強烈賣出")
+    if (index > 0 and
+        data["Close"].iloc[index-1] < data["Open"].iloc[index-1] and
+        row["Close"] > row["Open"] and
+        row["Open"] < data["Close"].iloc[index-1] and
+        row["Close"] > data["Open"].iloc[index-1] and
+        row["Volume"] > data["前5均量"].iloc[index] and
+        row["RSI"] < 50):
+        signals.append("📈 看漲吞沒")
+    if (index > 0 and
+        data["Close"].iloc[index-1] > data["Open"].iloc[index-1] and
+        row["Close"] < row["Open"] and
+        row["Open"] > data["Close"].iloc[index-1] and
+        row["Close"] < data["Open"].iloc[index-1] and
+        row["Volume"] > data["前5均量"].iloc[index] and
+        row["RSI"] > 50):
+        signals.append("📉 看跌吞沒")
+    if (index > 0 and
+        row["Close"] > data["Close"].iloc[index-1] and
+        abs(row["Close"] - row["Open"]) < (row["High"] - row["Low"]) * 0.3 and
+        (min(row["Open"], row["Close"]) - row["Low"]) >= 2 * abs(row["Close"] - row["Open"]) and
+        (row["High"] - max(row["Open"], row["Close"])) < (min(row["Open"], row["Close"]) - row["Low"]) and
+        row["Volume"] > data["前5均量"].iloc[index] and
+        row["RSI"] < 50):
+        signals.append("📈 錘頭線")
+    if (index > 0 and
+        row["Close"] < data["Close"].iloc[index-1] and
+        abs(row["Close"] - row["Open"]) < (row["High"] - row["Low"]) * 0.3 and
+        (min(row["Open"], row["Close"]) - row["Low"]) >= 2 * abs(row["Close"] - row["Open"]) and
+        (row["High"] - max(row["Open"], row["Close"])) < (min(row["Open"], row["Close"]) - row["Low"]) and
+        row["Volume"] > data["前5均量"].iloc[index] and
+        row["RSI"] > 50):
+        signals.append("📉 上吊線")
+    if (index > 1 and
+        data["Close"].iloc[index-2] < data["Open"].iloc[index-2] and
+        abs(data["Close"].iloc[index-1] - data["Open"].iloc[index-1]) < 0.3 * abs(data["Close"].iloc[index-2] - data["Open"].iloc[index-2]) and
+        row["Close"] > row["Open"] and
+        row["Close"] > (data["Open"].iloc[index-2] + data["Close"].iloc[index-2]) / 2 and
+        row["Volume"] > data["前5均量"].iloc[index] and
+        row["RSI"] < 50):
+        signals.append("📈 早晨之星")
+    if (index > 1 and
+        data["Close"].iloc[index-2] > data["Open"].iloc[index-2] and
+        abs(data["Close"].iloc[index-1] - data["Open"].iloc[index-1]) < 0.3 * abs(data["Close"].iloc[index-2] - data["Open"].iloc[index-2]) and
+        row["Close"] < row["Open"] and
+        row["Close"] < (data["Open"].iloc[index-2] + data["Close"].iloc[index-2]) / 2 and
+        row["Volume"] > data["前5均量"].iloc[index] and
+        row["RSI"] > 50):
+        signals.append("📉 黃昏之星")
+    # 新增：烏雲蓋頂
+    if (index > 0 and
+        data["Close"].iloc[index-1] > data["Open"].iloc[index-1] and  # 前一日陽線
+        row["Open"] > data["Close"].iloc[index-1] and  # 當前開盤高於前日收盤
+        row["Close"] < row["Open"] and  # 當前為陰線
+        row["Close"] < (data["Open"].iloc[index-1] + data["Close"].iloc[index-1]) / 2 and  # 收盤低於前日K線中點
+        row["Volume"] > data["前5均量"].iloc[index]):  # 成交量放大
+        signals.append("📉 烏雲蓋頂")
+    # 新增：刺透形態
+    if (index > 0 and
+        data["Close"].iloc[index-1] < data["Open"].iloc[index-1] and  # 前一日陰線
+        row["Open"] < data["Close"].iloc[index-1] and  # 當前開盤低於前日收盤
+        row["Close"] > row["Open"] and  # 當前為陽線
+        row["Close"] > (data["Open"].iloc[index-1] + data["Close"].iloc[index-1]) / 2 and  # 收盤高於前日K線中點
+        row["Volume"] > data["前5均量"].iloc[index]):  # 成交量放大
+        signals.append("📈 刺透形態")
+    # 新增：VWAP信号（作为主进出场基准）
+    if index > 0 and pd.notna(row["VWAP"]):
+        if row["Close"] > row["VWAP"] and data["Close"].iloc[index-1] <= data["VWAP"].iloc[index-1]:
+            signals.append("📈 VWAP買入")
+        elif row["Close"] < row["VWAP"] and data["Close"].iloc[index-1] >= data["VWAP"].iloc[index-1]:
+            signals.append("📉 VWAP賣出")
+    # 新增：MFI背离信号
+    if index >= p["mfi_divergence_window"] and pd.notna(row["MFI"]):
+        if data['MFI_Bull_Div'].iloc[index]:
+            signals.append("📈 MFI牛背離買入")
+        if data['MFI_Bear_Div'].iloc[index]:
+            signals.append("📉 MFI熊背離賣出")
+    # 新增：OBV突破信号（确认突破量能）
+    if index > 0 and pd.notna(row["OBV"]):
+        if row["Close"] > data["Close"].iloc[index-1] and row["OBV"] > data['OBV_Roll_Max'].iloc[index-1]:
+            signals.append("📈 OBV突破買入")
+        elif row["Close"] < data["Close"].iloc[index-1] and row["OBV"] < data['OBV_Roll_Min'].iloc[index-1]:
+            signals.append("📉 OBV突破賣出")
+    # 新增：VIX 恐慌指数信号
+    if index > 0 and pd.notna(row["VIX"]):
+        vix_prev = data["VIX"].iloc[index-1]
+        if row["VIX"] > p["vix_high_threshold"] and row["VIX"] > vix_prev:
+            signals.append("📉 VIX恐慌賣出")
+        elif row["VIX"] < p["vix_low_threshold"] and row["VIX"] < vix_prev:
+            signals.append("📈 VIX平靜買入")
+    # 新增：VIX 趨勢信號（EMA交叉）
+    if index > 0 and pd.notna(row["VIX_EMA_Fast"]) and pd.notna(row["VIX_EMA_Slow"]):
+        if row["VIX_EMA_Fast"] > row["VIX_EMA_Slow"] and data["VIX_EMA_Fast"].iloc[index-1] <= data["VIX_EMA_Slow"].iloc[index-1]:
+            signals.append("📉 VIX上升趨勢賣出")
+        elif row["VIX_EMA_Fast"] < row["VIX_EMA_Slow"] and data["VIX_EMA_Fast"].iloc[index-1] >= data["VIX_EMA_Slow"].iloc[index-1]:
+            signals.append("📈 VIX下降趨勢買入")
+    return ", ".join(signals) if signals else ""
+
+
+def reference_marks(data, p):
+    return [reference_mark_signal(data, row, i, p) for i, row in data.iterrows()]
+
+
+# ---- 参照实现：重构前逐行的K线形态（原 buy.v1.py compute_kline_patterns），逐字保留 ----
+
+
+def reference_kline_patterns(data, body_ratio_threshold, shadow_ratio_threshold, doji_body_threshold):
+    data = data.copy()
+    data["成交量標記"] = data.apply(
+        lambda row: "放量" if row["Volume"] > row["前5均量"] else "縮量", axis=1
+    )
+
+    def identify_candlestick_pattern(row, index, data):
+        pattern = "普通K線"
+        interpretation = "波動有限，方向不明顯"
+        if index > 0:
+            prev_close = data["Close"].iloc[index-1]
+            prev_open = data["Open"].iloc[index-1]
+            prev_high = data["High"].iloc[index-1]
+            prev_low = data["Low"].iloc[index-1]
+            curr_open = row["Open"]
+            curr_close = row["Close"]
+            curr_high = row["High"]
+            curr_low = row["Low"]
+            body_size = abs(curr_close - curr_open)
+            candle_range = curr_high - curr_low
+            prev_body_size = abs(prev_close - prev_open)
+            is_uptrend = data["Close"].iloc[max(0, index-5):index].mean() < curr_close if index >= 5 else False
+            is_downtrend = data["Close"].iloc[max(0, index-5):index].mean() > curr_close if index >= 5 else False
+            is_high_volume = row["Volume"] > row["前5均量"]
+
+            # 锤子线
+            if (body_size < candle_range * 0.3 and
+                (min(curr_open, curr_close) - curr_low) >= shadow_ratio_threshold * body_size and
+                (curr_high - max(curr_open, curr_close)) < (min(curr_open, curr_close) - curr_low) and
+                is_downtrend):
+                pattern = "錘子線"
+                interpretation = "下方出現支撐，空方雖打壓但多方承接" + ("，放量增強買入信號" if is_high_volume else "")
+
+            # 射击之星
+            elif (body_size < candle_range * 0.3 and
+                  (curr_high - max(curr_open, curr_close)) >= shadow_ratio_threshold * body_size and
+                  (min(curr_open, curr_close) - curr_low) < (curr_high - max(curr_open, curr_close)) and
+                  is_uptrend):
+                pattern = "射擊之星"
+                interpretation = "高位拋壓沉重，短期見頂風險" + ("，放量增強賣出信號" if is_high_volume else "")
+
+            # 十字星
+            elif body_size < doji_body_threshold * candle_range:
+                pattern = "十字星"
+                interpretation = "市場猶豫，方向未明確"
+
+            # 大阳线
+            elif (curr_close > curr_open and
+                  body_size > body_ratio_threshold * candle_range):
+                pattern = "大陽線"
+                interpretation = "多方強勢推升" + ("，放量更有力" if is_high_volume else "")
+
+            # 大阴线
+            elif (curr_close < curr_open and
+                  body_size > body_ratio_threshold * candle_range):
+                pattern = "大陰線"
+                interpretation = "空方強勢壓制" + ("，放量更偏空" if is_high_volume else "")
+
+            # 看涨吞噬
+            elif (curr_close > curr_open and
+                  prev_close < prev_open and
+                  curr_open < prev_close and
+                  curr_close > prev_open and
+                  is_high_volume):
+                pattern = "看漲吞噬"
+                interpretation = "當前陽線完全包覆前日陰線，買方強勢反攻，預示反轉"
+
+            # 看跌吞噬
+            elif (curr_close < curr_open and
+                  prev_close > prev_open and
+                  curr_open > prev_close and
+                  curr_close < prev_open and
+                  is_high_volume):
+                pattern = "看跌吞噬"
+                interpretation = "當前陰線完全包覆前日陽線，賣方強勢壓制，預示反轉"
+
+            # 乌云盖顶
+            elif (is_uptrend and
+                  curr_close < curr_open and
+                  prev_close > prev_open and
+                  curr_open > prev_close and
+                  curr_close < (prev_open + prev_close) / 2):
+                pattern = "烏雲蓋頂"
+                interpretation = "上升趨勢中陰線壓制，賣壓加重，短期可能下跌"
+
+            # 刺透形态
+            elif (is_downtrend and
+                  curr_close > curr_open and
+                  prev_close < prev_open and
+                  curr_open < prev_close and
+                  curr_close > (prev_open + prev_close) / 2):
+                pattern = "刺透形態"
+                interpretation = "下跌趨勢中陽線反攻，買方介入，短期可能上漲"
+
+            # 新增：早晨之星（扩展形态）
+            elif (index > 1 and
+                  data["Close"].iloc[index-2] < data["Open"].iloc[index-2] and  # 第一根阴线
+                  abs(data["Close"].iloc[index-1] - data["Open"].iloc[index-1]) < 0.3 * abs(data["Close"].iloc[index-2] - data["Open"].iloc[index-2]) and  # 第二根小实体
+                  curr_close > curr_open and  # 第三根阳线
+                  curr_close > (prev_open + prev_close) / 2 and  # 收盘高于前日中点
+                  is_high_volume):
+                pattern = "早晨之星"
+                interpretation = "下跌後小實體K線後強陽線，預示反轉，多方力量增強"
+
+            # 新增：黃昏之星（扩展形态）
+            elif (index > 1 and
+                  data["Close"].iloc[index-2] > data["Open"].iloc[index-2] and  # 第一根阳线
+                  abs(data["Close"].iloc[index-1] - data["Open"].iloc[index-1]) < 0.3 * abs(data["Close"].iloc[index-2] - data["Open"].iloc[index-2]) and  # 第二根小实体
+                  curr_close < curr_open and  # 第三根阴线
+                  curr_close < (prev_open + prev_close) / 2 and  # 收盘低于前日中点
+                  is_high_volume):
+                pattern = "黃昏之星"
+                interpretation = "上漲後小實體K線後強陰線，預示反轉，空方力量增強"
+
+        return pattern, interpretation
+
+    data[["K線形態", "單根解讀"]] = [
+        identify_candlestick_pattern(row, i, data) for i, row in data.iterrows()
+    ]
+    return data
+
+
+CASES = [(n, seed, flat, vix)
+         for n in (2, 3, 6, 7, 25, 60, 210, 400)
+         for seed, flat in ((0, False), (1, True))
+         for vix in ("full", "gaps", "none")]
+
+
+@pytest.mark.parametrize("n,seed,flat,vix", CASES)
+def test_mark_signals_matches_row_wise_reference(n, seed, flat, vix):
+    bars, vix_data = synthetic_bars(n, seed=seed + n, flat=flat, vix=vix)
+    data = prepare_data(bars, vix_data, PARAMS)
+    codes = mark_signals(data, **{key: PARAMS[key] for key in SIGNAL_PARAM_KEYS})
+    assert signal_text(codes) == reference_marks(data, PARAMS)
+
+
+def test_pipeline_column_matches_reference_with_default_thresholds():
+    bars, vix_data = synthetic_bars(300, seed=7)
+    data = prepare_data(bars, vix_data, DEFAULT_PARAMS)
+    assert data[SIGNAL_MASK_COLUMN].dtype == np.int64
+    assert signal_text(data[SIGNAL_MASK_COLUMN]) == reference_marks(data, DEFAULT_PARAMS)
+
+
+def test_reference_fires_key_pivot_and_gaps():
+    """确认合成数据确实覆盖到关键转折点与各类跳空，对照测试才有意义"""
+    marks = []
+    for seed in range(4):
+        bars, vix_data = synthetic_bars(400, seed=seed, flat=bool(seed % 2))
+        data = prepare_data(bars, vix_data, PARAMS)
+        marks += signal_text(data[SIGNAL_MASK_COLUMN])
+    text = pd.Series(marks)
+    assert text.str.contains("关键转折点").any()
+    assert text.str.contains("跳空").any()
+    assert text.str.contains("VIX").any()
+
+
+# 多组阈值 × 种子；coarse 把 OHLC 取整、成交量取整到千，制造开收盘相等、实体为 0、量与均量相等等边界
+PATTERN_THRESHOLDS = [(0.6, 2.0, 0.1), (0.4, 1.0, 0.05), (0.8, 3.0, 0.2)]
+PATTERN_CASES = [(seed, flat, coarse, thresholds)
+                 for seed in range(3)
+                 for flat, coarse in ((False, False), (True, False), (True, True))
+                 for thresholds in PATTERN_THRESHOLDS]
+
+
+@pytest.mark.parametrize("seed,flat,coarse,thresholds", PATTERN_CASES)
+def test_kline_patterns_match_row_wise_reference(seed, flat, coarse, thresholds):
+    bars, vix_data = synthetic_bars(250, seed=seed, flat=flat)
+    if coarse:
+        bars[["Open", "High", "Low", "Close"]] = bars[["Open", "High", "Low", "Close"]].round(0)
+        bars["Volume"] = (bars["Volume"] / 20000).round() * 20000
+    data = prepare_data(bars, vix_data, dict(PARAMS, body_ratio_threshold=thresholds[0],
+                                             shadow_ratio_threshold=thresholds[1], doji_body_threshold=thresholds[2]))
+    expected = reference_kline_patterns(data, *thresholds)
+    for column in ("K線形態", "單根解讀", "成交量標記"):
+        assert data[column].tolist() == expected[column].tolist(), column
+
+
+def test_reference_covers_kline_patterns():
+    """确认合成数据覆盖到各类K线形态"""
+    seen = set()
+    for seed in range(3):
+        for flat, coarse in ((False, False), (True, True)):
+            bars, vix_data = synthetic_bars(250, seed=seed, flat=flat)
+            if coarse:
+                bars[["Open", "High", "Low", "Close"]] = bars[["Open", "High", "Low", "Close"]].round(0)
+            for thresholds in PATTERN_THRESHOLDS:
+                seen |= set(reference_kline_patterns(prepare_data(bars.copy(), vix_data, PARAMS), *thresholds)["K線形態"])
+    assert seen == {"普通K線", "錘子線", "射擊之星", "十字星", "大陽線", "大陰線", "看漲吞噬", "看跌吞噬",
+                    "烏雲蓋頂", "刺透形態", "早晨之星", "黃昏之星"}, seen
@@ -0,0 +1,92 @@
+import pandas as pd
+import pytest
+
+from signal_engine import SIGNAL_BITS, SIGNAL_MASK_COLUMN, signal_bits
+from synthetic import synthetic_bars
+from timeframes import confluence, higher_timeframes, resample_bars, resample_vix
+
+MINUTES = {"15m": 15, "60m": 60, "90m": 90}
+
+
+def dst_week():
+    """2024-03-06 ~ 03-13 的 5 分钟K线（含盘前 04:00 起与盘后至 20:00），跨越 3 月 10 日夏令时切换"""
+    bars, vix = synthetic_bars(8 * 24 * 12, seed=4, start="2024-03-06 00:00")
+    local = bars["Datetime"].dt.hour * 60 + bars["Datetime"].dt.minute
+    keep = (local >= 4 * 60) & (local < 20 * 60) & (bars["Datetime"].dt.dayofweek < 5)
+    return bars[keep].reset_index(drop=True), vix[keep].reset_index(drop=True)
+
+
+def reference_start(ts, interval):
+    """逐根按当地钟点计算合成K线的开始时间：1d 为当日 00:00，其余从 09:30 起每 m 分钟一格（盘前向前延伸）"""
+    day = ts.normalize()
+    if interval == "1d":
+        return day
+    m = MINUTES[interval]
+    minutes = ts.hour * 60 + ts.minute - (9 * 60 + 30)
+    return (day.tz_localize(None) + pd.Timedelta(minutes=9 * 60 + 30 + minutes // m * m)).tz_localize(ts.tz)
+
+
+@pytest.mark.parametrize("interval", ["15m", "60m", "90m", "1d"])
+def test_resample_bars_matches_row_wise_bins(interval):
+    bars, _ = dst_week()
+    starts = bars["Datetime"].map(lambda ts: reference_start(ts, interval)).rename("Datetime")
+    expected = bars.groupby(starts, sort=True).agg(
+        Open=("Open", "first"), High=("High", "max"), Low=("Low", "min"), Close=("Close", "last"),
+        Volume=("Volume", "sum")).reset_index()
+    result = resample_bars(bars, interval)
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+    assert str(result["Datetime"].dt.tz) == "America/New_York"
+
+
+def test_session_anchor_across_dst():
+    bars, _ = dst_week()
+    result = resample_bars(bars, "60m")
+    for day, offset in (("2024-03-08", "-05:00"), ("2024-03-11", "-04:00")):
+        starts = result.loc[result["Datetime"].dt.strftime("%Y-%m-%d") == day, "Datetime"]
+        assert starts.dt.strftime("%H:%M").tolist() == [f"{h:02d}:30" for h in range(3, 20)]
+        assert starts.iloc[0].isoformat().endswith(offset)
+    # 盘前 09:25 的K线收尾 08:30 开始的 60m K线，09:30 的K线开启 09:30 开始的K线
+    first = bars[bars["Datetime"].dt.strftime("%Y-%m-%d %H:%M").isin(["2024-03-11 09:25", "2024-03-11 09:30"])]
+    boundary = result.set_index("Datetime")
+    assert boundary.loc[pd.Timestamp("2024-03-11 08:30", tz="America/New_York"), "Close"] == first["Close"].iloc[0]
+    assert boundary.loc[pd.Timestamp("2024-03-11 09:30", tz="America/New_York"), "Open"] == first["Open"].iloc[1]
+
+    daily = resample_bars(bars, "1d")
+    assert daily["Datetime"].dt.strftime("%Y-%m-%d %H:%M").tolist() == [
+        "2024-03-06 00:00", "2024-03-07 00:00", "2024-03-08 00:00", "2024-03-11 00:00", "2024-03-12 00:00",
+        "2024-03-13 00:00"]
+    assert daily["Volume"].sum() == bars["Volume"].sum()
+
+
+def test_resample_vix_uses_last_close_per_bin():
+    _, vix = dst_week()
+    result = resample_vix(vix, "90m")
+    starts = vix["Datetime"].map(lambda ts: reference_start(ts, "90m"))
+    expected = vix.groupby(starts, sort=True)["Close"].last()
+    assert result["Close"].tolist() == expected.tolist()
+    assert result["VIX Change %"].iloc[1:].tolist() == (expected.pct_change().round(4) * 100).iloc[1:].tolist()
+
+
+def test_higher_timeframes():
+    assert higher_timeframes("5m") == ["15m", "30m", "60m", "90m", "1d"]
+    assert higher_timeframes("30m") == ["60m", "90m", "1d"]
+    assert higher_timeframes("1d") == []
+
+
+def frames(codes):
+    return {interval: {"data": pd.DataFrame({SIGNAL_MASK_COLUMN: [0, code]})} for interval, code in codes.items()}
+
+
+def test_confluence_all_timeframes_bullish():
+    macd, ema = SIGNAL_BITS["📈 MACD買入"], SIGNAL_BITS["📈 EMA買入"]
+    table, verdict = confluence(frames({"5m": macd | ema, "15m": macd, "60m": macd | signal_bits(["✅ 量價"])}))
+    assert verdict == "📈 多周期共振：全部周期偏多"
+    rows = table.set_index("信號")
+    assert rows.loc["📈 MACD買入", "周期數"] == 3
+    assert rows.loc["📈 EMA買入", ["5m", "15m", "60m"]].tolist() == ["✓", "", ""]
+    assert table["信號"].iloc[0] == "📈 MACD買入"  # 按出现的周期数排序
+
+
+def test_confluence_mixed_directions():
+    _, verdict = confluence(frames({"5m": SIGNAL_BITS["📈 MACD買入"], "15m": SIGNAL_BITS["📉 MACD賣出"], "1d": 0}))
+    assert verdict == "周期間方向不一致：5m 偏多、15m 偏空、1d 中性"
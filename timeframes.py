@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+
+from signal_engine import MASK_LABELS, SIGNAL_BITS, SIGNAL_DIRECTIONS, SIGNAL_MASK_COLUMN, prefix_bits
+
+# 多周期：只下载最细的间隔一次，本地按交易时段（09:30 起）合成更高周期的 OHLCV，
+# 每个周期各自运行信号流水线，并汇总最新K线上各信号在哪些周期同时出现（共振）
+#
+#   5m 原始K线 -> 15m / 30m / 1h / 1d
+
+INTERVAL_MINUTES = {"1m": 1, "2m": 2, "5m": 5, "15m": 15, "30m": 30, "60m": 60, "90m": 90, "1h": 60}
+SESSION_OPEN = 9 * 60 + 30  # 分钟，合成K线从开盘起对齐（与 Yahoo 的 60m/90m K线一致）
+BUY_BITS, SELL_BITS = prefix_bits("📈"), prefix_bits("📉")
+
+
+def higher_timeframes(base):
+    """可由 base 间隔本地合成的更高周期（分钟数为 base 的整数倍，另加 1d）"""
+    if base not in INTERVAL_MINUTES:
+        return []
+    minutes = INTERVAL_MINUTES[base]
+    seen = set()
+    options = []
+    for interval, m in INTERVAL_MINUTES.items():
+        if m > minutes and m % minutes == 0 and m not in seen:
+            seen.add(m)
+            options.append(interval)
+    return options + ["1d"]
+
+
+def _bins(times, interval):
+    """每根K线所属的合成K线开始时间；按当地钟点计算，夏令时切换不影响对齐"""
+    tz = times.dt.tz
+    local = times.dt.tz_localize(None) if tz is not None else times
+    day = local.dt.normalize()
+    if interval == "1d":
+        start = day
+    else:
+        m = INTERVAL_MINUTES[interval]
+        minutes = (local - day) / pd.Timedelta(minutes=1)
+        start = day + pd.to_timedelta((np.floor((minutes - SESSION_OPEN) / m) * m + SESSION_OPEN), unit="min")
+    return start.dt.tz_localize(tz) if tz is not None else start
+
+
+def resample_bars(data, interval):
+    """把K线合成为更高周期：Open 取首根、High 最高、Low 最低、Close 末根、Volume 求和
+
+    最后一根合成K线可能仍在形成中（与 Yahoo 实时返回的最新K线一致），由下一次刷新的数据替换。
+    """
+    if data.empty:
+        return data[["Datetime", "Open", "High", "Low", "Close", "Volume"]].copy()
+    bars = data.groupby(_bins(data["Datetime"], interval).rename("Datetime"), sort=True).agg(
+        Open=("Open", "first"), High=("High", "max"), Low=("Low", "min"), Close=("Close", "last"),
+        Volume=("Volume", "sum"))
+    return bars.reset_index()
+
+
+def resample_vix(vix_data, interval):
+    """VIX 按相同的时间格合成（取末根收盘价），重新计算 VIX Change %"""
+    if vix_data is None or vix_data.empty:
+        return vix_data
+    vix = vix_data.groupby(_bins(vix_data["Datetime"], interval).rename("Datetime"), sort=True).agg(
+        Close=("Close", "last")).reset_index()
+    vix["VIX Change %"] = vix["Close"].pct_change().round(4) * 100
+    return vix
+
+
+def confluence(results):
+    """results 为 {间隔: analyze_ticker 结果}，返回 (共振表, 方向结论)
+
+    共振表每个在任一周期最新K线上出现的信号一行，列出出现的周期与周期数；
+    方向结论比较各周期最新K线的买入/卖出信号数，全部周期同向时为“多周期共振”。
+    """
+    codes = {interval: int(result["data"][SIGNAL_MASK_COLUMN].iloc[-1]) for interval, result in results.items()}
+    union = 0
+    for code in codes.values():
+        union |= code
+    rows = []
+    for label in MASK_LABELS:
+        bit = SIGNAL_BITS[label]
+        if union & bit:
+            row = {"信號": label, "方向": SIGNAL_DIRECTIONS.get(label, "neutral")}
+            row.update({interval: "✓" if code & bit else "" for interval, code in codes.items()})
+            row["周期數"] = sum(bool(code & bit) for code in codes.values())
+            rows.append(row)
+    table = pd.DataFrame(rows, columns=["信號", "方向"] + list(codes) + ["周期數"])
+    table = table.sort_values("周期數", ascending=False, kind="stable", ignore_index=True)
+
+    bias = {interval: np.sign((code & BUY_BITS).bit_count() - (code & SELL_BITS).bit_count())
+            for interval, code in codes.items()}
+    if bias and all(b > 0 for b in bias.values()):
+        verdict = "📈 多周期共振：全部周期偏多"
+    elif bias and all(b < 0 for b in bias.values()):
+        verdict = "📉 多周期共振：全部周期偏空"
+    else:
+        verdict = "周期間方向不一致：" + "、".join(
+            f"{interval} {'偏多' if b > 0 else '偏空' if b < 0 else '中性'}" for interval, b in bias.items())
+    return table, verdict